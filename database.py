@@ -1,15 +1,192 @@
 import sqlite3
 import os
 import hashlib
+import json
+import threading
+from contextlib import contextmanager
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
 
 DB_NAME = "crm_compressores.db"
 DATA_DIR = "data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-def criar_banco():
-	conn = sqlite3.connect(DB_NAME)
+# Configuração aplicada a cada conexão aberta pelo gerenciador.
+# Em instalações onde o banco fica numa pasta de rede que não suporta
+# memória compartilhada, trocar JOURNAL_MODE para "DELETE".
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "NORMAL"
+CACHE_SIZE_KB = 16384
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+# Mantido desligado: o esquema atual possui referências (ex.: itens de cotação
+# apontando para produtos excluídos) que quebrariam exclusões já existentes.
+FOREIGN_KEYS = False
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"opens": 0, "queries": 0, "checkouts": 0}
+
+
+def _count_statement(_sql):
+	with _stats_lock:
+		_stats["queries"] += 1
+
+
+def _abrir_conexao(db_name):
+	"""Abre uma conexão física e aplica os PRAGMAs de desempenho."""
+	conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_MS / 1000)
 	c = conn.cursor()
+	try:
+		c.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+	except sqlite3.DatabaseError:
+		pass  # Sistema de arquivos sem suporte (ex.: alguns compartilhamentos)
+	c.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+	c.execute(f"PRAGMA cache_size=-{int(CACHE_SIZE_KB)}")
+	c.execute(f"PRAGMA mmap_size={int(MMAP_SIZE)}")
+	c.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_MS)}")
+	c.execute(f"PRAGMA foreign_keys={'ON' if FOREIGN_KEYS else 'OFF'}")
+	c.execute("PRAGMA temp_store=MEMORY")
+	c.close()
+	conn.set_trace_callback(_count_statement)
+	with _stats_lock:
+		_stats["opens"] += 1
+	return conn
+
+
+class PooledConnection:
+	"""Empréstimo de uma conexão de longa duração da thread atual.
+
+	Possui a mesma interface de ``sqlite3.Connection``; ``close()`` apenas
+	devolve a conexão ao pool. Se o último empréstimo for devolvido com uma
+	transação pendente, ela é desfeita (mesmo efeito de fechar uma conexão
+	sem ``commit``).
+	"""
+
+	def __init__(self, entry):
+		self._entry = entry
+		self._closed = False
+
+	def __getattr__(self, name):
+		if self._closed:
+			raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+		return getattr(self._entry["conn"], name)
+
+	def __enter__(self):
+		return self._entry["conn"].__enter__()
+
+	def __exit__(self, exc_type, exc, tb):
+		return self._entry["conn"].__exit__(exc_type, exc, tb)
+
+	def close(self):
+		if self._closed:
+			return
+		self._closed = True
+		self._entry["depth"] -= 1
+		if self._entry["depth"] <= 0:
+			self._entry["depth"] = 0
+			conn = self._entry["conn"]
+			if conn.in_transaction:
+				conn.rollback()
+
+	def __del__(self):
+		# Empréstimos esquecidos sem close() não podem prender a transação
+		try:
+			self.close()
+		except Exception:
+			pass
+
+
+def get_connection(db_name=None):
+	"""Retorna a conexão compartilhada da thread atual para ``db_name``.
+
+	Substitui ``sqlite3.connect(DB_NAME)``: cada thread mantém uma conexão
+	aberta por arquivo de banco, configurada uma única vez.
+	"""
+	db_name = db_name or DB_NAME
+	pool = getattr(_local, "pool", None)
+	if pool is None or _local.pid != os.getpid():
+		# Processo filho (fork) herda o pool do pai: as conexões herdadas são
+		# abandonadas sem fechar, o SQLite não permite usá-las em outro processo
+		pool = _local.pool = {}
+		_local.pid = os.getpid()
+	key = os.path.abspath(db_name)
+	entry = pool.get(key)
+	if entry is None:
+		entry = pool[key] = {"conn": _abrir_conexao(db_name), "depth": 0}
+	entry["depth"] += 1
+	with _stats_lock:
+		_stats["checkouts"] += 1
+	return PooledConnection(entry)
+
 
+@contextmanager
+def transaction(db_name=None):
+	"""Executa o bloco numa transação: ``commit`` ao sair, ``rollback`` em erro.
+
+	Se a conexão da thread já estiver numa transação (outro empréstimo com
+	escritas pendentes ou um ``transaction()`` externo), o bloco vira um
+	SAVEPOINT: sair só libera o savepoint e um erro desfaz apenas o que o
+	bloco fez, sem confirmar nem descartar o trabalho de quem está por fora.
+
+	Uso::
+
+		with transaction() as conn:
+			conn.execute("UPDATE ...")
+	"""
+	conn = get_connection(db_name)
+	savepoint = None
+	if conn.in_transaction:
+		savepoint = f"sp_{id(conn)}_{conn._entry['depth']}"
+		conn.execute(f"SAVEPOINT {savepoint}")
+	try:
+		yield conn
+		if savepoint:
+			conn.execute(f"RELEASE {savepoint}")
+		else:
+			conn.commit()
+	except Exception:
+		if savepoint:
+			conn.execute(f"ROLLBACK TO {savepoint}")
+			conn.execute(f"RELEASE {savepoint}")
+		else:
+			conn.rollback()
+		raise
+	finally:
+		conn.close()
+
+
+def close_thread_connections():
+	"""Fecha as conexões físicas da thread atual (ex.: ao encerrar workers)."""
+	pool = getattr(_local, "pool", None) or {}
+	if getattr(_local, "pid", None) != os.getpid():
+		pool.clear()  # Herdadas de outro processo: não fechar
+		return
+	for entry in pool.values():
+		try:
+			entry["conn"].close()
+		except sqlite3.Error:
+			pass
+	pool.clear()
+
+
+def get_connection_stats():
+	"""Retorna contadores de conexões físicas abertas, empréstimos e comandos."""
+	with _stats_lock:
+		return dict(_stats)
+
+def _adicionar_coluna(c, tabela, definicao):
+	"""ALTER TABLE ... ADD COLUMN tolerante a colunas já existentes."""
+	try:
+		c.execute(f"ALTER TABLE {tabela} ADD COLUMN {definicao}")
+	except sqlite3.OperationalError:
+		pass  # Coluna já existe
+
+
+def _migracao_001_esquema_base(c):
+	"""Tabelas base e colunas adicionadas antes do controle de versão."""
 	# Tabela Usuários
 	c.execute('''CREATE TABLE IF NOT EXISTS usuarios (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -23,91 +200,6 @@ def criar_banco():
 		template_image_path TEXT,
 		created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 	)''')
-	
-	# Migração: Adicionar colunas se não existirem
-	try:
-		c.execute("ALTER TABLE usuarios ADD COLUMN template_personalizado BOOLEAN DEFAULT 0")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-		
-	try:
-		c.execute("ALTER TABLE usuarios ADD COLUMN template_image_path TEXT")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-		
-	# Migração: Adicionar colunas para cotações se não existirem
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN esboco_servico TEXT")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-		
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN relacao_pecas_substituir TEXT")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-		
-	# Migração: Adicionar coluna para tipo de operação nos itens
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN tipo_operacao TEXT DEFAULT 'Compra'")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-
-	# Migração: Adicionar colunas para Locação nas cotações
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN tipo_cotacao TEXT DEFAULT 'Compra'")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN locacao_valor_mensal REAL")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN locacao_data_inicio DATE")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN locacao_data_fim DATE")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN locacao_qtd_meses INTEGER")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN locacao_nome_equipamento TEXT")
-	except sqlite3.OperationalError:
-		pass
-
-	# Migração: Adicionar coluna para imagem da locação
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN locacao_imagem_path TEXT")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-
-	# Migração: Adicionar coluna para contato do cliente na cotação
-	try:
-		c.execute("ALTER TABLE cotacoes ADD COLUMN contato_nome TEXT")
-	except sqlite3.OperationalError:
-		pass  # Coluna já existe
-
-	# Migração: Adicionar colunas de locação por item em itens_cotacao
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN locacao_data_inicio DATE")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN locacao_data_fim DATE")
-	except sqlite3.OperationalError:
-		pass
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN locacao_qtd_meses INTEGER")
-	except sqlite3.OperationalError:
-		pass
-	# Migração: Imagem por item de locação
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN locacao_imagem_path TEXT")
-	except sqlite3.OperationalError:
-		pass
 
 	# Tabela Clientes - ATUALIZADA
 	c.execute('''CREATE TABLE IF NOT EXISTS clientes (
@@ -170,18 +262,6 @@ def criar_banco():
 		updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 	)''')
 
-	# Migração: Adicionar coluna esboco_servico em produtos
-	try:
-		c.execute("ALTER TABLE produtos ADD COLUMN esboco_servico TEXT")
-	except sqlite3.OperationalError:
-		pass
-
-	# Migração: Adicionar coluna categoria em produtos
-	try:
-		c.execute("ALTER TABLE produtos ADD COLUMN categoria TEXT DEFAULT 'Geral'")
-	except sqlite3.OperationalError:
-		pass
-
 	# Tabela Itens do Kit - RENOMEADA
 	c.execute('''CREATE TABLE IF NOT EXISTS kit_items (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -255,18 +335,6 @@ def criar_banco():
 		FOREIGN KEY (kit_id) REFERENCES itens_cotacao(id)
 	)''')
 
-	# Migração: Adicionar coluna ICMS em itens_cotacao
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN icms REAL DEFAULT 0")
-	except sqlite3.OperationalError:
-		pass
-		
-	# Migração: Adicionar coluna ISS em itens_cotacao
-	try:
-		c.execute("ALTER TABLE itens_cotacao ADD COLUMN iss REAL DEFAULT 0")
-	except sqlite3.OperationalError:
-		pass
-
 	# Tabela Relatórios Técnicos - ATUALIZADA com campos das abas 2 e 3
 	c.execute('''CREATE TABLE IF NOT EXISTS relatorios_tecnicos (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -349,15 +417,461 @@ def criar_banco():
 		FOREIGN KEY (tecnico_id) REFERENCES usuarios(id)
 	)''')
 
+	# Bancos criados por versões antigas podem não ter as colunas abaixo
+	for tabela, definicao in (
+		("usuarios", "template_personalizado BOOLEAN DEFAULT 0"),
+		("usuarios", "template_image_path TEXT"),
+		("cotacoes", "esboco_servico TEXT"),
+		("cotacoes", "relacao_pecas_substituir TEXT"),
+		("itens_cotacao", "tipo_operacao TEXT DEFAULT 'Compra'"),
+		("cotacoes", "tipo_cotacao TEXT DEFAULT 'Compra'"),
+		("cotacoes", "locacao_valor_mensal REAL"),
+		("cotacoes", "locacao_data_inicio DATE"),
+		("cotacoes", "locacao_data_fim DATE"),
+		("cotacoes", "locacao_qtd_meses INTEGER"),
+		("cotacoes", "locacao_nome_equipamento TEXT"),
+		("cotacoes", "locacao_imagem_path TEXT"),
+		("cotacoes", "contato_nome TEXT"),
+		("itens_cotacao", "locacao_data_inicio DATE"),
+		("itens_cotacao", "locacao_data_fim DATE"),
+		("itens_cotacao", "locacao_qtd_meses INTEGER"),
+		("itens_cotacao", "locacao_imagem_path TEXT"),
+		("produtos", "esboco_servico TEXT"),
+		("produtos", "categoria TEXT DEFAULT 'Geral'"),
+		("itens_cotacao", "icms REAL DEFAULT 0"),
+		("itens_cotacao", "iss REAL DEFAULT 0"),
+	):
+		_adicionar_coluna(c, tabela, definicao)
+
+
+def _migracao_002_indices(c):
+	"""Índices secundários usados pelas listagens, filtros e junções."""
+	indices = (
+		# Listagens de cotações: ordenação por data com desempate por id (paginação)
+		"CREATE INDEX IF NOT EXISTS idx_cotacoes_created_at ON cotacoes(created_at, id)",
+		"CREATE INDEX IF NOT EXISTS idx_cotacoes_cliente ON cotacoes(cliente_id, created_at)",
+		"CREATE INDEX IF NOT EXISTS idx_cotacoes_responsavel ON cotacoes(responsavel_id, created_at)",
+		"CREATE INDEX IF NOT EXISTS idx_cotacoes_status_validade ON cotacoes(status, data_validade)",
+		"CREATE INDEX IF NOT EXISTS idx_cotacoes_validade ON cotacoes(data_validade)",
+		"CREATE INDEX IF NOT EXISTS idx_itens_cotacao_cotacao ON itens_cotacao(cotacao_id, id)",
+		"CREATE INDEX IF NOT EXISTS idx_kit_items_kit ON kit_items(kit_id, produto_id, quantidade)",
+		"CREATE INDEX IF NOT EXISTS idx_kit_items_produto ON kit_items(produto_id)",
+		"CREATE INDEX IF NOT EXISTS idx_contatos_cliente ON contatos(cliente_id, nome)",
+		"CREATE INDEX IF NOT EXISTS idx_eventos_campo_relatorio ON eventos_campo(relatorio_id, data_hora)",
+		"CREATE INDEX IF NOT EXISTS idx_relatorios_cliente ON relatorios_tecnicos(cliente_id, created_at)",
+		"CREATE INDEX IF NOT EXISTS idx_relatorios_created_at ON relatorios_tecnicos(created_at, id)",
+		"CREATE INDEX IF NOT EXISTS idx_produtos_tipo_nome ON produtos(tipo, ativo, nome)",
+		"CREATE INDEX IF NOT EXISTS idx_clientes_nome ON clientes(nome)",
+		# permissoes_usuarios(usuario_id) já é coberto por UNIQUE(usuario_id, modulo)
+	)
+	for sql in indices:
+		c.execute(sql)
+
+
+# Contadores mantidos por triggers em stats_summary. Escopos: 'geral' (id 0),
+# 'responsavel' (id do usuário) e 'cliente' (id do cliente).
+STATS_COLUNAS = (
+	"clientes", "produtos_ativos", "cotacoes", "cotacoes_aprovadas", "cotacoes_rejeitadas",
+	"cotacoes_aberto", "valor_aprovado", "valor_aberto", "valor_rejeitado",
+	"valor_positivo_soma", "valor_positivo_qtd", "relatorios", "contatos",
+)
+STATS_VALORES = ("valor_aprovado", "valor_aberto", "valor_rejeitado", "valor_positivo_soma")
+
+
+def _stats_cotacao(r, sinal):
+	"""Contribuição de uma linha de cotacoes (r = NEW/OLD) para os contadores."""
+	def caso(condicao, valor="1"):
+		return f"{sinal}(CASE WHEN {condicao} THEN {valor} ELSE 0 END)"
+	valor = f"COALESCE({r}.valor_total, 0)"
+	return {
+		"cotacoes": f"{sinal}1",
+		"cotacoes_aprovadas": caso(f"{r}.status = 'Aprovada'"),
+		"cotacoes_rejeitadas": caso(f"{r}.status = 'Rejeitada'"),
+		"cotacoes_aberto": caso(f"{r}.status = 'Em Aberto'"),
+		"valor_aprovado": caso(f"{r}.status = 'Aprovada'", valor),
+		"valor_aberto": caso(f"{r}.status = 'Em Aberto'", valor),
+		"valor_rejeitado": caso(f"{r}.status = 'Rejeitada'", valor),
+		"valor_positivo_soma": caso(f"{r}.valor_total > 0", valor),
+		"valor_positivo_qtd": caso(f"{r}.valor_total > 0"),
+	}
+
+
+def _stats_upsert(escopo, escopo_id, deltas):
+	"""INSERT ... ON CONFLICT que soma ``deltas`` {coluna: expressão} no escopo."""
+	colunas = ", ".join(deltas)
+	valores = ", ".join(deltas.values())
+	somas = ", ".join(f"{col} = {col} + excluded.{col}" for col in deltas)
+	return (f"INSERT INTO stats_summary (escopo, escopo_id, {colunas}) "
+			f"VALUES ('{escopo}', COALESCE({escopo_id}, 0), {valores}) "
+			f"ON CONFLICT(escopo, escopo_id) DO UPDATE SET {somas};")
+
+
+def _stats_triggers():
+	"""(nome, evento, corpo) dos triggers que mantêm stats_summary."""
+	def escopos(r, deltas, cliente=True, responsavel=True):
+		corpo = [_stats_upsert("geral", "0", deltas)]
+		if responsavel:
+			corpo.append(_stats_upsert("responsavel", f"{r}.responsavel_id", deltas))
+		if cliente:
+			corpo.append(_stats_upsert("cliente", f"{r}.cliente_id", deltas))
+		return corpo
+
+	cot_cols = "status, valor_total, cliente_id, responsavel_id"
+	rel_cols = "cliente_id, responsavel_id"
+	return (
+		("trg_stats_cotacoes_ins", "AFTER INSERT ON cotacoes", escopos("NEW", _stats_cotacao("NEW", "+"))),
+		("trg_stats_cotacoes_del", "AFTER DELETE ON cotacoes", escopos("OLD", _stats_cotacao("OLD", "-"))),
+		("trg_stats_cotacoes_upd", f"AFTER UPDATE OF {cot_cols} ON cotacoes",
+		 escopos("OLD", _stats_cotacao("OLD", "-")) + escopos("NEW", _stats_cotacao("NEW", "+"))),
+		("trg_stats_relatorios_ins", "AFTER INSERT ON relatorios_tecnicos", escopos("NEW", {"relatorios": "1"})),
+		("trg_stats_relatorios_del", "AFTER DELETE ON relatorios_tecnicos", escopos("OLD", {"relatorios": "-1"})),
+		("trg_stats_relatorios_upd", f"AFTER UPDATE OF {rel_cols} ON relatorios_tecnicos",
+		 escopos("OLD", {"relatorios": "-1"}) + escopos("NEW", {"relatorios": "1"})),
+		("trg_stats_clientes_ins", "AFTER INSERT ON clientes", [_stats_upsert("geral", "0", {"clientes": "1"})]),
+		("trg_stats_clientes_del", "AFTER DELETE ON clientes", [_stats_upsert("geral", "0", {"clientes": "-1"})]),
+		("trg_stats_produtos_ins", "AFTER INSERT ON produtos",
+		 [_stats_upsert("geral", "0", {"produtos_ativos": "(CASE WHEN NEW.ativo = 1 THEN 1 ELSE 0 END)"})]),
+		("trg_stats_produtos_del", "AFTER DELETE ON produtos",
+		 [_stats_upsert("geral", "0", {"produtos_ativos": "-(CASE WHEN OLD.ativo = 1 THEN 1 ELSE 0 END)"})]),
+		("trg_stats_produtos_upd", "AFTER UPDATE OF ativo ON produtos",
+		 [_stats_upsert("geral", "0", {"produtos_ativos":
+			"(CASE WHEN NEW.ativo = 1 THEN 1 ELSE 0 END) - (CASE WHEN OLD.ativo = 1 THEN 1 ELSE 0 END)"})]),
+		("trg_stats_contatos_ins", "AFTER INSERT ON contatos", [_stats_upsert("cliente", "NEW.cliente_id", {"contatos": "1"})]),
+		("trg_stats_contatos_del", "AFTER DELETE ON contatos", [_stats_upsert("cliente", "OLD.cliente_id", {"contatos": "-1"})]),
+		("trg_stats_contatos_upd", "AFTER UPDATE OF cliente_id ON contatos",
+		 [_stats_upsert("cliente", "OLD.cliente_id", {"contatos": "-1"}),
+		  _stats_upsert("cliente", "NEW.cliente_id", {"contatos": "1"})]),
+	)
+
+
+def recalcular_stats_summary(c):
+	"""Reconstrói stats_summary a partir das tabelas (consultas agrupadas)."""
+	c.execute("DELETE FROM stats_summary")
+	deltas = _stats_cotacao("cot", "")
+	cot_cols = ", ".join(deltas)
+	agregados_cotacao = ", ".join(f"SUM({expr})" for expr in deltas.values())
+	for escopo, chave in (("geral", "0"), ("responsavel", "cot.responsavel_id"), ("cliente", "cot.cliente_id")):
+		c.execute(f"""
+			INSERT INTO stats_summary (escopo, escopo_id, {cot_cols})
+			SELECT '{escopo}', COALESCE({chave}, 0), {agregados_cotacao}
+			FROM cotacoes cot WHERE true GROUP BY COALESCE({chave}, 0)
+		""")
+	for escopo, chave in (("geral", "0"), ("responsavel", "responsavel_id"), ("cliente", "cliente_id")):
+		c.execute(f"""
+			INSERT INTO stats_summary (escopo, escopo_id, relatorios)
+			SELECT '{escopo}', COALESCE({chave}, 0), COUNT(*) FROM relatorios_tecnicos
+			WHERE true GROUP BY COALESCE({chave}, 0)
+			ON CONFLICT(escopo, escopo_id) DO UPDATE SET relatorios = excluded.relatorios
+		""")
+	c.execute("""
+		INSERT INTO stats_summary (escopo, escopo_id, clientes, produtos_ativos)
+		VALUES ('geral', 0, (SELECT COUNT(*) FROM clientes),
+				(SELECT COUNT(*) FROM produtos WHERE ativo = 1))
+		ON CONFLICT(escopo, escopo_id) DO UPDATE SET
+			clientes = excluded.clientes, produtos_ativos = excluded.produtos_ativos
+	""")
+	c.execute("""
+		INSERT INTO stats_summary (escopo, escopo_id, contatos)
+		SELECT 'cliente', COALESCE(cliente_id, 0), COUNT(*) FROM contatos
+		WHERE true GROUP BY COALESCE(cliente_id, 0)
+		ON CONFLICT(escopo, escopo_id) DO UPDATE SET contatos = excluded.contatos
+	""")
+
+
+def _migracao_003_stats_summary(c):
+	"""Resumo de contadores do dashboard mantido por triggers."""
+	colunas = ",\n\t\t".join(
+		f"{col} {'REAL' if col in STATS_VALORES else 'INTEGER'} NOT NULL DEFAULT 0" for col in STATS_COLUNAS
+	)
+	c.execute(f"""CREATE TABLE IF NOT EXISTS stats_summary (
+		escopo TEXT NOT NULL,
+		escopo_id INTEGER NOT NULL,
+		{colunas},
+		PRIMARY KEY (escopo, escopo_id)
+	) WITHOUT ROWID""")
+	for nome, evento, corpo in _stats_triggers():
+		c.execute(f"DROP TRIGGER IF EXISTS {nome}")
+		c.execute(f"CREATE TRIGGER {nome} {evento} FOR EACH ROW BEGIN\n\t" + "\n\t".join(corpo) + "\nEND")
+	recalcular_stats_summary(c)
+
+
+def _migracao_004_indice_expiracao(c):
+	"""Índice parcial das cotações em aberto com validade (verificação de expiração)."""
+	# As consultas precisam repetir exatamente este WHERE para usar o índice
+	c.execute("""CREATE INDEX IF NOT EXISTS idx_cotacoes_abertas_validade
+		ON cotacoes(data_validade, id)
+		WHERE status = 'Em Aberto' AND data_validade IS NOT NULL""")
+
+
+def _juntar(*expressoes):
+	"""Concatena colunas de texto (NULL vira vazio) separadas por espaço."""
+	return " || ' ' || ".join(f"COALESCE({e}, '')" for e in expressoes)
+
+
+# Índice de busca (FTS5): rowid = id * BUSCA_FATOR + código da entidade, para
+# localizar/remover a linha de um registro sem varrer o índice.
+BUSCA_FATOR = 8
+BUSCA_ENTIDADES = {
+	# entidade: (código, tabela, título, conteúdo, info, colunas que disparam reindexação)
+	"cliente": (1, "clientes", "r.nome",
+		_juntar("r.nome_fantasia", "r.cnpj",
+			"replace(replace(replace(r.cnpj, '.', ''), '/', ''), '-', '')", "r.cidade"),
+		"r.cidade", "nome, nome_fantasia, cnpj, cidade"),
+	"cotacao": (2, "cotacoes", "r.numero_proposta",
+		_juntar("r.modelo_compressor", "r.numero_serie_compressor", "r.locacao_nome_equipamento",
+			"(SELECT group_concat(i.item_nome, ' ') FROM itens_cotacao i WHERE i.cotacao_id = r.id)"),
+		"COALESCE(r.tipo_cotacao, 'Compra')",
+		"numero_proposta, modelo_compressor, numero_serie_compressor, locacao_nome_equipamento, tipo_cotacao"),
+	"produto": (3, "produtos", "r.nome",
+		_juntar("r.tipo", "r.categoria", "r.ncm", "r.descricao"),
+		"r.tipo", "nome, tipo, categoria, ncm, descricao"),
+	"relatorio": (4, "relatorios_tecnicos", "r.numero_relatorio",
+		_juntar("r.tipo_servico", "r.descricao_servico", "r.condicao_encontrada", "r.placa_identificacao",
+			"r.acoplamento", "r.aspectos_rotores", "r.valvulas_acopladas",
+			"r.parafusos_pinos", "r.superficie_vedacao", "r.engrenagens", "r.bico_injetor",
+			"r.rolamentos", "r.aspecto_oleo", "r.interf_desmontagem", "r.aspecto_rotores_aba3",
+			"r.aspecto_carcaca", "r.interf_mancais", "r.galeria_hidraulica",
+			"r.servicos_propostos", "r.pecas_recomendadas"),
+		"r.tipo_servico",
+		"numero_relatorio, tipo_servico, descricao_servico, condicao_encontrada, placa_identificacao, "
+		"acoplamento, aspectos_rotores, valvulas_acopladas, parafusos_pinos, superficie_vedacao, "
+		"engrenagens, bico_injetor, rolamentos, aspecto_oleo, interf_desmontagem, aspecto_rotores_aba3, "
+		"aspecto_carcaca, interf_mancais, galeria_hidraulica, servicos_propostos, pecas_recomendadas"),
+}
+
+
+def _busca_indexar(entidade, registro_id):
+	"""SQL que (re)insere no índice a linha do registro ``registro_id`` (expressão)."""
+	codigo, tabela, titulo, conteudo, info, _ = BUSCA_ENTIDADES[entidade]
+	return (f"INSERT INTO busca_fts (rowid, titulo, conteudo, info) "
+			f"SELECT r.id * {BUSCA_FATOR} + {codigo}, {titulo}, {conteudo}, {info} "
+			f"FROM {tabela} r WHERE r.id = {registro_id};")
+
+
+def _busca_remover(entidade, registro_id):
+	codigo = BUSCA_ENTIDADES[entidade][0]
+	return f"DELETE FROM busca_fts WHERE rowid = {registro_id} * {BUSCA_FATOR} + {codigo};"
+
+
+def _busca_triggers():
+	"""(nome, evento, corpo) dos triggers que mantêm busca_fts."""
+	triggers = []
+	for entidade, (_codigo, tabela, _t, _c, _i, colunas) in BUSCA_ENTIDADES.items():
+		triggers += [
+			(f"trg_busca_{tabela}_ins", f"AFTER INSERT ON {tabela}", [_busca_indexar(entidade, "NEW.id")]),
+			(f"trg_busca_{tabela}_upd", f"AFTER UPDATE OF {colunas} ON {tabela}",
+			 [_busca_remover(entidade, "OLD.id"), _busca_indexar(entidade, "NEW.id")]),
+			(f"trg_busca_{tabela}_del", f"AFTER DELETE ON {tabela}", [_busca_remover(entidade, "OLD.id")]),
+		]
+	# Os nomes dos itens entram na linha da cotação por reindexar_cotacao, uma vez por gravação
+	return triggers
+
+
+def reindexar_cotacao(c, cotacao_id):
+	"""Refaz a linha da cotação no índice de busca (chamar após gravar os itens, sem commit)."""
+	try:
+		c.execute(_busca_remover("cotacao", "?"), (cotacao_id,))
+		c.execute(_busca_indexar("cotacao", "?"), (cotacao_id,))
+	except sqlite3.OperationalError:
+		pass  # SQLite sem FTS5: não há índice a manter
+
+
+def recriar_indice_busca(c):
+	"""Reconstrói busca_fts a partir das tabelas."""
+	c.execute("DELETE FROM busca_fts")
+	for entidade, (codigo, tabela, titulo, conteudo, info, _) in BUSCA_ENTIDADES.items():
+		c.execute(f"INSERT INTO busca_fts (rowid, titulo, conteudo, info) "
+				  f"SELECT r.id * {BUSCA_FATOR} + {codigo}, {titulo}, {conteudo}, {info} FROM {tabela} r")
+	c.execute("INSERT INTO busca_fts (busca_fts) VALUES ('optimize')")
+
+
+def _migracao_005_busca_fts(c):
+	"""Índice de busca textual (FTS5) de clientes, cotações, produtos e relatórios."""
+	try:
+		# remove_diacritics: "manutencao" encontra "manutenção"; prefix acelera buscas por prefixo
+		c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS busca_fts USING fts5(
+			titulo, conteudo, info UNINDEXED,
+			tokenize = "unicode61 remove_diacritics 2",
+			prefix = '2 3'
+		)""")
+	except sqlite3.OperationalError as e:
+		# SQLite sem FTS5: as buscas dos módulos continuam com LIKE
+		log.warning("Índice de busca indisponível: %s", e)
+		return
+	for nome, evento, corpo in _busca_triggers():
+		c.execute(f"DROP TRIGGER IF EXISTS {nome}")
+		c.execute(f"CREATE TRIGGER {nome} {evento} FOR EACH ROW BEGIN\n\t" + "\n\t".join(corpo) + "\nEND")
+	recriar_indice_busca(c)
+
+
+# Séries de numeração: prefixo -> (tabela, coluna do número). O número é
+# "PREFIXO-000123"; a sequência guarda o último valor por prefixo, filial e ano
+# (0 = série única, como as atuais).
+SEQUENCIAS = {
+	"PROD": ("cotacoes", "numero_proposta"),
+	"PSER": ("cotacoes", "numero_proposta"),
+	"LOC": ("cotacoes", "numero_proposta"),
+	"REL": ("relatorios_tecnicos", "numero_relatorio"),
+}
+
+
+def _migracao_006_sequencias(c):
+	"""Tabela de sequências de numeração (propostas e relatórios), iniciada pelos maiores números atuais."""
+	c.execute("""CREATE TABLE IF NOT EXISTS sequences (
+		prefixo TEXT NOT NULL,
+		filial_id INTEGER NOT NULL DEFAULT 0,
+		ano INTEGER NOT NULL DEFAULT 0,
+		ultimo INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (prefixo, filial_id, ano)
+	) WITHOUT ROWID""")
+	# Última varredura completa: daqui em diante o próximo número é uma leitura por chave
+	for prefixo, (tabela, coluna) in SEQUENCIAS.items():
+		inicio = len(prefixo) + 2
+		c.execute(f"""
+			INSERT INTO sequences (prefixo, filial_id, ano, ultimo)
+			SELECT ?, 0, 0, COALESCE(MAX(CAST(SUBSTR({coluna}, {inicio}) AS INTEGER)), 0)
+			FROM {tabela} WHERE {coluna} LIKE ? || '-%'
+			ON CONFLICT (prefixo, filial_id, ano) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)
+		""", (prefixo, prefixo))
+
+
+def _migracao_007_anexos(c):
+	"""Manifesto do repositório de anexos (arquivos indexados pelo hash do conteúdo)."""
+	c.execute("""CREATE TABLE IF NOT EXISTS anexos_blobs (
+		hash TEXT PRIMARY KEY,
+		caminho TEXT NOT NULL,
+		tamanho INTEGER NOT NULL,
+		mime TEXT,
+		largura INTEGER,
+		altura INTEGER,
+		miniatura BLOB,
+		refs INTEGER NOT NULL DEFAULT 0,
+		criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+		atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+	)""")
+	# Candidatos da coleta de lixo: só os sem referência
+	c.execute("CREATE INDEX IF NOT EXISTS idx_anexos_blobs_orfaos ON anexos_blobs(atualizado_em) WHERE refs <= 0")
+
+
+def _anexos_legados(valor, aba):
+	"""Lista de anexos de uma coluna anexos_abaN (JSON ou o formato antigo separado por ';')."""
+	if not valor:
+		return []
+	try:
+		lista = json.loads(valor)
+	except (TypeError, ValueError):
+		lista = [p for p in str(valor).split(';') if p]
+	anexos = []
+	for anexo in lista if isinstance(lista, list) else []:
+		if not isinstance(anexo, dict):
+			anexo = {"nome": os.path.basename(str(anexo)), "caminho": str(anexo), "descricao": f"Anexo da Aba {aba}"}
+		anexos.append(anexo)
+	return anexos
+
+
+def _migracao_008_relatorio_anexos(c):
+	"""Anexos dos relatórios em tabela própria, no lugar das colunas JSON anexos_aba1..4."""
+	c.execute("""CREATE TABLE IF NOT EXISTS relatorio_anexos (
+		id INTEGER PRIMARY KEY AUTOINCREMENT,
+		relatorio_id INTEGER NOT NULL,
+		aba INTEGER NOT NULL,
+		ordem INTEGER NOT NULL,
+		nome TEXT,
+		caminho TEXT,
+		descricao TEXT,
+		hash TEXT,
+		FOREIGN KEY (relatorio_id) REFERENCES relatorios_tecnicos(id)
+	)""")
+	c.execute("CREATE INDEX IF NOT EXISTS idx_relatorio_anexos_relatorio ON relatorio_anexos(relatorio_id, aba, ordem)")
+	c.execute("SELECT id, anexos_aba1, anexos_aba2, anexos_aba3, anexos_aba4 FROM relatorios_tecnicos")
+	linhas = []
+	for relatorio_id, *colunas in c.fetchall():
+		for aba, valor in enumerate(colunas, 1):
+			for ordem, anexo in enumerate(_anexos_legados(valor, aba)):
+				caminho = anexo.get("caminho") or anexo.get("path")
+				linhas.append((relatorio_id, aba, ordem, anexo.get("nome") or os.path.basename(str(caminho or "")),
+							   caminho, anexo.get("descricao"), anexo.get("hash")))
+	c.executemany("""INSERT INTO relatorio_anexos (relatorio_id, aba, ordem, nome, caminho, descricao, hash)
+		VALUES (?, ?, ?, ?, ?, ?, ?)""", linhas)
+	# Uma única fonte: as colunas antigas ficam vazias
+	c.execute("""UPDATE relatorios_tecnicos SET anexos_aba1 = NULL, anexos_aba2 = NULL, anexos_aba3 = NULL, anexos_aba4 = NULL
+		WHERE COALESCE(anexos_aba1, anexos_aba2, anexos_aba3, anexos_aba4) IS NOT NULL""")
+
+
+def _migracao_009_pdf_fingerprint(c):
+	"""Impressão digital das entradas do PDF gravado em caminho_arquivo_pdf."""
+	_adicionar_coluna(c, "cotacoes", "pdf_fingerprint TEXT")
+
+
+def _migracao_010_relatorio_pdf_fingerprint(c):
+	"""Impressão digital das entradas do PDF gravado de cada relatório técnico."""
+	_adicionar_coluna(c, "relatorios_tecnicos", "pdf_fingerprint TEXT")
+
+
+# Migrações em ordem. Cada uma é aplicada uma única vez e registrada em
+# schema_version; novas alterações de esquema devem entrar no fim da lista.
+MIGRACOES = [
+	(1, "Esquema base", _migracao_001_esquema_base),
+	(2, "Índices secundários", _migracao_002_indices),
+	(3, "Resumo de estatísticas (stats_summary)", _migracao_003_stats_summary),
+	(4, "Índice parcial de expiração de cotações", _migracao_004_indice_expiracao),
+	(5, "Índice de busca textual (FTS5)", _migracao_005_busca_fts),
+	(6, "Sequências de numeração", _migracao_006_sequencias),
+	(7, "Repositório de anexos por conteúdo", _migracao_007_anexos),
+	(8, "Tabela de anexos dos relatórios", _migracao_008_relatorio_anexos),
+	(9, "Impressão digital do PDF das cotações", _migracao_009_pdf_fingerprint),
+	(10, "Impressão digital do PDF dos relatórios", _migracao_010_relatorio_pdf_fingerprint),
+]
+
+
+def obter_versao_esquema(conn):
+	"""Retorna a maior versão de migração registrada (0 para banco novo)."""
+	c = conn.cursor()
+	c.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+		version INTEGER PRIMARY KEY,
+		descricao TEXT,
+		aplicado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+	)""")
+	c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+	return c.fetchone()[0]
+
+
+def aplicar_migracoes(conn):
+	"""Aplica as migrações pendentes, cada uma na sua própria transação."""
+	versao_atual = obter_versao_esquema(conn)
 	conn.commit()
-	conn.close()
+	aplicadas = []
+	for versao, descricao, migracao in MIGRACOES:
+		if versao <= versao_atual:
+			continue
+		c = conn.cursor()
+		try:
+			c.execute("BEGIN")
+			migracao(c)
+			c.execute("INSERT INTO schema_version (version, descricao) VALUES (?, ?)", (versao, descricao))
+			conn.commit()
+		except sqlite3.Error:
+			conn.rollback()
+			raise
+		aplicadas.append(versao)
+	if aplicadas:
+		conn.execute("PRAGMA optimize")
+	return aplicadas
+
+
+def criar_banco():
+	conn = get_connection()
+	try:
+		aplicar_migracoes(conn)
+	finally:
+		conn.close()
 	
 	# Criar usuário master se não existir
 	criar_usuario_master()
 
 def criar_usuario_master():
 	"""Criar usuário master padrão se não existir"""
-	conn = sqlite3.connect(DB_NAME)
+	conn = get_connection()
 	c = conn.cursor()
 	
 	try:
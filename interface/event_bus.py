@@ -0,0 +1,109 @@
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class Event:
+    """Evento entregue aos assinantes de um tópico.
+
+    ``ids`` reúne os registros alterados por todas as publicações agrupadas
+    (vazio quando alguma delas não informou ids: o assinante deve recarregar
+    tudo). ``count`` é quantas publicações foram agrupadas.
+    """
+
+    __slots__ = ("topic", "ids", "count", "data")
+
+    def __init__(self, topic, ids=None, data=None):
+        self.topic = topic
+        self.ids = set(ids) if ids is not None else None
+        self.count = 1
+        self.data = data
+
+    @property
+    def full_refresh(self):
+        return self.ids is None
+
+    def merge(self, ids=None, data=None):
+        self.count += 1
+        if self.ids is not None:
+            if ids is None:
+                self.ids = None
+            else:
+                self.ids.update(ids)
+        if data is not None:
+            self.data = data
+
+    def __repr__(self):
+        return f"Event({self.topic!r}, ids={self.ids!r}, count={self.count})"
+
+
+class EventBus:
+    """Barramento de eventos entre módulos, por tópico e com entrega adiada.
+
+    ``publish`` apenas enfileira: publicações do mesmo tópico até a próxima
+    folga do Tk (``root.after_idle``) viram um único Event com a união dos
+    ids, entregue uma vez a cada assinante. Assim salvar uma cotação retorna
+    antes de os outros módulos recarregarem, e rajadas (importações em lote)
+    disparam uma única atualização. Sem ``root`` a entrega é imediata.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+        self._subscribers = []  # (callback, frozenset de tópicos ou None = todos)
+        self._observers = []    # idem, chamados já no publish
+        self._pending = {}      # tópico -> Event, na ordem da primeira publicação
+        self._scheduled = False
+
+    def subscribe(self, callback, topics=None):
+        """Registra ``callback(topic, event)`` para ``topics`` (None = todos)."""
+        if isinstance(topics, str):
+            topics = (topics,)
+        self._subscribers.append((callback, frozenset(topics) if topics is not None else None))
+
+    def observe(self, callback, topics=None):
+        """Registra ``callback(topic, ids)`` chamado no próprio ``publish``, sem agrupar.
+
+        Para invalidar caches: quem publicou e relê os dados logo em seguida
+        já enxerga a invalidação, antes da entrega adiada aos assinantes.
+        """
+        if isinstance(topics, str):
+            topics = (topics,)
+        self._observers.append((callback, frozenset(topics) if topics is not None else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, topics) for cb, topics in self._subscribers if cb != callback]
+        self._observers = [(cb, topics) for cb, topics in self._observers if cb != callback]
+
+    def publish(self, topic, ids=None, data=None):
+        """Agenda o evento; ``ids`` são os registros afetados (ou None)."""
+        if ids is not None and not isinstance(ids, (list, tuple, set, frozenset)):
+            ids = (ids,)
+        for callback, topics in self._observers:
+            if topics is None or topic in topics:
+                try:
+                    callback(topic, ids)
+                except Exception:
+                    log.exception("Erro ao observar evento %s em %r", topic, callback)
+        pending = self._pending.get(topic)
+        if pending is not None:
+            pending.merge(ids, data)
+            return
+        self._pending[topic] = Event(topic, ids, data)
+        if self.root is None:
+            self.flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            self.root.after_idle(self.flush)
+
+    def flush(self):
+        """Entrega agora os eventos pendentes (chamado pelo after_idle)."""
+        self._scheduled = False
+        pending, self._pending = self._pending, {}
+        for topic, event in pending.items():
+            listeners = [cb for cb, topics in self._subscribers if topics is None or topic in topics]
+            log.debug("Entregando %r a %d assinantes", event, len(listeners))
+            for callback in listeners:
+                try:
+                    callback(topic, event)
+                except Exception:
+                    log.exception("Erro ao processar evento %s em %r", topic, callback)
@@ -0,0 +1,160 @@
+import tkinter as tk
+from tkinter import ttk
+from utils.theme import PALETTE
+from utils.busca import buscar
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+ROTULOS = {
+    "cliente": "Cliente",
+    "cotacao": "Cotação",
+    "produto": "Produto",
+    "relatorio": "Relatório",
+}
+
+
+class GlobalSearchBox(tk.Frame):
+    """Campo de busca da janela principal com resultados de todas as entidades.
+
+    A consulta (índice FTS) roda no TaskExecutor após uma pausa na digitação;
+    respostas de termos antigos são descartadas. ``on_open(resultado)`` é
+    chamado ao escolher um item da lista.
+    """
+
+    PLACEHOLDER = "Buscar clientes, cotações, produtos, relatórios..."
+    DEBOUNCE_MS = 250
+    MAX_VISIBLE = 12
+
+    def __init__(self, parent, main_window, on_open, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.main_window = main_window
+        self.on_open = on_open
+        self._after_id = None
+        self._seq = 0
+        self._results = []
+        self._popup = None
+
+        self.var = tk.StringVar()
+        self.entry = ttk.Entry(self, textvariable=self.var, width=48)
+        self.entry.pack(fill="x", ipady=3)
+        self._show_placeholder()
+
+        self.entry.bind('<FocusIn>', self._on_focus_in)
+        self.entry.bind('<FocusOut>', self._on_focus_out)
+        self.entry.bind('<KeyRelease>', self._on_key)
+        self.entry.bind('<Return>', lambda e: self._search_now())
+        self.entry.bind('<Down>', lambda e: self._focus_results())
+        self.entry.bind('<Escape>', lambda e: self._close_popup())
+
+    # --- Placeholder ---
+    def _show_placeholder(self):
+        if not self.var.get():
+            self.entry.insert(0, self.PLACEHOLDER)
+
+    def _term(self):
+        text = self.var.get().strip()
+        return "" if text == self.PLACEHOLDER else text
+
+    def _on_focus_in(self, _e):
+        if self.var.get() == self.PLACEHOLDER:
+            self.entry.delete(0, 'end')
+
+    def _on_focus_out(self, _e):
+        # Adiado para o clique na lista de resultados ser processado antes
+        self.after(150, self._close_if_unfocused)
+        if not self.var.get().strip():
+            self._show_placeholder()
+
+    # --- Busca ---
+    def _on_key(self, event):
+        if event.keysym in ('Return', 'Escape', 'Down', 'Up', 'Tab'):
+            return
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(self.DEBOUNCE_MS, self._search_now)
+
+    def _search_now(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        term = self._term()
+        self._seq += 1
+        if not term:
+            self._close_popup()
+            return
+        seq = self._seq
+        self.main_window.submit_task(
+            buscar, term, description="Busca",
+            on_success=lambda results: self._show_results(seq, results),
+            on_error=lambda e: log.warning("Falha na busca global: %s", e),
+        )
+
+    def _show_results(self, seq, results):
+        if seq != self._seq:
+            return  # Resposta de um termo já substituído
+        self._results = results
+        tree = self._ensure_popup()
+        tree.delete(*tree.get_children())
+        if not results:
+            tree.insert("", "end", values=("", "Nenhum resultado encontrado", ""))
+        for index, result in enumerate(results):
+            tree.insert("", "end", iid=str(index), values=(
+                ROTULOS.get(result.entidade, result.entidade),
+                result.titulo,
+                result.info or "",
+            ))
+        tree.configure(height=min(max(len(results), 1), self.MAX_VISIBLE))
+        self._place_popup()
+
+    # --- Lista de resultados ---
+    def _ensure_popup(self):
+        if self._popup is not None and self._popup.winfo_exists():
+            return self._tree
+        self._popup = tk.Toplevel(self)
+        self._popup.overrideredirect(True)
+        self._popup.configure(bg=PALETTE["border"])
+        self._tree = ttk.Treeview(self._popup, columns=("tipo", "titulo", "info"), show="headings",
+                                  selectmode="browse")
+        for col, text, width in (("tipo", "Tipo", 90), ("titulo", "Registro", 260), ("info", "Detalhe", 150)):
+            self._tree.heading(col, text=text)
+            self._tree.column(col, width=width, anchor="w")
+        self._tree.pack(fill="both", expand=True, padx=1, pady=1)
+        self._tree.bind('<Double-1>', lambda e: self._open_selected())
+        self._tree.bind('<Return>', lambda e: self._open_selected())
+        self._tree.bind('<Escape>', lambda e: self._close_popup())
+        self._tree.bind('<FocusOut>', lambda e: self.after(150, self._close_if_unfocused))
+        return self._tree
+
+    def _place_popup(self):
+        self.update_idletasks()
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height() + 2
+        self._popup.geometry(f"+{x}+{y}")
+        self._popup.deiconify()
+        self._popup.lift()
+
+    def _focus_results(self):
+        if self._popup is not None and self._popup.winfo_exists() and self._results:
+            self._tree.focus_set()
+            self._tree.selection_set("0")
+            self._tree.focus("0")
+
+    def _open_selected(self):
+        selected = self._tree.selection()
+        if not selected or not selected[0].isdigit():
+            return
+        result = self._results[int(selected[0])]
+        self._close_popup()
+        self.on_open(result)
+
+    def _close_if_unfocused(self):
+        focus = self.focus_get()
+        if focus is self.entry or (self._popup is not None and focus is getattr(self, '_tree', None)):
+            return
+        self._close_popup()
+
+    def _close_popup(self):
+        if self._popup is not None and self._popup.winfo_exists():
+            self._popup.destroy()
+        self._popup = None
@@ -3,7 +3,7 @@ from tkinter import ttk, messagebox
 import sqlite3
 import hashlib
 
-from database import DB_NAME, criar_banco
+from database import DB_NAME, criar_banco, get_connection
 from utils.theme import apply_theme, PALETTE, FONTS
 from interface.main_window import MainWindow
 
@@ -107,7 +107,7 @@ class LoginWindow:
             pass
 
     def _ensure_default_admin(self):
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         try:
             c.execute("SELECT COUNT(*) FROM usuarios")
@@ -136,7 +136,7 @@ class LoginWindow:
 
         password_hash = hashlib.sha256(password.encode()).hexdigest()
 
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         try:
             c.execute(
@@ -1,22 +1,54 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.theme import apply_theme, style_header_frame, PALETTE, FONTS
+from interface.task_executor import TaskExecutor, StatusBar
+from interface.event_bus import EventBus
+from interface.global_search import GlobalSearchBox
+from interface.reference_cache import ReferenceCache
+from interface.read_only import ReadOnlyGuard
+from utils.cotacao_validator import (verificar_expiracoes_agendado, segundos_ate_proxima_verificacao,
+                                     invalidar_fila_vencimentos)
+from utils.anexos import coletar_lixo as coletar_lixo_anexos
+from pdf_generators.image_assets import limpar_derivados
+from utils.kits import invalidar_composicoes
+from utils.logs import get_logger
+
+log = get_logger(__name__)
 
 class MainWindow:
+    # Coleta de lixo do repositório de anexos: primeira rodada após a abertura, depois periódica
+    GC_ANEXOS_ATRASO_MS = 60 * 1000
+    GC_ANEXOS_INTERVALO_MS = 6 * 60 * 60 * 1000
+
     def __init__(self, root, user_id, role, nome_completo):
         self.root = root
         self.user_id = user_id
         self.role = role
         self.nome_completo = nome_completo
         
-        # Sistema de eventos para comunicação entre módulos
-        self.event_listeners = []
+        # Sistema de eventos para comunicação entre módulos (entrega agrupada no ocioso do Tk)
+        self.event_bus = EventBus(self.root)
+        # Listas dos combos compartilhadas pelos módulos (invalidadas pelos eventos)
+        self.reference_cache = ReferenceCache(self.event_bus)
+        
+        # Execução de consultas/PDFs em segundo plano (resultados voltam via root.after)
+        self.task_executor = TaskExecutor(self.root)
+        # Modo somente leitura dos módulos (tag de bindings compartilhada)
+        self.read_only_guard = ReadOnlyGuard.for_widget(self.root)
         
         self.setup_main_window()
         self.create_main_ui()
         
+        # Cotações salvas podem mudar a fila de vencimentos
+        self.register_listener(lambda _t, _e: invalidar_fila_vencimentos(), ('cotacao_created',))
+        # Nome de produto ou composição de kit alterados em qualquer módulo
+        self.register_listener(lambda _t, _e: invalidar_composicoes(), ('produto_updated', 'produto_deleted'))
+        self.register_listener(self._on_permissoes_updated, ('permissoes_updated',))
+        self._agendar_verificacao_expiracao()
+        self.root.after(self.GC_ANEXOS_ATRASO_MS, self._coletar_lixo_anexos)
+        
         # Mostrar janela principal
         self.root.deiconify()
         
@@ -57,24 +89,64 @@ class MainWindow:
         except Exception:
             return self.role == role_name
         
-    def register_listener(self, listener_func):
-        """Registrar um listener para eventos do sistema"""
-        self.event_listeners.append(listener_func)
+    def register_listener(self, listener_func, topics=None):
+        """Registrar ``listener_func(event_type, event)`` para os tópicos (None = todos)"""
+        self.event_bus.subscribe(listener_func, topics)
         
-    def emit_event(self, event_type, data=None):
-        """Emitir um evento para todos os listeners"""
-        print(f"DEBUG MAIN_WINDOW: Emitindo evento '{event_type}' para {len(self.event_listeners)} listeners")
-        for i, listener in enumerate(self.event_listeners):
-            try:
-                print(f"DEBUG MAIN_WINDOW: Notificando listener {i}: {listener}")
-                listener(event_type, data)
-            except Exception as e:
-                print(f"Erro ao processar evento {event_type}: {e}")
+    def emit_event(self, event_type, data=None, ids=None):
+        """Publicar um evento; ``ids`` são os registros alterados (ver EventBus.publish)"""
+        log.debug("Publicando evento '%s' (ids=%s)", event_type, ids)
+        self.event_bus.publish(event_type, ids=ids, data=data)
+        
+    def _agendar_verificacao_expiracao(self):
+        """Verifica cotações expiradas em segundo plano e reagenda (intervalo ou meia-noite)."""
+        def concluir(expiradas):
+            if expiradas:
+                self.emit_event('cotacoes_expiradas', ids=[row[0] for row in expiradas])
+            self._proxima_expiracao()
+
+        def falhar(e):
+            log.warning("Falha na verificação de expiração: %s", e)
+            self._proxima_expiracao()
+
+        try:
+            self.submit_task(verificar_expiracoes_agendado, description="Verificando validade das cotações...",
+                             on_success=concluir, on_error=falhar)
+        except RuntimeError:
+            pass  # Executor encerrado (logout)
+
+    def _proxima_expiracao(self):
+        if self.task_executor.closed:
+            return
+        # +1s para cair depois do limite; após a meia-noite a próxima chamada já é devida
+        atraso_ms = int(segundos_ate_proxima_verificacao() * 1000) + 1000
+        self.root.after(atraso_ms, self._agendar_verificacao_expiracao)
+        
+    def _coletar_lixo_anexos(self):
+        """Remove anexos sem referência e derivados de imagem antigos em segundo plano e reagenda."""
+        if self.task_executor.closed:
+            return
+        try:
+            self.submit_task(coletar_lixo_anexos, description="Limpando anexos não utilizados...",
+                             on_error=lambda e: log.warning("Falha na limpeza de anexos: %s", e))
+            self.submit_task(limpar_derivados, description="Limpando cache de imagens...",
+                             on_error=lambda e: log.warning("Falha na limpeza do cache de imagens: %s", e))
+        except RuntimeError:
+            return  # Executor encerrado (logout)
+        self.root.after(self.GC_ANEXOS_INTERVALO_MS, self._coletar_lixo_anexos)
+        
+    def submit_task(self, func, *args, **kwargs):
+        """Executar func fora da thread da interface (ver TaskExecutor.submit)"""
+        return self.task_executor.submit(func, *args, **kwargs)
         
     def create_main_ui(self):
         # Frame superior com menu
         self.create_header()
 
+        # Barra de status (reservada antes do container para ficar no rodapé)
+        self.status_bar = StatusBar(self.root, self.task_executor)
+        self.status_bar.pack(side="bottom", fill="x")
+
         # Container com navegação lateral (vertical) + área principal (notebook)
         container = tk.Frame(self.root, bg=PALETTE["bg_app"]) 
         container.pack(fill="both", expand=True)
@@ -142,68 +214,201 @@ class MainWindow:
         logout_btn.bind("<Leave>", on_leave)
         
         logout_btn.pack(anchor="e", pady=(5, 0))
-        
+
+        # Busca global (centro do cabeçalho)
+        search_frame = tk.Frame(header_frame, bg=PALETTE["bg_header"])
+        search_frame.pack(side="left", expand=True, pady=16)
+        self.global_search = GlobalSearchBox(search_frame, self, self.abrir_resultado_busca,
+                                             bg=PALETTE["bg_header"])
+        self.global_search.pack()
+
+    # Módulo que abre cada tipo de resultado da busca global: (chave da aba, método)
+    BUSCA_DESTINOS = {
+        'cliente': ('clientes', 'carregar_cliente_para_edicao'),
+        'produto': ('produtos', 'carregar_produto_para_edicao'),
+        'relatorio': ('relatorios', 'carregar_relatorio_para_edicao'),
+        'cotacao_locacao': ('locacoes', '_carregar_cotacao'),
+        'cotacao_servicos': ('orcamento_servicos', 'carregar_cotacao_para_edicao'),
+        'cotacao': ('orcamento_produtos', 'carregar_cotacao_para_edicao'),
+    }
+
+    def abrir_resultado_busca(self, resultado):
+        """Seleciona a aba do registro encontrado na busca global e o carrega"""
+        destino = resultado.entidade
+        if destino == 'cotacao':
+            if resultado.info == 'Locação':
+                destino = 'cotacao_locacao'
+            elif (resultado.titulo or '').startswith('PSER-'):
+                destino = 'cotacao_servicos'
+        module_key, method_name = self.BUSCA_DESTINOS[destino]
+        tab_id = next((tab_id for tab_id, (tab_text, *_resto) in self._lazy_modules.items()
+                       if self._tab_text_to_key(tab_text) == module_key), None)
+        if tab_id is None:
+            messagebox.showwarning("Busca", "Você não tem acesso ao módulo deste registro.")
+            return
+        instance = self._ensure_module(tab_id)
+        if instance is None:
+            return
+        self.notebook.select(tab_id)
+        try:
+            getattr(instance, method_name)(resultado.id)
+        except Exception as e:
+            log.warning("Falha ao abrir resultado da busca %r: %s", resultado, e)
+            messagebox.showerror("Busca", f"Não foi possível abrir o registro:\n\n{e}")
+
+    # Abas construídas em segundo plano após o login (se o usuário tiver acesso),
+    # na ordem em que costumam ser abertas. Vazio desativa o pré-aquecimento.
+    PREWARM_TABS = ('orcamento_servicos', 'orcamento_produtos', 'clientes')
+    PREWARM_DELAY_MS = 1500
+
     def create_modules(self):
-        """Criar todos os módulos do sistema com importação isolada e tolerante a falhas"""
-        def add_module(tab_text, module_path, class_name):
+        """Criar as abas dos módulos; cada módulo é importado e construído ao abrir a aba"""
+        # tab_id -> (texto da aba, módulo, classe, atributo em self)
+        self._lazy_modules = {}
+        self._module_instances = {}
+
+        def add_module(tab_text, module_path, class_name, attr_name):
             frame = tk.Frame(self.notebook)
             self.notebook.add(frame, text=tab_text)
-            try:
-                mod = __import__(module_path, fromlist=[class_name])
-                cls = getattr(mod, class_name)
-                instance = cls(frame, self.user_id, self.role, self)
-                # Aplicar readonly automaticamente baseado nas permissões
-                module_key = self._tab_text_to_key(tab_text)
-                if not self.can_edit(module_key) and hasattr(instance, 'set_read_only'):
-                    try:
-                        instance.set_read_only(True)
-                        print(f"🔒 FORÇANDO modo somente leitura para módulo {module_key} (usuário {self.user_id})")
-                        # Aplicar proteção adicional após um breve delay para garantir que a UI esteja pronta
-                        self.root.after(100, lambda: self._force_read_only_protection(instance, module_key))
-                    except Exception as e:
-                        print(f"⚠️ Erro ao aplicar modo somente leitura: {e}")
-                return instance
-            except Exception as e:
-                messagebox.showerror("Erro ao carregar módulo", f"Falha ao carregar {tab_text}:\n\n{e}")
-                return None
+            self._lazy_modules[str(frame)] = (tab_text, module_path, class_name, attr_name)
+            setattr(self, attr_name, None)
 
         # Dashboard
         if self.has_access('dashboard'):
-            self.dashboard_module = add_module("📊 Dashboard", "interface.modules.dashboard", "DashboardModule")
+            add_module("📊 Dashboard", "interface.modules.dashboard", "DashboardModule", "dashboard_module")
         # Clientes
         if self.has_access('clientes'):
-            self.clientes_module = add_module("👥 Clientes", "interface.modules.clientes", "ClientesModule")
+            add_module("👥 Clientes", "interface.modules.clientes", "ClientesModule", "clientes_module")
         # Cadastros (antes: Produtos)
         if self.has_access('produtos'):
-            self.produtos_module = add_module("📦 Cadastros", "interface.modules.produtos", "ProdutosModule")
+            add_module("📦 Cadastros", "interface.modules.produtos", "ProdutosModule", "produtos_module")
         # Orçamento de Serviços
         if self.has_access('orcamento_servicos'):
-            self.orcamento_servicos_module = add_module("🔧 Orçamento de Serviços", "interface.modules.orcamento_servicos", "OrcamentoServicosModule")
+            add_module("🔧 Orçamento de Serviços", "interface.modules.orcamento_servicos", "OrcamentoServicosModule", "orcamento_servicos_module")
         # Orçamento de Produtos
         if self.has_access('orcamento_produtos'):
-            self.orcamento_produtos_module = add_module("📦 Orçamento de Produtos", "interface.modules.orcamento_produtos", "OrcamentoProdutosModule")
+            add_module("📦 Orçamento de Produtos", "interface.modules.orcamento_produtos", "OrcamentoProdutosModule", "orcamento_produtos_module")
         # Orçamento de Locações (aba separada - módulo independente)
         if self.has_access('relatorios') or self.has_access('cotacoes'):
             # manter lógica de locações na permissão de cotações/relatórios se necessário, ou crie chave própria
-            if self.has_access('relatorios') or self.has_access('cotacoes'):
-                self.locacoes_module = add_module("📄 Orçamento de Locações", "interface.modules.locacoes_full", "LocacoesModule")
+            add_module("📄 Orçamento de Locações", "interface.modules.locacoes_full", "LocacoesModule", "locacoes_module")
         # Relatórios
         if self.has_access('relatorios'):
-            self.relatorios_module = add_module("📋 Relatórios", "interface.modules.relatorios", "RelatoriosModule")
+            add_module("📋 Relatórios", "interface.modules.relatorios", "RelatoriosModule", "relatorios_module")
         # Usuários e Permissões
         if self.has_access('usuarios'):
-            self.usuarios_module = add_module("👤 Usuários", "interface.modules.usuarios", "UsuariosModule")
+            add_module("👤 Usuários", "interface.modules.usuarios", "UsuariosModule", "usuarios_module")
         if self.has_access('permissoes'):
-            self.permissoes_module = add_module("🔐 Permissões", "interface.modules.permissoes", "PermissoesModule")
+            add_module("🔐 Permissões", "interface.modules.permissoes", "PermissoesModule", "permissoes_module")
 
         # Construir navegação lateral com botões que selecionam as abas do notebook
+        # (_on_tab_changed constrói o módulo da aba inicial)
         self._build_side_nav()
-        # Destacar item ativo ao trocar de aba
+        # Destacar item ativo e construir o módulo ao trocar de aba
         try:
             self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
         except Exception:
             pass
 
+        self._schedule_prewarm()
+
+    def _ensure_module(self, tab_id):
+        """Importa e constrói o módulo da aba na primeira vez em que é necessário."""
+        tab_id = str(tab_id)
+        if tab_id in self._module_instances or tab_id not in self._lazy_modules:
+            return self._module_instances.get(tab_id)
+        tab_text, module_path, class_name, attr_name = self._lazy_modules[tab_id]
+        frame = self.notebook.nametowidget(tab_id)
+        # Marca antes de construir: eventos de aba disparados durante o setup_ui não reentram
+        self._module_instances[tab_id] = None
+
+        loading = tk.Label(frame, text="Carregando...", font=FONTS["base"], fg=PALETTE["text_primary"])
+        loading.pack(expand=True)
+        try:
+            loading.update_idletasks()
+        except Exception:
+            pass
+        try:
+            mod = __import__(module_path, fromlist=[class_name])
+            cls = getattr(mod, class_name)
+            loading.destroy()
+            instance = cls(frame, self.user_id, self.role, self)
+        except Exception as e:
+            log.exception("Falha ao construir o módulo %s", tab_text)
+            # Sem a marca, a próxima seleção da aba tenta de novo (a partir do frame vazio)
+            self._module_instances.pop(tab_id, None)
+            for child in frame.winfo_children():
+                child.destroy()
+            messagebox.showerror("Erro ao carregar módulo", f"Falha ao carregar {tab_text}:\n\n{e}")
+            return None
+
+        # Aplicar readonly automaticamente baseado nas permissões
+        module_key = self._tab_text_to_key(tab_text)
+        if not self.can_edit(module_key) and hasattr(instance, 'set_read_only'):
+            try:
+                instance.set_read_only(True)
+                log.info("Modo somente leitura no módulo %s (usuário %s)", module_key, self.user_id)
+            except Exception as e:
+                log.warning("Erro ao aplicar modo somente leitura: %s", e)
+
+        self._module_instances[tab_id] = instance
+        setattr(self, attr_name, instance)
+        return instance
+
+    def _schedule_prewarm(self):
+        """Pré-aquece as abas prováveis: importa em segundo plano e constrói no ocioso.
+
+        A importação roda no TaskExecutor; os widgets só podem ser criados na
+        thread do Tk, então cada aba é construída em um ``after`` separado para
+        a interface continuar respondendo entre uma e outra.
+        """
+        pending = []
+        for tab_id, (tab_text, module_path, _class_name, _attr) in self._lazy_modules.items():
+            module_key = self._tab_text_to_key(tab_text)
+            if module_key in self.PREWARM_TABS:
+                pending.append((self.PREWARM_TABS.index(module_key), tab_id, module_path))
+        if not pending:
+            return
+        pending.sort()
+        tab_ids = [tab_id for _, tab_id, _ in pending]
+        module_paths = [module_path for _, _, module_path in pending]
+
+        def import_modules():
+            for module_path in module_paths:
+                try:
+                    __import__(module_path)
+                except Exception as e:
+                    # O erro aparece ao abrir a aba, com a mensagem de costume
+                    log.warning("Falha ao pré-carregar %s: %s", module_path, e)
+
+        def build_next():
+            while tab_ids and tab_ids[0] in self._module_instances:
+                tab_ids.pop(0)
+            if not tab_ids:
+                return
+            self._ensure_module(tab_ids.pop(0))
+            if tab_ids:
+                self.root.after(self.PREWARM_DELAY_MS, build_next)
+
+        try:
+            self.submit_task(
+                import_modules,
+                on_success=lambda _r: self.root.after(self.PREWARM_DELAY_MS, build_next),
+            )
+        except Exception as e:
+            log.warning("Pré-carregamento de módulos desativado: %s", e)
+
+    def _on_permissoes_updated(self, _topic, event):
+        """Recarrega as permissões do usuário logado e troca o modo somente leitura dos módulos já abertos."""
+        if not event.full_refresh and self.user_id not in event.ids:
+            return
+        self._load_user_permissions()
+        for tab_id, instance in self._module_instances.items():
+            if instance is None or not hasattr(instance, 'set_read_only'):
+                continue
+            tab_text = self._lazy_modules[tab_id][0]
+            instance.set_read_only(not self.can_edit(self._tab_text_to_key(tab_text)))
+
     def _tab_text_to_key(self, tab_text: str) -> str:
         mapping = {
             '📊 Dashboard': 'dashboard',
@@ -218,113 +423,6 @@ class MainWindow:
         }
         return mapping.get(tab_text, '')
     
-    def _force_read_only_protection(self, instance, module_key):
-        """Força proteção adicional para garantir que nenhum campo possa ser editado"""
-        try:
-            if hasattr(instance, 'frame'):
-                print(f"🔒🔒🔒 APLICANDO proteção TOTAL no módulo {module_key}")
-                self._disable_all_widgets_completely(instance.frame)
-                print(f"✅ Proteção TOTAL aplicada no módulo {module_key}")
-        except Exception as e:
-            print(f"⚠️ Erro ao aplicar proteção total: {e}")
-    
-    def _disable_all_widgets_completely(self, widget):
-        """Desabilita COMPLETAMENTE todos os widgets de forma recursiva e agressiva"""
-        try:
-            # Desabilitar TODOS os tipos de widgets
-            if hasattr(widget, 'config'):
-                try:
-                    if isinstance(widget, (tk.Entry, tk.Text, tk.Spinbox, ttk.Entry, ttk.Spinbox)):
-                        widget.config(state='disabled')
-                    elif isinstance(widget, ttk.Combobox):
-                        # Permitir interação de leitura (seleção) para filtros/visualização
-                        try:
-                            widget.config(state='readonly')
-                        except Exception:
-                            pass
-                    elif isinstance(widget, (tk.Checkbutton, tk.Radiobutton)):
-                        widget.config(state='disabled')
-                    elif isinstance(widget, tk.Listbox):
-                        widget.config(state='disabled', selectmode='none')
-                    elif isinstance(widget, ttk.Treeview):
-                        # Manter seleção habilitada para permitir visualização de itens
-                        try:
-                            widget.config(selectmode='browse')
-                        except Exception:
-                            pass
-                    elif isinstance(widget, (tk.Scale, ttk.Scale)):
-                        widget.config(state='disabled')
-                    elif isinstance(widget, (tk.Button, ttk.Button)):
-                        # Desabilitar TODOS os botões exceto os de consulta
-                        try:
-                            button_text = widget.cget('text').lower()
-                            allowed_buttons = ['buscar', 'pesquisar', 'filtrar', 'visualizar', 'ver', 'consultar', 'imprimir', 'exportar', 'pdf', 'voltar', 'anterior', 'próximo', 'primeiro', 'último', 'editar']
-                            if not any(allowed in button_text for allowed in allowed_buttons):
-                                widget.config(state='disabled')
-                        except:
-                            widget.config(state='disabled')
-                except:
-                    pass
-            
-            # Bloquear TODOS os bindings de eventos
-            if hasattr(widget, 'bind'):
-                try:
-                    # Lista completa de eventos a serem bloqueados
-                    events_to_block = [
-                        '<Key>', '<Button-1>', '<Double-Button-1>', '<ButtonRelease-1>', '<B1-Motion>',
-                        '<Return>', '<Tab>', '<Shift-Tab>', '<Control-a>', '<Control-c>', '<Control-v>',
-                        '<Control-x>', '<Control-z>', '<Control-y>', '<Delete>', '<BackSpace>',
-                        '<F2>', '<F5>', '<F9>', '<Button-3>', '<Button-2>', '<B2-Motion>',
-                        '<ButtonRelease-2>', '<Shift-Button-1>', '<Control-Button-1>', '<Up>',
-                        '<Down>', '<Left>', '<Right>', '<Home>', '<End>', '<Page_Up>',
-                        '<Page_Down>', '<Insert>', '<Space>', '<Escape>', '<Alt-F4>',
-                        '<Control-s>', '<Control-n>', '<Control-o>', '<Control-w>', '<Control-q>'
-                    ]
-                    
-                    for event in events_to_block:
-                        widget.unbind(event)
-                        
-                    # Bloquear também eventos globais
-                    widget.bind('<Key>', lambda e: 'break')
-                    widget.bind('<Button-1>', lambda e: 'break' if not self._is_allowed_widget(widget) else None)
-                    widget.bind('<Double-Button-1>', lambda e: 'break')
-                    widget.bind('<Return>', lambda e: 'break')
-                    widget.bind('<Tab>', lambda e: 'break')
-                    widget.bind('<Control-a>', lambda e: 'break')
-                    widget.bind('<Control-c>', lambda e: 'break')
-                    widget.bind('<Control-v>', lambda e: 'break')
-                    widget.bind('<Control-x>', lambda e: 'break')
-                    widget.bind('<Control-z>', lambda e: 'break')
-                    widget.bind('<Control-y>', lambda e: 'break')
-                    widget.bind('<Delete>', lambda e: 'break')
-                    widget.bind('<BackSpace>', lambda e: 'break')
-                    widget.bind('<F2>', lambda e: 'break')
-                    widget.bind('<F5>', lambda e: 'break')
-                    widget.bind('<F9>', lambda e: 'break')
-                    widget.bind('<Button-3>', lambda e: 'break')  # Botão direito
-                    widget.bind('<Button-2>', lambda e: 'break')  # Botão do meio
-                    
-                except:
-                    pass
-            
-            # Processar filhos recursivamente
-            for child in widget.winfo_children():
-                self._disable_all_widgets_completely(child)
-                
-        except Exception as e:
-            pass
-    
-    def _is_allowed_widget(self, widget):
-        """Verifica se o widget é permitido para usuários somente leitura"""
-        try:
-            if isinstance(widget, (tk.Button, ttk.Button)):
-                button_text = widget.cget('text').lower()
-                allowed_buttons = ['buscar', 'pesquisar', 'filtrar', 'visualizar', 'ver', 'consultar', 'imprimir', 'exportar', 'pdf', 'voltar', 'anterior', 'próximo', 'primeiro', 'último', 'editar']
-                return any(allowed in button_text for allowed in allowed_buttons)
-            return False
-        except:
-            return False
-
     def _build_side_nav(self):
         """Cria botões verticais para navegar entre as abas do notebook."""
         try:
@@ -342,10 +440,10 @@ class MainWindow:
             # Inicial: marcar selecionado
             self._on_tab_changed()
         except Exception as e:
-            print(f"Aviso: falha ao construir navegação lateral: {e}")
+            log.warning("Falha ao construir navegação lateral: %s", e)
 
     def _on_tab_changed(self, *_args):
-        """Atualiza o estilo do botão ativo conforme a aba selecionada."""
+        """Constrói o módulo da aba selecionada e atualiza o estilo do botão ativo."""
         try:
             current = self.notebook.select()
             for tab_id, btn in getattr(self, '_nav_buttons', []):
@@ -354,18 +452,20 @@ class MainWindow:
                 else:
                     btn.configure(style='Secondary.TButton')
         except Exception:
-            pass
+            return
+        if current:
+            self._ensure_module(current)
 
     def _load_user_permissions(self):
         """Carrega as permissões do usuário corrente em self.user_permissions"""
         self.user_permissions = {}
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             c.execute("SELECT modulo, nivel_acesso FROM permissoes_usuarios WHERE usuario_id = ?", (self.user_id,))
             self.user_permissions = dict(c.fetchall())
         except Exception as e:
-            print(f"Aviso: falha ao carregar permissões: {e}")
+            log.warning("Falha ao carregar permissões: %s", e)
             self.user_permissions = {}
         finally:
             try:
@@ -391,6 +491,7 @@ class MainWindow:
         """Fazer logout e voltar para tela de login"""
         if messagebox.askyesno("Logout", "Tem certeza que deseja sair?"):
             self.root.withdraw()
+            self.task_executor.shutdown()
             
             # Criar nova janela de login
             from interface.login import LoginWindow
@@ -1,9 +1,308 @@
+import sqlite3
+import threading
 import tkinter as tk
 from tkinter import ttk
 from utils.theme import PALETTE, FONTS
+from database import get_connection
+from interface.reference_cache import ReferenceCache
+from interface.read_only import ReadOnlyGuard
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class PaginatedTreeLoader:
+    """Preenche um Treeview sob demanda com paginação por chave (keyset).
+
+    ``select_sql`` é a consulta sem WHERE/ORDER BY e deve terminar com as
+    colunas de ``order_by`` (na mesma ordem), usadas como chave da página.
+    Apenas a primeira página é carregada em ``load``; as próximas são
+    buscadas quando a rolagem se aproxima do fim da lista.
+
+    ``load(..., refine=True)`` indica que o novo filtro só pode restringir o
+    anterior (ex.: termo de busca que estende o último): se a lista anterior
+    estava completa, a consulta é feita apenas sobre as chaves já exibidas e
+    as linhas que não casam são removidas, sem reconstruir o Treeview.
+    ``load_async`` faz o mesmo em segundo plano (``runner``), descartando e
+    interrompendo consultas que ficaram obsoletas.
+    """
+
+    # Máximo de linhas exibidas para reaproveitar a lista ao refinar
+    REFINE_LIMIT = 500
+    # Limite de parâmetros por comando das versões antigas do SQLite (as chaves vão em lotes)
+    MAX_PARAMS = 999
+
+    def __init__(self, tree, select_sql, order_by, render_row, descending=True,
+                 page_size=100, prefetch_threshold=0.85, runner=None):
+        self.tree = tree
+        self.select_sql = select_sql
+        self.order_by = tuple(order_by)
+        self.render_row = render_row
+        self.descending = descending
+        self.page_size = page_size
+        self.prefetch_threshold = prefetch_threshold
+        self.runner = runner
+        self._where = ""
+        self._params = ()
+        self._last_key = None
+        self._exhausted = True
+        self._loaded = False
+        self._pending = False
+        self._items = []  # (chave, iid) na ordem exibida
+        # Consulta em segundo plano: geração atual, tarefa e conexão em uso
+        self._generation = 0
+        self._task = None
+        self._running_conn = None
+        self._conn_lock = threading.Lock()
+        # Encadear o yscrollcommand existente (normalmente scrollbar.set)
+        self._scroll_cmd = tree.tk.splitlist(tree.cget('yscrollcommand'))
+        tree.configure(yscrollcommand=self._on_yscroll)
+
+    def clear(self):
+        """Remove todas as linhas com uma única chamada ao Tk."""
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._items = []
+
+    def load(self, where="", params=(), refine=False):
+        """Recarrega a lista a partir da primeira página com o filtro informado."""
+        self._cancel_pending()
+        params = tuple(params)
+        if refine and self._can_refine():
+            self._apply_refine(where, params, self._fetch_refine(where, params, self._refine_keys()))
+            return
+        self._apply_first_page(where, params, self._fetch_page(where, params, None))
+
+    def load_async(self, where="", params=(), refine=False, on_error=None):
+        """Como ``load``, mas consultando fora da thread do Tk (sem ``runner``, igual a ``load``).
+
+        Uma nova chamada cancela a anterior: se ainda estiver na fila não roda,
+        se estiver rodando a consulta é interrompida, e o resultado é ignorado.
+        """
+        if self.runner is None:
+            try:
+                self.load(where, params, refine)
+            except sqlite3.Error as e:
+                if on_error is None:
+                    raise
+                on_error(e)
+            return
+        self._cancel_pending()
+        generation = self._generation
+        params = tuple(params)
+        if refine and self._can_refine():
+            keys = self._refine_keys()
+            work = lambda: self._fetch_refine(where, params, keys, track=True)
+            apply = lambda matched: self._apply_refine(where, params, matched)
+        else:
+            work = lambda: self._fetch_page(where, params, None, track=True)
+            apply = lambda rows: self._apply_first_page(where, params, rows)
+        # Sem paginação pela rolagem até a nova primeira página chegar
+        self._exhausted = True
+
+        def done(result):
+            if generation == self._generation:
+                self._task = None
+                apply(result)
+
+        def failed(e):
+            if generation == self._generation:
+                self._task = None
+                if on_error is not None:
+                    on_error(e)
+                else:
+                    log.warning("Erro ao carregar lista: %s", e)
+
+        self._task = self.runner(work, description="Buscando", on_success=done, on_error=failed)
+
+    def load_more(self):
+        """Busca e insere a próxima página. Retorna a quantidade de linhas."""
+        if self._exhausted:
+            return 0
+        rows = self._fetch_page(self._where, self._params, self._last_key)
+        self._insert_rows(rows)
+        return len(rows)
+
+    def _cancel_pending(self):
+        self._generation += 1
+        if self._task is not None:
+            try:
+                self._task.cancel()
+            except Exception:
+                pass
+            self._task = None
+        with self._conn_lock:
+            if self._running_conn is not None:
+                self._running_conn.interrupt()
+
+    def _can_refine(self):
+        return self._loaded and self._exhausted and len(self._items) <= self.REFINE_LIMIT
+
+    def _refine_keys(self):
+        return [key for key, _iid in self._items]
+
+    def _insert_rows(self, rows):
+        for row in rows:
+            values, tags = self.render_row(row)
+            iid = self.tree.insert("", "end", values=values, tags=tags)
+            self._items.append((self._key(row), iid))
+        if rows:
+            self._last_key = self._key(rows[-1])
+        if len(rows) < self.page_size:
+            self._exhausted = True
+
+    def _apply_first_page(self, where, params, rows):
+        self._where = where
+        self._params = params
+        self._last_key = None
+        self._exhausted = False
+        self._loaded = True
+        self.clear()
+        self._insert_rows(rows)
+
+    def _apply_refine(self, where, params, matched):
+        self._where = where
+        self._params = params
+        self._exhausted = True
+        self._loaded = True
+        removed = [iid for key, iid in self._items if key not in matched]
+        if removed:
+            self.tree.delete(*removed)
+            self._items = [(key, iid) for key, iid in self._items if key in matched]
+
+    def _key(self, row):
+        return tuple(row[-len(self.order_by):])
+
+    def _fetch_refine(self, where, params, keys, track=False):
+        """Chaves (entre ``keys``) que atendem ao novo filtro."""
+        marks = ", ".join("?" for _ in self.order_by)
+        batch = max(1, (self.MAX_PARAMS - len(params)) // len(self.order_by))
+        matched = set()
+        for start in range(0, len(keys), batch):
+            chunk = keys[start:start + batch]
+            condition = f"({', '.join(self.order_by)}) IN (VALUES {', '.join(f'({marks})' for _ in chunk)})"
+            if where:
+                condition = f"({where}) AND {condition}"
+            flat = [value for key in chunk for value in key]
+            rows = self._execute(f"{self.select_sql} WHERE {condition}", list(params) + flat, track)
+            matched.update(self._key(row) for row in rows)
+        return matched
+
+    def _fetch_page(self, where, params, last_key, track=False):
+        conditions = []
+        params = list(params)
+        if where:
+            conditions.append(f"({where})")
+        if last_key is not None:
+            op = "<" if self.descending else ">"
+            marks = ", ".join("?" for _ in self.order_by)
+            conditions.append(f"({', '.join(self.order_by)}) {op} ({marks})")
+            params.extend(last_key)
+        direction = " DESC" if self.descending else ""
+        sql = self.select_sql
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY " + ", ".join(col + direction for col in self.order_by)
+        sql += " LIMIT ?"
+        params.append(self.page_size)
+        return self._execute(sql, params, track)
+
+    def _execute(self, sql, params, track=False):
+        conn = get_connection()
+        if track:
+            # Permite interromper a consulta a partir da thread do Tk
+            with self._conn_lock:
+                self._running_conn = conn
+        try:
+            c = conn.cursor()
+            c.execute(sql, params)
+            return c.fetchall()
+        finally:
+            if track:
+                with self._conn_lock:
+                    self._running_conn = None
+            conn.close()
+
+    def _on_yscroll(self, first, last):
+        if self._scroll_cmd:
+            self.tree.tk.call(*self._scroll_cmd, first, last)
+        if not self._exhausted and not self._pending and float(last) >= self.prefetch_threshold:
+            self._pending = True
+            self.tree.after_idle(self._load_more_idle)
+
+    def _load_more_idle(self):
+        self._pending = False
+        try:
+            self.load_more()
+        except Exception:
+            log.exception("Erro ao carregar próxima página")
+
+
+class IncrementalSearch:
+    """Busca enquanto o usuário digita, para o campo de ``create_search_frame``.
+
+    Cada tecla reinicia a espera (``DEBOUNCE_MS``); só a última dispara o
+    ``command``. Termos repetidos não consultam de novo e termos com menos de
+    ``MIN_CHARS`` letras esperam mais digitação (Enter força a busca).
+    ``refines`` fica True durante o ``command`` quando o termo apenas estende
+    o anterior, para o módulo repassar a ``PaginatedTreeLoader.load``.
+    """
+
+    DEBOUNCE_MS = 300
+    MIN_CHARS = 2
+    IGNORED_KEYS = {'Return', 'KP_Enter', 'Escape', 'Tab', 'Up', 'Down', 'Left', 'Right',
+                    'Home', 'End', 'Shift_L', 'Shift_R', 'Control_L', 'Control_R',
+                    'Alt_L', 'Alt_R', 'Caps_Lock'}
+
+    def __init__(self, entry, var, command, placeholder=""):
+        self.entry = entry
+        self.var = var
+        self.command = command
+        self.placeholder = placeholder
+        self.refines = False
+        self._last_term = None
+        self._after_id = None
+        entry.bind('<KeyRelease>', self._on_key, add='+')
+        entry.bind('<Return>', lambda e: self.run(force=True))
+
+    def term(self):
+        text = self.var.get().strip()
+        return "" if text == self.placeholder else text
+
+    def _on_key(self, event):
+        if event.keysym in self.IGNORED_KEYS:
+            return
+        self.cancel()
+        self._after_id = self.entry.after(self.DEBOUNCE_MS, self.run)
+
+    def cancel(self):
+        if self._after_id is not None:
+            self.entry.after_cancel(self._after_id)
+            self._after_id = None
+
+    def run(self, force=False):
+        self._after_id = None
+        term = self.term()
+        if not force:
+            if term == (self._last_term or ""):
+                return
+            if 0 < len(term) < self.MIN_CHARS:
+                return
+        previous = self._last_term
+        self.refines = bool(previous) and term != previous and term.startswith(previous)
+        self._last_term = term
+        try:
+            self.command()
+        finally:
+            self.refines = False
+
 
 class BaseModule:
     """Classe base para todos os módulos do sistema com controle de permissões robusto"""
+
+    # Tópicos recebidos em handle_event (None = todos)
+    event_topics = None
     
     def __init__(self, parent, user_id, role, main_window):
         self.parent = parent
@@ -11,10 +310,9 @@ class BaseModule:
         self.role = role
         self.main_window = main_window
         
-        # Registrar para receber eventos
-        if hasattr(main_window, 'register_listener'):
-            print(f"DEBUG BASE_MODULE: Registrando listener para {self.__class__.__name__}")
-            main_window.register_listener(self.handle_event)
+        # Registrar para receber eventos (só quem trata algum)
+        if hasattr(main_window, 'register_listener') and type(self).handle_event is not BaseModule.handle_event:
+            main_window.register_listener(self.handle_event, self.event_topics)
         
         # Frame principal do módulo (container visual)
         self.frame = tk.Frame(parent, bg=PALETTE["bg_app"])
@@ -37,20 +335,29 @@ class BaseModule:
         # Se o usuário não pode editar, aplicar modo somente leitura
         if not self.main_window.can_edit(module_key):
             self.set_read_only(True)
-            print(f"🔒 Módulo {module_key} configurado como somente leitura para usuário {self.user_id}")
+            log.info("Módulo %s configurado como somente leitura para usuário %s", module_key, self.user_id)
         
     def setup_ui(self):
         """Método a ser implementado pelos módulos filhos"""
         pass
         
     def handle_event(self, event_type, data=None):
-        """Manipular eventos recebidos do sistema"""
+        """Manipular eventos recebidos do sistema (``data`` é o Event agrupado)"""
         pass
         
-    def emit_event(self, event_type, data=None):
+    def emit_event(self, event_type, data=None, ids=None):
         """Emitir evento para outros módulos"""
         if hasattr(self.main_window, 'emit_event'):
-            self.main_window.emit_event(event_type, data)
+            self.main_window.emit_event(event_type, data, ids=ids)
+
+    @property
+    def reference_data(self):
+        """Listas de referência dos combos (ReferenceCache da MainWindow)"""
+        cache = getattr(self.main_window, 'reference_cache', None)
+        if cache is None:
+            # Fora da janela principal: sem eventos, cada acesso consulta o banco
+            cache = self.__dict__.setdefault('_reference_cache', ReferenceCache())
+        return cache
     
     def has_role(self, role_name: str) -> bool:
         """Verifica se o usuário possui o perfil informado (suporta múltiplos perfis separados por vírgula)."""
@@ -82,28 +389,21 @@ class BaseModule:
         """Verifica se o usuário pode deletar itens no módulo atual"""
         return self.can_edit(module_key)
     
+    @property
+    def read_only_guard(self):
+        """Modo somente leitura por bindtag (ReadOnlyGuard da janela)"""
+        guard = getattr(self.main_window, 'read_only_guard', None)
+        return guard if guard is not None else ReadOnlyGuard.for_widget(self.frame)
+
     def set_read_only(self, read_only: bool = True):
-        """Define o módulo como somente leitura"""
+        """Define o módulo como somente leitura (vale na hora, inclusive para widgets criados depois)"""
         self.read_only = read_only
-        
-        if read_only:
-            print(f"🔒 Aplicando modo somente leitura para {self.__class__.__name__}")
-            # Aplicar proteção imediatamente
-            self._apply_read_only_state()
-            
-            # Aplicar proteção adicional após um breve delay para garantir que todos os widgets estejam prontos
-            if hasattr(self, 'frame'):
-                self.frame.after(100, self._apply_read_only_state)
-                self.frame.after(500, self._apply_read_only_state)  # Proteção dupla
-                self.frame.after(1000, self._apply_read_only_state)  # Proteção tripla
-        else:
-            print(f"✏️ Removendo modo somente leitura para {self.__class__.__name__}")
-            # Implementar lógica para reativar campos se necessário
+        self.read_only_guard.set_read_only(self.frame, read_only)
             
     def apply_readonly_for_visualization(self):
         """Aplica modo readonly apenas para visualização - mantém campos visíveis mas não editáveis"""
         if not self.can_edit():
-            print(f"🔍 Aplicando modo visualização para {self.__class__.__name__}")
+            log.debug("Aplicando modo visualização para %s", self.__class__.__name__)
             self._apply_visualization_readonly()
             
     def _apply_visualization_readonly(self):
@@ -114,7 +414,7 @@ class BaseModule:
                 self._disable_action_buttons_recursive(widget)
                 
         except Exception as e:
-            print(f"⚠️ Erro ao aplicar modo visualização: {e}")
+            log.warning("Erro ao aplicar modo visualização: %s", e)
             
     def _disable_action_buttons_recursive(self, widget):
         """Desabilita apenas botões de ação, mantendo campos de visualização"""
@@ -126,11 +426,11 @@ class BaseModule:
                 action_buttons = ['salvar', 'excluir', 'adicionar', 'remover', 'inserir', 'deletar', 'criar', 'novo', 'alterar', 'modificar']
                 if any(action in button_text for action in action_buttons):
                     widget.config(state='disabled')
-                    print(f"   🔒 Botão desabilitado: {button_text}")
+                    log.debug("Botão desabilitado: %s", button_text)
                 elif 'editar' in button_text:
                     # Manter botão Editar habilitado para visualização
                     widget.config(state='normal')
-                    print(f"   👁️ Botão Editar mantido habilitado para visualização: {button_text}")
+                    log.debug("Botão Editar mantido habilitado para visualização: %s", button_text)
                     
             elif isinstance(widget, (tk.Entry, tk.Text)):
                 # Para campos de texto, aplicar readonly mas manter visível
@@ -138,14 +438,14 @@ class BaseModule:
                     if isinstance(widget, tk.Entry):
                         # Usar readonly para Entry - mantém o texto visível
                         widget.config(state='readonly', readonlybackground='#f8f8f8')
-                        print(f"   🔍 Campo Entry em modo readonly: {widget.get()[:30]}...")
+                        log.debug("Campo Entry em modo readonly: %s", widget)
                     else:  # tk.Text
                         # Para Text, usar normal primeiro para garantir que o conteúdo seja visível
                         widget.config(state='normal')
                         widget.config(state='disabled', bg='#f8f8f8')
-                        print(f"   🔍 Campo Text em modo readonly")
+                        log.debug("Campo Text em modo readonly: %s", widget)
                 except Exception as e:
-                    print(f"   ⚠️ Erro ao configurar campo: {e}")
+                    log.warning("Erro ao configurar campo: %s", e)
                     pass
                     
             elif isinstance(widget, ttk.Entry):
@@ -159,34 +459,6 @@ class BaseModule:
                 # Para combobox, bloquear completamente para usuários com permissão "Consultar"
                 try:
                     widget.config(state='disabled')
-                    # Bloquear todos os eventos de interação
-                    widget.unbind('<Key>')
-                    widget.unbind('<Button-1>')
-                    widget.unbind('<ButtonRelease-1>')
-                    widget.unbind('<Double-Button-1>')
-                    widget.unbind('<Return>')
-                    widget.unbind('<Tab>')
-                    widget.unbind('<Down>')
-                    widget.unbind('<Up>')
-                    widget.unbind('<Button-3>')
-                    widget.unbind('<B1-Motion>')
-                    widget.unbind('<FocusIn>')
-                    widget.unbind('<FocusOut>')
-                    # Bloquear eventos de teclado específicos para combobox
-                    widget.bind('<Key>', lambda e: 'break')
-                    widget.bind('<Button-1>', lambda e: 'break')
-                    widget.bind('<ButtonRelease-1>', lambda e: 'break')
-                    widget.bind('<Double-Button-1>', lambda e: 'break')
-                    widget.bind('<Return>', lambda e: 'break')
-                    widget.bind('<Tab>', lambda e: 'break')
-                    widget.bind('<Down>', lambda e: 'break')
-                    widget.bind('<Up>', lambda e: 'break')
-                    widget.bind('<Button-3>', lambda e: 'break')
-                    widget.bind('<B1-Motion>', lambda e: 'break')
-                    widget.bind('<FocusIn>', lambda e: 'break')
-                    widget.bind('<FocusOut>', lambda e: 'break')
-                    # Bloquear evento de seleção
-                    widget.bind('<<ComboboxSelected>>', lambda e: 'break')
                 except:
                     pass
                     
@@ -207,226 +479,6 @@ class BaseModule:
         except Exception as e:
             pass  # Ignorar erros em widgets específicos
     
-    def _apply_read_only_state(self):
-        """Aplica o estado de somente leitura aos widgets"""
-        if not hasattr(self, 'read_only') or not self.read_only:
-            return
-            
-        try:
-            print(f"🔒🔒🔒 APLICANDO proteção TOTAL para {self.__class__.__name__}")
-            
-            # Desabilitar todos os campos de entrada
-            for widget in self.frame.winfo_children():
-                self._disable_widget_recursive(widget)
-                
-            # Proteção adicional para campos específicos que podem ter sido criados dinamicamente
-            self._protect_specific_widgets()
-            
-            print(f"✅ Proteção aplicada com sucesso para {self.__class__.__name__}")
-            
-        except Exception as e:
-            print(f"⚠️ Erro ao aplicar proteção: {e}")
-    
-    def _disable_widget_recursive(self, widget):
-        """Desabilita um widget e seus filhos recursivamente de forma COMPLETA e AGGRESSIVA"""
-        try:
-            # Desabilitar TODOS os tipos de widgets de entrada
-            if isinstance(widget, (tk.Entry, tk.Text, tk.Spinbox)):
-                widget.config(state='disabled')
-                # Bloquear eventos de teclado e mouse
-                widget.unbind('<Key>')
-                widget.unbind('<Button-1>')
-                widget.unbind('<Double-Button-1>')
-                widget.unbind('<Return>')
-                widget.unbind('<Tab>')
-                widget.unbind('<Control-a>')
-                widget.unbind('<Control-c>')
-                widget.unbind('<Control-v>')
-                widget.unbind('<Control-x>')
-                widget.unbind('<Delete>')
-                widget.unbind('<BackSpace>')
-                widget.unbind('<F2>')
-                widget.unbind('<Button-3>')
-                
-            elif isinstance(widget, ttk.Entry):
-                widget.config(state='disabled')
-                # Mesmo bloqueio para ttk.Entry
-                widget.unbind('<Key>')
-                widget.unbind('<Button-1>')
-                widget.unbind('<Double-Button-1>')
-                widget.unbind('<Return>')
-                widget.unbind('<Tab>')
-                widget.unbind('<Control-a>')
-                widget.unbind('<Control-c>')
-                widget.unbind('<Control-v>')
-                widget.unbind('<Control-x>')
-                widget.unbind('<Delete>')
-                widget.unbind('<BackSpace>')
-                widget.unbind('<F2>')
-                widget.unbind('<Button-3>')
-                
-            elif isinstance(widget, (tk.Checkbutton, tk.Radiobutton)):
-                widget.config(state='disabled')
-                widget.unbind('<Button-1>')
-                widget.unbind('<Button-3>')
-                widget.unbind('<Return>')
-                widget.unbind('<Space>')
-                
-            elif isinstance(widget, ttk.Combobox):
-                # Bloquear completamente as listas suspensas para usuários com permissão "Consultar"
-                widget.config(state='disabled')
-                # Bloquear todos os eventos de interação
-                widget.unbind('<Key>')
-                widget.unbind('<Button-1>')
-                widget.unbind('<ButtonRelease-1>')
-                widget.unbind('<Double-Button-1>')
-                widget.unbind('<Return>')
-                widget.unbind('<Tab>')
-                widget.unbind('<Down>')
-                widget.unbind('<Up>')
-                widget.unbind('<Button-3>')
-                widget.unbind('<B1-Motion>')
-                widget.unbind('<FocusIn>')
-                widget.unbind('<FocusOut>')
-                # Bloquear eventos de teclado específicos para combobox
-                widget.bind('<Key>', lambda e: 'break')
-                widget.bind('<Button-1>', lambda e: 'break')
-                widget.bind('<ButtonRelease-1>', lambda e: 'break')
-                widget.bind('<Double-Button-1>', lambda e: 'break')
-                widget.bind('<Return>', lambda e: 'break')
-                widget.bind('<Tab>', lambda e: 'break')
-                widget.bind('<Down>', lambda e: 'break')
-                widget.bind('<Up>', lambda e: 'break')
-                widget.bind('<Button-3>', lambda e: 'break')
-                widget.bind('<B1-Motion>', lambda e: 'break')
-                widget.bind('<FocusIn>', lambda e: 'break')
-                widget.bind('<FocusOut>', lambda e: 'break')
-                # Bloquear evento de seleção
-                widget.bind('<<ComboboxSelected>>', lambda e: 'break')
-                
-            elif isinstance(widget, tk.Button):
-                # Desabilitar TODOS os botões exceto os de consulta/navegação
-                button_text = widget.cget('text').lower()
-                # Lista muito restritiva de botões permitidos
-                allowed_buttons = ['buscar', 'pesquisar', 'filtrar', 'visualizar', 'ver', 'consultar', 'imprimir', 'exportar', 'pdf', 'voltar', 'anterior', 'próximo', 'primeiro', 'último', 'editar']
-                if not any(allowed in button_text for allowed in allowed_buttons):
-                    widget.config(state='disabled')
-                    # Bloquear completamente o botão
-                    widget.unbind('<Button-1>')
-                    widget.unbind('<Return>')
-                    widget.unbind('<Space>')
-                    
-            elif isinstance(widget, ttk.Treeview):
-                # Modo consulta: permitir seleção/visualização, bloquear edição e remoção
-                widget.config(selectmode='browse')
-                # Bloquear ações de edição/inserção/remoção
-                widget.unbind('<Return>')
-                widget.unbind('<F2>')
-                widget.unbind('<Delete>')
-                widget.unbind('<Key>')
-                
-            elif isinstance(widget, tk.Listbox):
-                # Permitir rolagem/seleção para consulta, sem edição
-                widget.config(state='disabled')
-                
-            elif isinstance(widget, (tk.Scale, ttk.Scale)):
-                widget.config(state='disabled')
-                widget.unbind('<Button-1>')
-                widget.unbind('<B1-Motion>')
-                widget.unbind('<ButtonRelease-1>')
-                
-            # Bloquear TODOS os bindings de teclado e mouse para edição
-            if hasattr(widget, 'bind'):
-                # Remover TODOS os bindings de edição
-                widget.unbind('<Key>')
-                widget.unbind('<Button-1>')
-                widget.unbind('<ButtonRelease-1>')
-                widget.unbind('<B1-Motion>')
-                widget.unbind('<Return>')
-                widget.unbind('<Tab>')
-                widget.unbind('<Shift-Tab>')
-                widget.unbind('<Control-a>')
-                widget.unbind('<Control-c>')
-                widget.unbind('<Control-v>')
-                widget.unbind('<Control-x>')
-                widget.unbind('<Control-z>')
-                widget.unbind('<Control-y>')
-                widget.unbind('<Delete>')
-                widget.unbind('<BackSpace>')
-                widget.unbind('<F2>')
-                widget.unbind('<F5>')
-                widget.unbind('<F9>')
-                widget.unbind('<Button-3>')  # Botão direito
-                widget.unbind('<Button-2>')  # Botão do meio
-                widget.unbind('<B2-Motion>')
-                widget.unbind('<ButtonRelease-2>')
-                widget.unbind('<Shift-Button-1>')
-                widget.unbind('<Control-Button-1>')
-                widget.unbind('<Up>')
-                widget.unbind('<Down>')
-                widget.unbind('<Left>')
-                widget.unbind('<Right>')
-                widget.unbind('<Home>')
-                widget.unbind('<End>')
-                widget.unbind('<Page_Up>')
-                widget.unbind('<Page_Down>')
-                widget.unbind('<Insert>')
-                widget.unbind('<Space>')
-            
-            # Processar filhos recursivamente
-            for child in widget.winfo_children():
-                self._disable_widget_recursive(child)
-                
-        except Exception as e:
-            # Log silencioso de erros para não interromper o processo
-            pass
-    
-    def _protect_specific_widgets(self):
-        """Proteção adicional para widgets específicos que podem ter sido criados dinamicamente"""
-        try:
-            # Proteger campos de entrada específicos que podem ter sido criados após a inicialização
-            for widget_name in dir(self):
-                widget = getattr(self, widget_name, None)
-                if widget and hasattr(widget, 'config'):
-                    if isinstance(widget, (tk.Entry, tk.Text, tk.Spinbox, ttk.Entry)):
-                        widget.config(state='disabled')
-                    elif isinstance(widget, ttk.Combobox):
-                        # Bloquear completamente as listas suspensas
-                        widget.config(state='disabled')
-                        # Bloquear todos os eventos de interação
-                        widget.unbind('<Key>')
-                        widget.unbind('<Button-1>')
-                        widget.unbind('<ButtonRelease-1>')
-                        widget.unbind('<Double-Button-1>')
-                        widget.unbind('<Return>')
-                        widget.unbind('<Tab>')
-                        widget.unbind('<Down>')
-                        widget.unbind('<Up>')
-                        widget.unbind('<Button-3>')
-                        widget.unbind('<B1-Motion>')
-                        widget.unbind('<FocusIn>')
-                        widget.unbind('<FocusOut>')
-                        # Bloquear eventos de teclado específicos para combobox
-                        widget.bind('<Key>', lambda e: 'break')
-                        widget.bind('<Button-1>', lambda e: 'break')
-                        widget.bind('<ButtonRelease-1>', lambda e: 'break')
-                        widget.bind('<Double-Button-1>', lambda e: 'break')
-                        widget.bind('<Return>', lambda e: 'break')
-                        widget.bind('<Tab>', lambda e: 'break')
-                        widget.bind('<Down>', lambda e: 'break')
-                        widget.bind('<Up>', lambda e: 'break')
-                        widget.bind('<Button-3>', lambda e: 'break')
-                        widget.bind('<B1-Motion>', lambda e: 'break')
-                        widget.bind('<FocusIn>', lambda e: 'break')
-                        widget.bind('<FocusOut>', lambda e: 'break')
-                        # Bloquear evento de seleção
-                        widget.bind('<<ComboboxSelected>>', lambda e: 'break')
-                    elif isinstance(widget, (tk.Checkbutton, tk.Radiobutton)):
-                        widget.config(state='disabled')
-                        
-        except Exception as e:
-            print(f"⚠️ Erro na proteção específica: {e}")
-    
     def create_section_frame(self, parent, title, padx=10, pady=10):
         """Criar frame de seção com título (compatível com uso anterior).
 
@@ -468,8 +520,14 @@ class BaseModule:
         button = ttk.Button(parent, text=text, command=command, style=style, **safe_kwargs)
         return button
     
+    def create_paginated_loader(self, tree, select_sql, order_by, render_row, descending=True, page_size=100):
+        """Criar carregador paginado (ver PaginatedTreeLoader) para um Treeview já configurado"""
+        return PaginatedTreeLoader(tree, select_sql, order_by, render_row,
+                                   descending=descending, page_size=page_size,
+                                   runner=self.run_in_background)
+    
     def create_search_frame(self, parent, placeholder="Buscar...", command=None):
-        """Criar frame de busca padronizado"""
+        """Criar frame de busca padronizado (com busca enquanto digita, ver IncrementalSearch)"""
         search_frame = tk.Frame(parent, bg='#ffffff', highlightthickness=1, highlightbackground=PALETTE["border"]) 
         
         search_var = tk.StringVar()
@@ -485,13 +543,80 @@ class BaseModule:
                 search_entry.insert(0, placeholder)
         search_entry.bind('<FocusIn>', _on_focus_in)
         search_entry.bind('<FocusOut>', _on_focus_out)
+        # Busca continua disponível no modo somente leitura
+        self.read_only_guard.allow(search_entry)
         
         if command:
-            search_btn = self.create_button(search_frame, "Buscar", command, variant='primary')
+            search = self.search_controller = IncrementalSearch(search_entry, search_var, command, placeholder)
+            search_btn = self.create_button(search_frame, "Buscar", lambda: search.run(force=True), variant='primary')
             search_btn.pack(side="right", padx=8, pady=6)
-            search_entry.bind('<Return>', lambda e: command())
         
         return search_frame, search_var
+
+    def search_refines(self):
+        """True se a busca em andamento só estende o termo anterior (resultado é subconjunto)"""
+        search = getattr(self, 'search_controller', None)
+        return bool(search and search.refines)
+
+    def search_term(self):
+        """Termo digitado no campo de busca, sem o texto de exemplo"""
+        search = getattr(self, 'search_controller', None)
+        if search is not None:
+            return search.term()
+        return self.search_var.get().strip() if hasattr(self, 'search_var') else ""
+    
+    def run_in_background(self, func, *args, description="", on_success=None, on_error=None, **kwargs):
+        """Executar func em segundo plano via MainWindow; callbacks rodam na thread do Tk.
+        Sem executor disponível (ex.: módulo aberto fora da janela principal), executa na hora.
+        """
+        if hasattr(self.main_window, 'submit_task'):
+            return self.main_window.submit_task(func, *args, description=description,
+                                                on_success=on_success, on_error=on_error, **kwargs)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            else:
+                raise
+        else:
+            if on_success:
+                on_success(result)
+        return None
+    
+    def generate_pdf_in_background(self, generator, *args, open_after=False, **kwargs):
+        """Gerar PDF em segundo plano; ao terminar mostra o caminho ou abre o arquivo.
+        O gerador deve retornar (sucesso, caminho_ou_mensagem).
+        """
+        def _done(result):
+            sucesso, resultado = result
+            if not sucesso:
+                self.show_error(f"Erro ao gerar PDF: {resultado}")
+            elif open_after:
+                self.open_file(resultado)
+            else:
+                self.show_success(f"PDF gerado com sucesso!\nLocal: {resultado}")
+        
+        def _failed(exc):
+            self.show_error(f"Erro ao gerar PDF: {exc}")
+        
+        return self.run_in_background(generator, *args, description="Gerando PDF...",
+                                      on_success=_done, on_error=_failed, **kwargs)
+    
+    def open_file(self, path):
+        """Abrir arquivo com o aplicativo padrão do sistema"""
+        try:
+            import os
+            import sys
+            import subprocess
+            if os.name == 'nt':  # Windows
+                os.startfile(path)
+            elif sys.platform == 'darwin':  # macOS
+                subprocess.Popen(['open', path])
+            else:  # Linux
+                subprocess.Popen(['xdg-open', path])
+        except Exception as e:
+            self.show_error(f"Erro ao abrir PDF: {e}")
     
     def show_success(self, message):
         """Mostrar mensagem de sucesso"""
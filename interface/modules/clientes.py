@@ -2,8 +2,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_cnpj, format_phone, validate_cnpj, validate_email
+from utils.stats import resumo_cliente
+from utils.busca import filtro_busca
 
 class ClientesModule(BaseModule):
     def setup_ui(self):
@@ -143,6 +145,7 @@ class ClientesModule(BaseModule):
 
         lista_scrollbar = ttk.Scrollbar(lista_inner, orient="vertical", command=self.clientes_tree.yview)
         self.clientes_tree.configure(yscrollcommand=lista_scrollbar.set)
+        self._setup_clientes_loader()
 
         self.clientes_tree.pack(side="left", fill="both", expand=True)
         lista_scrollbar.pack(side="right", fill="y")
@@ -271,6 +274,7 @@ class ClientesModule(BaseModule):
         # Scrollbar
         lista_scrollbar = ttk.Scrollbar(lista_inner, orient="vertical", command=self.clientes_tree.yview)
         self.clientes_tree.configure(yscrollcommand=lista_scrollbar.set)
+        self._setup_clientes_loader()
 
         # Layout
         self.clientes_tree.pack(side="left", fill="both", expand=True)
@@ -611,56 +615,31 @@ class ClientesModule(BaseModule):
         self.produtos_text.delete('1.0', tk.END)
         
         if self.current_cliente_id:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             
             try:
-                # Estatísticas detalhadas
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE cliente_id = ?", (self.current_cliente_id,))
-                total_cotacoes = c.fetchone()[0]
+                # Estatísticas detalhadas (uma linha de stats_summary)
+                resumo = resumo_cliente(self.current_cliente_id, conn)
                 
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE cliente_id = ? AND status = 'Aprovada'", (self.current_cliente_id,))
-                cotacoes_aprovadas = c.fetchone()[0]
-                
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE cliente_id = ? AND status = 'Rejeitada'", (self.current_cliente_id,))
-                cotacoes_rejeitadas = c.fetchone()[0]
-                
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE cliente_id = ? AND status = 'Em Aberto'", (self.current_cliente_id,))
-                cotacoes_aberto = c.fetchone()[0]
-                
-                c.execute("SELECT SUM(valor_total) FROM cotacoes WHERE cliente_id = ? AND status = 'Aprovada'", (self.current_cliente_id,))
-                faturamento = c.fetchone()[0] or 0
-                
-                c.execute("SELECT AVG(valor_total) FROM cotacoes WHERE cliente_id = ? AND valor_total > 0", (self.current_cliente_id,))
-                media_valor = c.fetchone()[0] or 0
-                
-                # Tratar valores None
-                faturamento = faturamento or 0
-                media_valor = media_valor or 0
-                
-                c.execute("SELECT COUNT(*) FROM contatos WHERE cliente_id = ?", (self.current_cliente_id,))
-                total_contatos = c.fetchone()[0]
-                
-                # Taxa de conversão
-                taxa_conversao = (cotacoes_aprovadas / total_cotacoes * 100) if total_cotacoes > 0 else 0
-                
-                stats_info = f"""Total de Cotações: {total_cotacoes}
-Aprovadas: {cotacoes_aprovadas} ({taxa_conversao:.1f}%)
-Rejeitadas: {cotacoes_rejeitadas}
-Em Aberto: {cotacoes_aberto}
-Faturamento Total: R$ {faturamento:,.2f}
-Média por Cotação: R$ {media_valor:,.2f}
-Contatos Cadastrados: {total_contatos}"""
+                stats_info = f"""Total de Cotações: {resumo['cotacoes']}
+Aprovadas: {resumo['cotacoes_aprovadas']} ({resumo['taxa_conversao']:.1f}%)
+Rejeitadas: {resumo['cotacoes_rejeitadas']}
+Em Aberto: {resumo['cotacoes_aberto']}
+Faturamento Total: R$ {resumo['valor_aprovado']:,.2f}
+Média por Cotação: R$ {resumo['media_valor']:,.2f}
+Contatos Cadastrados: {resumo['contatos']}"""
                 
                 self.stats_detalhadas_text.insert('1.0', stats_info)
                 
                 # Histórico completo
                 c.execute("""
-                    SELECT numero_proposta, data_criacao, status, valor_total, 
-                           responsavel_id, data_validade
-                    FROM cotacoes 
-                    WHERE cliente_id = ? 
-                    ORDER BY data_criacao DESC 
+                    SELECT c.numero_proposta, c.data_criacao, c.status, c.valor_total, 
+                           u.nome_completo, c.data_validade
+                    FROM cotacoes c
+                    LEFT JOIN usuarios u ON u.id = c.responsavel_id
+                    WHERE c.cliente_id = ? 
+                    ORDER BY c.data_criacao DESC 
                     LIMIT 10
                 """, (self.current_cliente_id,))
                 
@@ -668,12 +647,8 @@ Contatos Cadastrados: {total_contatos}"""
                 if historico:
                     history_info = ""
                     for cotacao in historico:
-                        numero, data, status, valor, resp_id, validade = cotacao
-                        
-                        # Buscar nome do responsável
-                        c.execute("SELECT nome_completo FROM usuarios WHERE id = ?", (resp_id,))
-                        resp_nome = c.fetchone()
-                        resp_nome = resp_nome[0] if resp_nome else "N/A"
+                        numero, data, status, valor, resp_nome, validade = cotacao
+                        resp_nome = resp_nome or "N/A"
                         
                         valor = valor or 0  # Tratar valor None
                         history_info += f"📋 {numero}\n"
@@ -687,27 +662,11 @@ Contatos Cadastrados: {total_contatos}"""
                 
                 self.history_completo_text.insert('1.0', history_info)
                 
-                # Análise financeira
-                c.execute("""
-                    SELECT 
-                        SUM(CASE WHEN status = 'Aprovada' THEN valor_total ELSE 0 END) as aprovado,
-                        SUM(CASE WHEN status = 'Em Aberto' THEN valor_total ELSE 0 END) as em_aberto,
-                        SUM(CASE WHEN status = 'Rejeitada' THEN valor_total ELSE 0 END) as rejeitado
-                    FROM cotacoes 
-                    WHERE cliente_id = ?
-                """, (self.current_cliente_id,))
-                
-                finance_data = c.fetchone()
-                if finance_data:
-                    aprovado, em_aberto, rejeitado = finance_data
-                    aprovado = aprovado or 0
-                    em_aberto = em_aberto or 0
-                    rejeitado = rejeitado or 0
-                    
-                    # Garantir que são números
-                    aprovado = float(aprovado) if aprovado is not None else 0
-                    em_aberto = float(em_aberto) if em_aberto is not None else 0
-                    rejeitado = float(rejeitado) if rejeitado is not None else 0
+                # Análise financeira (do mesmo resumo)
+                if resumo:
+                    aprovado = float(resumo['valor_aprovado'])
+                    em_aberto = float(resumo['valor_aberto'])
+                    rejeitado = float(resumo['valor_rejeitado'])
                     
                     finance_info = f"""Valor Aprovado: R$ {aprovado:,.2f}
 Valor em Aberto: R$ {em_aberto:,.2f}
@@ -764,28 +723,18 @@ Potencial de Faturamento:
         
         if self.current_cliente_id:
             # Buscar estatísticas do cliente
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             
             try:
-                # Estatísticas
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE cliente_id = ?", (self.current_cliente_id,))
-                total_cotacoes = c.fetchone()[0]
-                
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE cliente_id = ? AND status = 'Aprovada'", (self.current_cliente_id,))
-                cotacoes_aprovadas = c.fetchone()[0]
-                
-                c.execute("SELECT SUM(valor_total) FROM cotacoes WHERE cliente_id = ? AND status = 'Aprovada'", (self.current_cliente_id,))
-                faturamento = c.fetchone()[0] or 0
-                
-                c.execute("SELECT COUNT(*) FROM contatos WHERE cliente_id = ?", (self.current_cliente_id,))
-                total_contatos = c.fetchone()[0]
+                # Estatísticas (uma linha de stats_summary)
+                resumo = resumo_cliente(self.current_cliente_id, conn)
                 
                 # Atualizar estatísticas
-                stats_info = f"""Total de Cotações: {total_cotacoes}
-Cotações Aprovadas: {cotacoes_aprovadas}
-Faturamento Total: R$ {faturamento:,.2f}
-Contatos Cadastrados: {total_contatos}"""
+                stats_info = f"""Total de Cotações: {resumo['cotacoes']}
+Cotações Aprovadas: {resumo['cotacoes_aprovadas']}
+Faturamento Total: R$ {resumo['valor_aprovado']:,.2f}
+Contatos Cadastrados: {resumo['contatos']}"""
                 
                 self.stats_text.insert('1.0', stats_info)
                 
@@ -1007,7 +956,7 @@ Contatos Cadastrados: {total_contatos}"""
             self.show_warning("Email inválido.")
             return
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -1070,7 +1019,7 @@ Contatos Cadastrados: {total_contatos}"""
             self.show_success("Cliente salvo com sucesso!")
             
             # Emitir evento para atualizar outros módulos
-            self.emit_event('cliente_created')
+            self.emit_event('cliente_created', ids=self.current_cliente_id)
             
             # Recarregar lista
             self.carregar_clientes()
@@ -1085,77 +1034,54 @@ Contatos Cadastrados: {total_contatos}"""
         finally:
             conn.close()
             
+    def _setup_clientes_loader(self):
+        """Configurar carregamento paginado da lista de clientes (ordem alfabética)"""
+        self.clientes_loader = self.create_paginated_loader(
+            self.clientes_tree,
+            """
+                SELECT id, nome, cnpj, cidade, telefone, email, nome, id
+                FROM clientes
+            """,
+            ("nome", "id"),
+            self._cliente_tree_row,
+            descending=False,
+        )
+        
+    def _cliente_tree_row(self, row):
+        """Converter linha da consulta em (values, tags) para a lista de clientes"""
+        cliente_id, nome, cnpj, cidade, telefone, email = row[:6]
+        return (
+            nome,
+            format_cnpj(cnpj) if cnpj else "",
+            cidade or "",
+            format_phone(telefone) if telefone else "",
+            email or ""
+        ), (cliente_id,)
+        
     def carregar_clientes(self):
         """Carregar lista de clientes"""
-        # Limpar lista atual
-        for item in self.clientes_tree.get_children():
-            self.clientes_tree.delete(item)
-            
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
         try:
-            c.execute("""
-                SELECT id, nome, cnpj, cidade, telefone, email
-                FROM clientes
-                ORDER BY nome
-            """)
-            
-            for row in c.fetchall():
-                cliente_id, nome, cnpj, cidade, telefone, email = row
-                self.clientes_tree.insert("", "end", values=(
-                    nome,
-                    format_cnpj(cnpj) if cnpj else "",
-                    cidade or "",
-                    format_phone(telefone) if telefone else "",
-                    email or ""
-                ), tags=(cliente_id,))
-                
+            self.clientes_loader.load()
         except sqlite3.Error as e:
             self.show_error(f"Erro ao carregar clientes: {e}")
-        finally:
-            conn.close()
             
     def buscar_clientes(self):
-        """Buscar clientes com filtro"""
-        termo = self.search_var.get().strip()
-        
-        # Limpar lista atual
-        for item in self.clientes_tree.get_children():
-            self.clientes_tree.delete(item)
-            
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
+        """Buscar clientes com filtro (consulta em segundo plano)"""
+        termo = self.search_term()
+        erro = lambda e: self.show_error(f"Erro ao buscar clientes: {e}")
         
         try:
             if termo:
-                c.execute("""
-                    SELECT id, nome, cnpj, cidade, telefone, email
-                    FROM clientes
-                    WHERE nome LIKE ? OR cnpj LIKE ? OR cidade LIKE ?
-                    ORDER BY nome
-                """, (f"%{termo}%", f"%{termo}%", f"%{termo}%"))
+                # Índice de busca (FTS); sem ele, LIKE nas colunas principais
+                filtro = filtro_busca(termo, {"cliente": "id"}) or (
+                    "nome LIKE ? OR cnpj LIKE ? OR cidade LIKE ?",
+                    (f"%{termo}%", f"%{termo}%", f"%{termo}%"),
+                )
+                self.clientes_loader.load_async(*filtro, refine=self.search_refines(), on_error=erro)
             else:
-                c.execute("""
-                    SELECT id, nome, cnpj, cidade, telefone, email
-                    FROM clientes
-                    ORDER BY nome
-                """)
-            
-            for row in c.fetchall():
-                cliente_id, nome, cnpj, cidade, telefone, email = row
-                self.clientes_tree.insert("", "end", values=(
-                    nome,
-                    format_cnpj(cnpj) if cnpj else "",
-                    cidade or "",
-                    format_phone(telefone) if telefone else "",
-                    email or ""
-                ), tags=(cliente_id,))
-                
+                self.clientes_loader.load_async(on_error=erro)
         except sqlite3.Error as e:
             self.show_error(f"Erro ao buscar clientes: {e}")
-        finally:
-            conn.close()
             
     def editar_cliente(self):
         """Editar/Visualizar cliente selecionado baseado nas permissões"""
@@ -1200,7 +1126,7 @@ Contatos Cadastrados: {total_contatos}"""
     
     def carregar_cliente_para_edicao(self, cliente_id):
         """Carregar dados do cliente para edição"""
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -1279,7 +1205,7 @@ Contatos Cadastrados: {total_contatos}"""
             
         cliente_id = tags[0]
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -1293,7 +1219,7 @@ Contatos Cadastrados: {total_contatos}"""
             self.show_success("Cliente excluído com sucesso!")
             
             # Emitir evento para atualizar outros módulos
-            self.emit_event('cliente_deleted')
+            self.emit_event('cliente_deleted', ids=cliente_id)
             
             # Recarregar lista
             self.carregar_clientes()
@@ -1326,7 +1252,7 @@ Contatos Cadastrados: {total_contatos}"""
             self.show_warning("O contato deve ter pelo menos um telefone ou email.")
             return
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -1417,7 +1343,7 @@ Contatos Cadastrados: {total_contatos}"""
             
         contato_id = tags[0]
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
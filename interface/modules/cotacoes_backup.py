@@ -3,7 +3,7 @@ from tkinter import ttk, messagebox, scrolledtext
 import sqlite3
 from datetime import datetime, date
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection, reindexar_cotacao
 from utils.formatters import format_currency, format_date, clean_number
 from utils.cotacao_validator import verificar_e_atualizar_status_cotacoes, obter_cotacoes_por_status
 from pdf_generators.cotacao_nova import gerar_pdf_cotacao_nova
@@ -599,7 +599,7 @@ class CotacoesModule(BaseModule):
 		self.locacao_fields_frame.pack_forget()
 		# Carregar lista de compressores para locação
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo = 1 ORDER BY nome")
 			comp_list = [row[0] for row in c.fetchall()]
@@ -832,7 +832,7 @@ class CotacoesModule(BaseModule):
 		try:
 			if hasattr(self, 'item_nome_combo_locacao'):
 				print("DEBUG UPDATE_PRODUTOS: item_nome_combo_locacao encontrado")
-				conn = sqlite3.connect(DB_NAME)
+				conn = get_connection()
 				c = conn.cursor()
 				c.execute("SELECT nome FROM produtos WHERE tipo='Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo=1 ORDER BY nome")
 				compressores = [row[0] for row in c.fetchall()]
@@ -886,7 +886,7 @@ class CotacoesModule(BaseModule):
 				self.item_nome_combo_compra['values'] = []
 			return
 		
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		try:
 			if tipo_db == 'Produto':
@@ -920,7 +920,7 @@ class CotacoesModule(BaseModule):
 		if not nome or not tipo:
 			return
 			
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -1062,7 +1062,7 @@ class CotacoesModule(BaseModule):
 		
 	def refresh_clientes(self):
 		"""Atualizar lista de clientes"""
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -1110,7 +1110,7 @@ class CotacoesModule(BaseModule):
 		try:
 			if hasattr(self, 'item_nome_combo_locacao'):
 				print("DEBUG FORCE_UPDATE: Forçando atualização do combobox de locação...")
-				conn = sqlite3.connect(DB_NAME)
+				conn = get_connection()
 				c = conn.cursor()
 				c.execute("SELECT nome FROM produtos WHERE tipo='Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo=1 ORDER BY nome")
 				compressores = [row[0] for row in c.fetchall()]
@@ -1154,7 +1154,7 @@ class CotacoesModule(BaseModule):
 			return
 			
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			
 			# Buscar prazo de pagamento do cliente
@@ -1182,7 +1182,7 @@ class CotacoesModule(BaseModule):
 	def gerar_numero_sequencial(self):
 		"""Gerar número sequencial para cotação"""
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			
 			# Buscar o maior número sequencial existente
@@ -1631,7 +1631,7 @@ class CotacoesModule(BaseModule):
 		if not self.itens_tree.get_children():
 			self.show_warning("Adicione pelo menos um item à cotação.")
 			return
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		try:
 			# Calcular valor total somando itens
@@ -1737,6 +1737,7 @@ class CotacoesModule(BaseModule):
 				""", (cotacao_id, tipo, nome, quantidade, valor_unitario, valor_total_item, desc,
 					 valor_mao_obra, valor_desloc, valor_estadia, icms_item_val, tipo_operacao,
 					 inicio_iso, fim_iso, meses_int))
+			reindexar_cotacao(c, cotacao_id)
 			conn.commit()
 			self.show_success("Cotação salva com sucesso!")
 			self.emit_event('cotacao_created')
@@ -1808,7 +1809,7 @@ class CotacoesModule(BaseModule):
 	def _get_current_username(self):
 		"""Obter o username do usuário atual"""
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			c.execute("SELECT username FROM usuarios WHERE id = ?", (self.user_id,))
 			result = c.fetchone()
@@ -1828,7 +1829,7 @@ class CotacoesModule(BaseModule):
 		for item in self.cotacoes_tree.get_children():
 			self.cotacoes_tree.delete(item)
 			
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -1863,7 +1864,7 @@ class CotacoesModule(BaseModule):
 		for item in self.cotacoes_tree.get_children():
 			self.cotacoes_tree.delete(item)
 			
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -1918,7 +1919,7 @@ class CotacoesModule(BaseModule):
 		
 	def carregar_cotacao_para_edicao(self, cotacao_id):
 		"""Carregar dados da cotação para edição"""
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -2006,7 +2007,7 @@ class CotacoesModule(BaseModule):
 		# Limpar lista atual
 		for item in self.itens_tree.get_children():
 			self.itens_tree.delete(item)
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		try:
 			c.execute("""
@@ -2101,7 +2102,7 @@ class CotacoesModule(BaseModule):
 			
 	def preencher_relacao_pecas_kit(self, kit_id):
 		"""Preenche automaticamente a relação de peças quando um kit é selecionado"""
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -3,10 +3,13 @@ from tkinter import ttk
 import sqlite3
 from datetime import datetime, timedelta
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_currency
+from utils.stats import resumo_geral, resumo_responsavel
 
 class DashboardModule(BaseModule):
+    event_topics = ('cliente_created', 'produto_created', 'cotacao_created', 'relatorio_created', 'cotacoes_expiradas')
+
     def setup_ui(self):
         # Container principal
         container = tk.Frame(self.frame, bg='#f8fafc')
@@ -162,81 +165,90 @@ class DashboardModule(BaseModule):
         reports_scrollbar.pack(side="right", fill="y", pady=5)
         
     def load_dashboard_data(self):
-        """Carregar dados do dashboard"""
-        conn = sqlite3.connect(DB_NAME)
+        """Carregar dados do dashboard (consultas em segundo plano, widgets na thread do Tk)"""
+        # Verificar se usuário pode ver dados gerais (admin ou com permissão de consulta no dashboard)
+        can_view_general_data = (self.has_role('admin') or 
+                               (hasattr(self.main_window, 'has_access') and 
+                                self.main_window.has_access('dashboard')))
+        
+        self.run_in_background(
+            self._query_dashboard_data,
+            can_view_general_data,
+            description="Atualizando dashboard...",
+            on_success=self._apply_dashboard_data,
+            on_error=lambda e: self.show_error(f"Erro ao carregar dados: {e}"),
+        )
+        
+    def _query_dashboard_data(self, can_view_general_data):
+        """Executa as consultas do dashboard. Não acessa widgets (roda fora da thread do Tk)."""
+        conn = get_connection()
         c = conn.cursor()
         
         try:
-            # Verificar se usuário pode ver dados gerais (admin ou com permissão de consulta no dashboard)
-            can_view_general_data = (self.has_role('admin') or 
-                                   (hasattr(self.main_window, 'has_access') and 
-                                    self.main_window.has_access('dashboard')))
-            
+            # Cards: uma linha de stats_summary (contadores mantidos por triggers)
+            cards = {}
             if can_view_general_data:
                 # Admin ou usuários com permissão de consulta veem dados gerais
-                # Clientes
-                c.execute("SELECT COUNT(*) FROM clientes")
-                clients_count = c.fetchone()[0]
-                self.clients_card.value_label.config(text=str(clients_count))
-                
-                # Produtos
-                c.execute("SELECT COUNT(*) FROM produtos WHERE ativo = 1")
-                products_count = c.fetchone()[0]
-                self.products_card.value_label.config(text=str(products_count))
-                
-                # Cotações
-                c.execute("SELECT COUNT(*) FROM cotacoes")
-                quotes_count = c.fetchone()[0]
-                self.quotes_card.value_label.config(text=str(quotes_count))
-                
-                # Relatórios
-                c.execute("SELECT COUNT(*) FROM relatorios_tecnicos")
-                reports_count = c.fetchone()[0]
-                self.reports_card.value_label.config(text=str(reports_count))
+                resumo = resumo_geral(conn)
+                cards['clients'] = str(resumo['clientes'])
+                cards['products'] = str(resumo['produtos_ativos'])
+                cards['quotes'] = str(resumo['cotacoes'])
+                cards['reports'] = str(resumo['relatorios'])
             else:
                 # Usuários sem permissão veem apenas seus dados
-                # Cotações do usuário
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE responsavel_id = ?", (self.user_id,))
-                quotes_count = c.fetchone()[0]
-                self.quotes_card.value_label.config(text=str(quotes_count))
-                
-                # Relatórios do usuário
-                c.execute("SELECT COUNT(*) FROM relatorios_tecnicos WHERE responsavel_id = ?", (self.user_id,))
-                reports_count = c.fetchone()[0]
-                self.reports_card.value_label.config(text=str(reports_count))
-                
+                resumo = resumo_responsavel(self.user_id, conn)
+                cards['quotes'] = str(resumo['cotacoes'])
+                cards['reports'] = str(resumo['relatorios'])
                 # Faturamento do usuário (cotações aprovadas)
-                c.execute("SELECT SUM(valor_total) FROM cotacoes WHERE responsavel_id = ? AND status = 'Aprovada'", (self.user_id,))
-                faturamento = c.fetchone()[0] or 0
-                self.clients_card.value_label.config(text=format_currency(faturamento))
-                
+                cards['clients'] = format_currency(resumo['valor_aprovado'])
                 # Quantidade de propostas feitas
-                c.execute("SELECT COUNT(*) FROM cotacoes WHERE responsavel_id = ?", (self.user_id,))
-                propostas_count = c.fetchone()[0]
-                self.products_card.value_label.config(text=str(propostas_count))
+                cards['products'] = str(resumo['cotacoes'])
             
-            # Carregar cotações recentes
-            self.load_recent_quotes(c)
-            
-            # Carregar relatórios recentes
-            self.load_recent_reports(c)
-            
-        except sqlite3.Error as e:
-            self.show_error(f"Erro ao carregar dados: {e}")
+            return {
+                'cards': cards,
+                'recent_quotes': self.load_recent_quotes(c, can_view_general_data),
+                'recent_reports': self.load_recent_reports(c, can_view_general_data),
+            }
         finally:
             conn.close()
             
-    def load_recent_quotes(self, cursor):
-        """Carregar cotações recentes"""
-        # Limpar lista atual
-        for item in self.quotes_tree.get_children():
-            self.quotes_tree.delete(item)
-            
-        # Verificar se usuário pode ver dados gerais (admin ou com permissão de consulta)
-        can_view_general_data = (self.has_role('admin') or 
-                               (hasattr(self.main_window, 'has_access') and 
-                                self.main_window.has_access('dashboard')))
+    def _apply_dashboard_data(self, data):
+        """Preencher cards e listas com o resultado de _query_dashboard_data"""
+        cards = {
+            'clients': self.clients_card,
+            'products': self.products_card,
+            'quotes': self.quotes_card,
+            'reports': self.reports_card,
+        }
+        for key, text in data['cards'].items():
+            cards[key].value_label.config(text=text)
+        
+        # Cotações recentes
+        self.quotes_tree.delete(*self.quotes_tree.get_children())
+        for row in data['recent_quotes']:
+            numero, cliente, data_criacao, valor, status = row
+            self.quotes_tree.insert("", "end", values=(
+                numero,
+                cliente,
+                data_criacao,
+                format_currency(valor) if valor else "R$ 0,00",
+                status
+            ))
+        
+        # Relatórios recentes
+        self.reports_tree.delete(*self.reports_tree.get_children())
+        for row in data['recent_reports']:
+            numero, cliente, data_criacao, responsavel, tipo = row
+            self.reports_tree.insert("", "end", values=(
+                numero,
+                cliente,
+                data_criacao,
+                responsavel,
+                tipo or "N/A"
+            ))
             
+    def load_recent_quotes(self, cursor, can_view_general_data):
+        """Buscar cotações recentes"""
         # Buscar cotações recentes baseadas no perfil
         if can_view_general_data:
             cursor.execute("""
@@ -255,28 +267,10 @@ class DashboardModule(BaseModule):
                 ORDER BY c.created_at DESC
                 LIMIT 10
             """, (self.user_id,))
-        
-        for row in cursor.fetchall():
-            numero, cliente, data, valor, status = row
-            self.quotes_tree.insert("", "end", values=(
-                numero,
-                cliente,
-                data,
-                format_currency(valor) if valor else "R$ 0,00",
-                status
-            ))
-            
-    def load_recent_reports(self, cursor):
-        """Carregar relatórios recentes"""
-        # Limpar lista atual
-        for item in self.reports_tree.get_children():
-            self.reports_tree.delete(item)
-            
-        # Verificar se usuário pode ver dados gerais (admin ou com permissão de consulta)
-        can_view_general_data = (self.has_role('admin') or 
-                               (hasattr(self.main_window, 'has_access') and 
-                                self.main_window.has_access('dashboard')))
+        return cursor.fetchall()
             
+    def load_recent_reports(self, cursor, can_view_general_data):
+        """Buscar relatórios recentes"""
         # Buscar relatórios recentes baseadas no perfil
         if can_view_general_data:
             cursor.execute("""
@@ -297,19 +291,10 @@ class DashboardModule(BaseModule):
                 ORDER BY r.created_at DESC
                 LIMIT 10
             """, (self.user_id,))
-        
-        for row in cursor.fetchall():
-            numero, cliente, data, responsavel, tipo = row
-            self.reports_tree.insert("", "end", values=(
-                numero,
-                cliente,
-                data,
-                responsavel,
-                tipo or "N/A"
-            ))
+        return cursor.fetchall()
             
     def handle_event(self, event_type, data=None):
         """Manipular eventos do sistema"""
         # Recarregar dados quando houver mudanças
-        if event_type in ['cliente_created', 'produto_created', 'cotacao_created', 'relatorio_created']:
+        if event_type in ['cliente_created', 'produto_created', 'cotacao_created', 'relatorio_created', 'cotacoes_expiradas']:
             self.load_dashboard_data()
\ No newline at end of file
@@ -4,14 +4,30 @@ import sqlite3
 from datetime import datetime
 
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_currency, format_date, clean_number
+from utils.busca import filtro_busca
+from utils.numeracao import proximo_numero, numero_para_gravar
+from utils.itens_cotacao import ItemCotacao, ItensCotacaoStore, ItensCotacaoTracker
 from pdf_generators.cotacao_nova import gerar_pdf_cotacao_nova
+from pdf_generators.fingerprint import obter_pdf_cotacao
+
+# Colunas de itens_cotacao gravadas pelo módulo (ordem usada ao carregar e salvar)
+COLUNAS_ITENS = (
+	"tipo", "item_nome", "quantidade", "valor_unitario", "valor_total_item", "descricao",
+	"mao_obra", "deslocamento", "estadia", "icms", "tipo_operacao",
+	"locacao_data_inicio", "locacao_data_fim", "locacao_qtd_meses", "locacao_imagem_path",
+)
 
 
 class LocacoesModule(BaseModule):
+	event_topics = ('cliente_created', 'cliente_updated', 'cliente_deleted',
+					'produto_created', 'produto_updated', 'produto_deleted')
+
 	def setup_ui(self):
 		self.current_cotacao_id = None
+		self.itens_store = ItensCotacaoStore()
+		self.itens_tracker = ItensCotacaoTracker(COLUNAS_ITENS)
 
 		container = tk.Frame(self.frame, bg='#f8fafc')
 		container.pack(fill="both", expand=True, padx=10, pady=10)
@@ -209,17 +225,7 @@ class LocacoesModule(BaseModule):
 		tk.Label(add_frame, text="Nome do Equipamento:", font=("Arial", 10, "bold"), background="white").grid(row=row, column=0, padx=5, sticky="w")
 		self.item_nome_combo = ttk.Combobox(add_frame, textvariable=self.item_nome_var, width=40, state="readonly")
 		self.item_nome_combo.grid(row=row, column=1, padx=5, sticky="ew")
-		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo = 1 ORDER BY nome")
-			comp_list = [row[0] for row in c.fetchall()]
-			self.item_nome_combo['values'] = comp_list
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
+		self.item_nome_combo['values'] = self.reference_data.compressores()
 		row += 1
 
 		tk.Label(add_frame, text="Descrição:", font=("Arial", 10, "bold"), background="white").grid(row=row, column=0, padx=5, sticky="w")
@@ -310,23 +316,20 @@ class LocacoesModule(BaseModule):
 		if not selected:
 			self.show_warning("Selecione um item para aplicar a imagem.")
 			return
-		img = self.item_imagem_var.get().strip()
-		item_id = selected[0]
-		vals = list(self.itens_tree.item(item_id)['values'])
-		if len(vals) == 9:
-			vals[8] = img
-			self.itens_tree.item(item_id, values=tuple(vals))
+		self._definir_imagem_item(selected[0], self.item_imagem_var.get().strip())
 
 	def _remover_imagem_item_selecionado(self):
 		selected = self.itens_tree.selection()
 		if not selected:
 			self.show_warning("Selecione um item para remover a imagem.")
 			return
-		item_id = selected[0]
-		vals = list(self.itens_tree.item(item_id)['values'])
-		if len(vals) == 9:
-			vals[8] = ""
-			self.itens_tree.item(item_id, values=tuple(vals))
+		self._definir_imagem_item(selected[0], "")
+
+	def _definir_imagem_item(self, iid, imagem):
+		item = self.itens_store.get(iid)
+		if item is not None:
+			item.locacao_imagem_path = imagem
+			self.itens_tree.item(iid, values=self._item_tree_values(item))
 
 	def _adicionar_item(self):
 		if not self.can_edit('locacoes'):
@@ -352,21 +355,16 @@ class LocacoesModule(BaseModule):
 		except ValueError:
 			self.show_error("Valores numéricos inválidos para item.")
 			return
-		meses = self._calculate_months_between(inicio_iso, fim_iso)
-		# Calcular total sem ICMS
-		total = ((valor_unit or 0) * (meses or 0) * quantidade)
-			
-		self.itens_tree.insert("", "end", values=(
-			nome,
-			f"{quantidade:.2f}",
-			format_currency(valor_unit),
-			str(meses),
-			format_date(inicio_iso),
-			format_date(fim_iso),
-			format_currency(total),
-			desc,
-			self.item_imagem_var.get().strip()
-		))
+		# Total sem ICMS (qtd x mensal x meses), calculado pelo modelo
+		item = ItemCotacao(
+			tipo="Produto", item_nome=nome, quantidade=quantidade, valor_unitario=valor_unit,
+			descricao=desc, tipo_operacao="Locação",
+			locacao_data_inicio=inicio_iso, locacao_data_fim=fim_iso,
+			locacao_qtd_meses=self._calculate_months_between(inicio_iso, fim_iso),
+			locacao_imagem_path=self.item_imagem_var.get().strip()
+		)
+		iid = self.itens_tree.insert("", "end", values=self._item_tree_values(item))
+		self.itens_store.adicionar(iid, item)
 		self._update_total()
 		# clear item inputs
 		self.item_nome_var.set("")
@@ -382,36 +380,32 @@ class LocacoesModule(BaseModule):
 		sel = self.itens_tree.selection()
 		for s in sel:
 			self.itens_tree.delete(s)
+			self.itens_store.remover(s)
 		self._update_total()
 
+	def _item_tree_values(self, item):
+		return (
+			item.item_nome,
+			f"{item.quantidade:.2f}",
+			format_currency(item.valor_unitario),
+			str(item.locacao_qtd_meses or ""),
+			format_date(item.locacao_data_inicio) if item.locacao_data_inicio else "",
+			format_date(item.locacao_data_fim) if item.locacao_data_fim else "",
+			format_currency(item.valor_total_item),
+			item.descricao,
+			item.locacao_imagem_path or "",
+		)
+
 	def _update_total(self):
-		total = 0
-		for iid in self.itens_tree.get_children():
-			values = self.itens_tree.item(iid)['values']
-			if len(values) >= 7:
-				valor_total_str = str(values[6]).replace('R$ ', '').replace('.', '').replace(',', '.')
-				try:
-					total += float(valor_total_str)
-				except ValueError:
-					pass
-		self.total_label.config(text=f"Total: {format_currency(total)}")
+		self.total_label.config(text=f"Total: {format_currency(self.itens_store.totais['total'])}")
 
 	# --- DB helpers ---
 	def _refresh_clientes(self):
 		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT id, nome FROM clientes ORDER BY nome")
-			clientes = c.fetchall()
-			self.clientes_dict = {f"{nome} (ID: {id})": id for id, nome in clientes}
-			self.cliente_combo['values'] = list(self.clientes_dict.keys())
+			self.clientes_dict = self.reference_data.clientes_dict()
+			self.cliente_combo['values'] = list(self.clientes_dict)
 		except Exception as e:
 			print(f"Erro ao carregar clientes: {e}")
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
 
 	def _on_cliente_selected(self, event=None):
 		cliente_str = self.cliente_var.get().strip()
@@ -421,7 +415,7 @@ class LocacoesModule(BaseModule):
 		if not cliente_id:
 			return
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			# Carregar contatos do cliente
 			c.execute("SELECT nome FROM contatos WHERE cliente_id = ? ORDER BY nome", (cliente_id,))
@@ -448,20 +442,9 @@ class LocacoesModule(BaseModule):
 				pass
 
 	def _gerar_numero_sequencial(self) -> str:
-		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT MAX(CAST(SUBSTR(numero_proposta, 5) AS INTEGER)) FROM cotacoes WHERE tipo_cotacao='Locação' AND numero_proposta LIKE 'LOC-%'")
-			result = c.fetchone()
-			proximo = (result[0] + 1) if (result and result[0]) else 1
-			return f"LOC-{proximo:06d}"
-		except Exception:
-			return f"LOC-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
+		"""Sugestão da série LOC- (o número é reservado ao salvar)"""
+		self._numero_sugerido = proximo_numero('LOC')
+		return self._numero_sugerido
 
 	# --- Persistência ---
 	def salvar(self):
@@ -486,22 +469,15 @@ class LocacoesModule(BaseModule):
 			self.show_warning("Cliente inválido.")
 			return
 
-		# Somar total
-		total = 0
-		for iid in self.itens_tree.get_children():
-			values = self.itens_tree.item(iid)['values']
-			if len(values) >= 7:
-				try:
-					total += float(str(values[6]).replace('R$ ', '').replace('.', '').replace(',', '.'))
-				except ValueError:
-					pass
+		# Total mantido pelo modelo de itens
+		total = float(self.itens_store.totais['total'])
 
 		data_validade = None
 		filial_str = self.filial_var.get()
 		filial_id = int(filial_str.split(' - ')[0]) if ' - ' in filial_str else int(filial_str)
 
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 
 			if self.current_cotacao_id:
@@ -522,9 +498,10 @@ class LocacoesModule(BaseModule):
 						self.current_cotacao_id,
 					),
 				)
-				c.execute("DELETE FROM itens_cotacao WHERE cotacao_id = ?", (self.current_cotacao_id,))
 				cotacao_id = self.current_cotacao_id
 			else:
+				# Número reservado nesta transação (sugestão mantida) ou o digitado
+				numero = numero_para_gravar(c, 'LOC', numero, getattr(self, '_numero_sugerido', None))
 				c.execute(
 					"""
 					INSERT INTO cotacoes (
@@ -544,34 +521,15 @@ class LocacoesModule(BaseModule):
 				cotacao_id = c.lastrowid
 				self.current_cotacao_id = cotacao_id
 
-			# Inserir itens com imagem por item
-			for iid in self.itens_tree.get_children():
-				values = self.itens_tree.item(iid)['values']
-				(nome, qtd, valor_unit_fmt, meses, inicio_fmt, fim_fmt, total_fmt, desc, imagem) = values
-				quantidade = float(qtd)
-				valor_unit = clean_number(valor_unit_fmt)
-				valor_total_item = clean_number(total_fmt)
-				icms_val = 0
-				inicio_iso = self._parse_date(inicio_fmt)
-				fim_iso = self._parse_date(fim_fmt)
-				meses_int = int(meses) if str(meses).isdigit() else None
-				c.execute(
-					"""
-					INSERT INTO itens_cotacao (
-						cotacao_id, tipo, item_nome, quantidade, valor_unitario, valor_total_item, descricao,
-						mao_obra, deslocamento, estadia, icms, tipo_operacao, locacao_data_inicio, locacao_data_fim, locacao_qtd_meses,
-						locacao_imagem_path
-					) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-					""",
-					(
-						cotacao_id, "Produto", nome, quantidade, valor_unit, valor_total_item, desc,
-						0, 0, 0, icms_val, "Locação", inicio_iso, fim_iso, meses_int,
-						imagem,
-					),
-				)
+			# Gravar apenas os itens alterados (com imagem por item)
+			linhas = self.itens_store.linhas(COLUNAS_ITENS)
+			self.itens_tracker.salvar(c, cotacao_id, linhas)
 
 			conn.commit()
+			self.itens_tracker.confirmar()
+			self.numero_var.set(numero)
 			self.show_success("Locação salva com sucesso!")
+			self.emit_event('cotacao_created', ids=cotacao_id)
 			self._carregar_lista()
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao salvar locação: {e}")
@@ -583,6 +541,7 @@ class LocacoesModule(BaseModule):
 
 	def nova(self):
 		self.current_cotacao_id = None
+		self.itens_tracker.reset()
 		self.numero_var.set("")
 		self.cliente_var.set("")
 		self.contato_cliente_var.set("")
@@ -597,8 +556,9 @@ class LocacoesModule(BaseModule):
 			self.contato_cliente_combo['values'] = []
 		except Exception:
 			pass
-		for iid in self.itens_tree.get_children():
-			self.itens_tree.delete(iid)
+		self.itens_tree.delete(*self.itens_tree.get_children())
+		self.itens_store.limpar()
+		self._update_total()
 		# limpar qualquer imagem temporária
 		self.item_imagem_var.set("")
 		# Limpar campos de item
@@ -626,22 +586,16 @@ class LocacoesModule(BaseModule):
 		if not cotacao_id:
 			self.show_warning("Selecione uma locação na lista para gerar o PDF.")
 			return
-		try:
-			current_username = self._get_current_username()
-			sucesso, resultado = gerar_pdf_cotacao_nova(
-				cotacao_id,
-				DB_NAME,
-				current_username,
-				contato_nome=self.contato_cliente_var.get(),
-				locacao_pagina4_text=None,
-				locacao_pagina4_image=None,
-			)
-			if sucesso:
-				self.show_success(f"PDF gerado com sucesso!\nLocal: {resultado}")
-			else:
-				self.show_error(f"Erro ao gerar PDF: {resultado}")
-		except Exception as e:
-			self.show_error(f"Erro ao gerar PDF: {e}")
+		current_username = self._get_current_username()
+		self.generate_pdf_in_background(
+			gerar_pdf_cotacao_nova,
+			cotacao_id,
+			DB_NAME,
+			current_username,
+			contato_nome=self.contato_cliente_var.get(),
+			locacao_pagina4_text=None,
+			locacao_pagina4_image=None,
+		)
 			
 	def abrir_pdf(self):
 		"""Abrir PDF da locação selecionada"""
@@ -656,39 +610,20 @@ class LocacoesModule(BaseModule):
 			
 		cotacao_id = tags[0]
 		
-		# Primeiro gerar o PDF se não existir
-		try:
-			current_username = self._get_current_username()
-			sucesso, resultado = gerar_pdf_cotacao_nova(
-				cotacao_id, 
-				DB_NAME, 
-				current_username, 
-				contato_nome=self.contato_cliente_var.get()
-			)
-			
-			if sucesso:
-				# Abrir o PDF com o aplicativo padrão
-				try:
-					import os
-					import sys
-					if os.name == 'nt':  # Windows
-						os.startfile(resultado)
-					elif sys.platform == 'darwin':  # macOS
-						import subprocess
-						subprocess.Popen(['open', resultado])
-					else:  # Linux
-						import subprocess
-						subprocess.Popen(['xdg-open', resultado])
-				except Exception as e:
-					self.show_error(f"Erro ao abrir PDF: {e}")
-			else:
-				self.show_error(f"Erro ao gerar PDF: {resultado}")
-		except Exception as e:
-			self.show_error(f"Erro ao abrir PDF: {e}")
+		# Reaproveita o PDF gravado se a cotação não mudou
+		current_username = self._get_current_username()
+		self.generate_pdf_in_background(
+			obter_pdf_cotacao,
+			cotacao_id, 
+			DB_NAME, 
+			current_username, 
+			contato_nome=self.contato_cliente_var.get(),
+			open_after=True
+		)
 
 	def _get_current_username(self):
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			c.execute("SELECT username FROM usuarios WHERE id = ?", (self.user_id,))
 			r = c.fetchone()
@@ -706,7 +641,7 @@ class LocacoesModule(BaseModule):
 		for iid in self.tree.get_children():
 			self.tree.delete(iid)
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			c.execute(
 				"""
@@ -734,24 +669,29 @@ class LocacoesModule(BaseModule):
 				pass
 
 	def buscar(self):
-		termo = self.search_var.get().strip()
+		termo = self.search_term()
 		for iid in self.tree.get_children():
 			self.tree.delete(iid)
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			if termo:
+				# Índice de busca (FTS): locação ou cliente; sem ele, LIKE
+				where, params = filtro_busca(termo, {"cotacao": "id", "cliente": "cliente_id"}) or (
+					"""(numero_proposta LIKE ? OR cliente IN (
+						SELECT nome FROM clientes WHERE nome LIKE ?
+					))""",
+					(f"%{termo}%", f"%{termo}%"),
+				)
 				c.execute(
-					"""
+					f"""
 					SELECT id, numero_proposta, (SELECT nome FROM clientes WHERE id=cliente_id) AS cliente,
 					       data_criacao, valor_total, status
 					FROM cotacoes
-					WHERE tipo_cotacao = 'Locação' AND (numero_proposta LIKE ? OR cliente IN (
-						SELECT nome FROM clientes WHERE nome LIKE ?
-					))
+					WHERE tipo_cotacao = 'Locação' AND {where}
 					ORDER BY created_at DESC
 					""",
-					(f"%{termo}%", f"%{termo}%"),
+					params,
 				)
 			else:
 				c.execute(
@@ -805,7 +745,7 @@ class LocacoesModule(BaseModule):
 
 	def _carregar_cotacao(self, cotacao_id):
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			c.execute(
 				"""
@@ -849,34 +789,15 @@ class LocacoesModule(BaseModule):
 				self.observacoes_text.insert("1.0", observacoes)
 
 			# itens
-			for iid in self.itens_tree.get_children():
-				self.itens_tree.delete(iid)
-			c.execute(
-				"""
-				SELECT item_nome, quantidade, valor_unitario, locacao_qtd_meses, locacao_data_inicio,
-				       locacao_data_fim, valor_total_item, descricao, locacao_imagem_path
-				FROM itens_cotacao
-				WHERE cotacao_id = ?
-				ORDER BY id
-				""",
-				(cid,),
-			)
+			self.itens_tree.delete(*self.itens_tree.get_children())
+			self.itens_store.limpar()
 			first_img = ""
-			for (nome, qtd, valor_unit, meses, inicio, fim, total_item, desc, img) in c.fetchall():
-				self.itens_tree.insert(
-					"", "end",
-					values=(
-						nome,
-						f"{qtd:.2f}",
-						format_currency(valor_unit),
-						str(meses or ""),
-						format_date(inicio) if inicio else "",
-						format_date(fim) if fim else "",
-						format_currency(total_item),
-						desc or "",
-						img or "",
-					),
-				)
+			for item_id, row in self.itens_tracker.carregar(c, cid):
+				item = ItemCotacao.de_linha(COLUNAS_ITENS, row)
+				iid = self.itens_tree.insert("", "end", values=self._item_tree_values(item))
+				self.itens_store.adicionar(iid, item)
+				self.itens_tracker.vincular(iid, item_id)
+				img = item.locacao_imagem_path
 				if not first_img and img:
 					first_img = img
 			self._update_total()
@@ -918,9 +839,9 @@ class LocacoesModule(BaseModule):
 		return months if months > 0 else 1
 
 	def handle_event(self, event_type, data=None):
-		if event_type in ('cliente_created', 'cliente_updated'):
+		if event_type in ('cliente_created', 'cliente_updated', 'cliente_deleted'):
 			self._refresh_clientes()
-		elif event_type in ('produto_created', 'produto_updated'):
+		elif event_type in ('produto_created', 'produto_updated', 'produto_deleted'):
 			# Atualizar imediatamente a lista de compressores do combobox de itens
 			try:
 				# Se a UI ainda não criou o combobox, ignore silenciosamente
@@ -933,26 +854,16 @@ class LocacoesModule(BaseModule):
 		# Só procede se o combobox existir
 		if not hasattr(self, 'item_nome_combo'):
 			return
+		comp_list = self.reference_data.compressores()
+		# Forçar atualização visual do combobox
 		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo = 1 ORDER BY nome")
-			comp_list = [row[0] for row in c.fetchall()]
-			# Forçar atualização visual do combobox
-			try:
-				self.item_nome_combo.configure(state='normal')
-				self.item_nome_combo['values'] = comp_list
-				# Limpar seleção corrente para refletir novos valores
-				self.item_nome_var.set("")
-				self.item_nome_combo.configure(state='readonly')
-				self.item_nome_combo.update_idletasks()
-			except Exception:
-				pass
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
+			self.item_nome_combo.configure(state='normal')
+			self.item_nome_combo['values'] = comp_list
+			# Limpar seleção corrente para refletir novos valores
+			self.item_nome_var.set("")
+			self.item_nome_combo.configure(state='readonly')
+		except Exception:
+			pass
 
 	def _on_item_double_click(self, event=None):
 		selected = self.itens_tree.selection()
@@ -989,29 +900,22 @@ class LocacoesModule(BaseModule):
 
 		def on_save():
 			try:
-				# ler campos
-				nome = entries[0].get().strip()
-				quantidade = float(entries[1].get().strip().replace(',', '.'))
-				valor_unit = clean_number(entries[2].get().strip())
-				meses = int(entries[3].get().strip() or 0)
-				inicio = entries[4].get().strip()
-				fim = entries[5].get().strip()
-				descricao = entries[7].get().strip()
-				imagem = entries[8].get().strip()
-				# recalcular total sem ICMS
-				total = ((valor_unit or 0) * (meses or 0) * (quantidade or 0))
-				# formatar
-				vals[0] = nome
-				vals[1] = f"{quantidade:.2f}"
-				vals[2] = format_currency(valor_unit)
-				vals[3] = str(meses)
-				vals[4] = entries[4].get().strip()
-				vals[5] = entries[5].get().strip()
-				vals[6] = format_currency(total)
-				vals[7] = descricao
-				vals[8] = imagem
-				# ICMS removido
-				self.itens_tree.item(iid, values=tuple(vals))
+				# ler campos; total sem ICMS recalculado pelo modelo
+				anterior = self.itens_store.get(iid)
+				item = ItemCotacao(
+					tipo=anterior.tipo if anterior else "Produto",
+					item_nome=entries[0].get().strip(),
+					quantidade=float(entries[1].get().strip().replace(',', '.')),
+					valor_unitario=clean_number(entries[2].get().strip()),
+					locacao_qtd_meses=int(entries[3].get().strip() or 0),
+					locacao_data_inicio=self._parse_date(entries[4].get().strip()),
+					locacao_data_fim=self._parse_date(entries[5].get().strip()),
+					descricao=entries[7].get().strip(),
+					locacao_imagem_path=entries[8].get().strip(),
+					tipo_operacao="Locação"
+				)
+				self.itens_store.atualizar(iid, item)
+				self.itens_tree.item(iid, values=self._item_tree_values(item))
 				self._update_total()
 				dialog.destroy()
 			except Exception as e:
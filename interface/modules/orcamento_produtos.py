@@ -3,19 +3,37 @@ from tkinter import ttk, messagebox, scrolledtext
 import sqlite3
 from datetime import datetime, date
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_currency, format_date, clean_number
-from utils.cotacao_validator import verificar_e_atualizar_status_cotacoes, obter_cotacoes_por_status
+from utils.cotacao_validator import verificar_expiracoes_agendado, obter_cotacoes_por_status
+from utils.busca import filtro_busca
+from utils.numeracao import proximo_numero, numero_para_gravar
+from utils.itens_cotacao import ItemCotacao, ItensCotacaoStore, ItensCotacaoTracker
 from pdf_generators.cotacao_nova import gerar_pdf_cotacao_nova
+from pdf_generators.fingerprint import obter_pdf_cotacao
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+# Colunas de itens_cotacao editadas pelo módulo (ordem usada ao carregar e salvar)
+COLUNAS_ITENS = (
+	"tipo", "item_nome", "quantidade", "valor_unitario", "valor_total_item", "descricao",
+	"mao_obra", "deslocamento", "estadia", "icms", "tipo_operacao",
+	"locacao_data_inicio", "locacao_data_fim", "locacao_qtd_meses",
+)
 
 class OrcamentoProdutosModule(BaseModule):
 	# Chave de permissão explícita
 	module_key = 'orcamento_produtos'
+	event_topics = ('cliente_created', 'cliente_deleted', 'produto_created', 'produto_updated', 'produto_deleted',
+					'cotacoes_expiradas', 'test_event')
 	def setup_ui(self):
 		# O listener já é registrado no BaseModule, não precisa registrar novamente
 		# Inicializar variáveis primeiro
 		self.current_cotacao_id = None
 		self.current_cotacao_itens = []
+		self.itens_store = ItensCotacaoStore()
+		self.itens_tracker = ItensCotacaoTracker(COLUNAS_ITENS)
 		
 		# Container principal - usando toda a tela
 		container = tk.Frame(self.frame, bg='#f8fafc')
@@ -83,7 +101,7 @@ class OrcamentoProdutosModule(BaseModule):
 				numero = self.gerar_numero_sequencial()
 				self.numero_var.set(numero)
 		except Exception as e:
-			print(f"Aviso ao gerar número sequencial inicial de cotação: {e}")
+			log.warning("Falha ao gerar número sequencial inicial de cotação: %s", e)
 		
 		# Painel da lista (direita)
 		lista_panel = tk.Frame(main_frame, bg='#f8fafc')
@@ -123,6 +141,17 @@ class OrcamentoProdutosModule(BaseModule):
 		
 		lista_scrollbar = ttk.Scrollbar(lista_inner, orient="vertical", command=self.cotacoes_tree.yview)
 		self.cotacoes_tree.configure(yscrollcommand=lista_scrollbar.set)
+		self.cotacoes_loader = self.create_paginated_loader(
+			self.cotacoes_tree,
+			"""
+				SELECT c.id, c.numero_proposta, cl.nome, c.data_criacao, c.valor_total, c.status,
+					   c.created_at, c.id
+				FROM cotacoes c
+				JOIN clientes cl ON c.cliente_id = cl.id
+			""",
+			("c.created_at", "c.id"),
+			self._cotacao_tree_row,
+		)
 		
 		self.cotacoes_tree.pack(side="left", fill="both", expand=True)
 		lista_scrollbar.pack(side="right", fill="y")
@@ -564,17 +593,7 @@ class OrcamentoProdutosModule(BaseModule):
 		self.compra_fields_frame.pack(fill="x")
 		self.locacao_fields_frame.pack_forget()
 		# Carregar lista de compressores para locação
-		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo = 1 ORDER BY nome")
-			comp_list = [row[0] for row in c.fetchall()]
-			self.item_nome_combo_locacao['values'] = comp_list
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
+		self.item_nome_combo_locacao['values'] = self.reference_data.compressores()
 		
 	def on_tipo_changed(self, event=None):
 		"""Callback quando o tipo do item muda - sempre Produto"""
@@ -769,63 +788,24 @@ class OrcamentoProdutosModule(BaseModule):
 		
 	def update_produtos_combo(self):
 		"""Atualizar combo de produtos - apenas Produtos (excluindo Compressores)"""
-		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			
-			# Buscar apenas produtos (tipo 'Produto' no banco, excluindo Compressores)
-			c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral') <> 'Compressores' AND ativo = 1 ORDER BY nome")
-			produtos = [row[0] for row in c.fetchall()]
-			
-			print(f"DEBUG UPDATE_PRODUTOS: Encontrados {len(produtos)} produtos no banco")
-			
-			# Atualizar combobox de produtos
-			if hasattr(self, 'item_nome_combo_compra'):
-				try:
-					self.item_nome_combo_compra.configure(state='normal')
-					self.item_nome_combo_compra['values'] = produtos
-					self.item_nome_combo_compra.set('')
-					self.item_nome_combo_compra.configure(state='readonly')
-					self.item_nome_combo_compra.update_idletasks()
-					print(f"DEBUG UPDATE_PRODUTOS: Atualizados {len(produtos)} produtos")
-				except Exception as e:
-					print(f"Erro ao atualizar combobox de produtos: {e}")
-			
-			conn.close()
-		except Exception as e:
-			print(f"Erro ao atualizar combo de produtos: {e}")
-		
-		
-		# Para compra, atualizar combo de produtos
 		tipo = self.item_tipo_var.get()
-		# Mapear para DB
-		if tipo == 'Serviços':
-			tipo_db = 'Kit'
-		else:
-			tipo_db = tipo
 		if not tipo:
 			if hasattr(self, 'item_nome_combo_compra'):
 				self.item_nome_combo_compra['values'] = []
 			return
-		
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
+		# Mapear para DB ('Produto' já exclui compressores)
+		tipo_db = 'Kit' if tipo == 'Serviços' else tipo
 		try:
-			if tipo_db == 'Produto':
-				# Excluir compressores da lista de Produto
-				c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral') <> 'Compressores' AND ativo = 1 ORDER BY nome")
-			else:
-				c.execute("SELECT nome FROM produtos WHERE tipo = ? AND ativo = 1 ORDER BY nome", (tipo_db,))
-			produtos = [row[0] for row in c.fetchall()]
-			
-			# Atualizar combo de compra
-			if hasattr(self, 'item_nome_combo_compra'):
-				self.item_nome_combo_compra['values'] = produtos
-				self.item_nome_var.set("")  # Limpar seleção
+			produtos = self.reference_data.nomes_produtos(tipo_db)
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar produtos: {e}")
-		finally:
-			conn.close()
+			return
+		log.debug("Combo de compra com %d itens (%s)", len(produtos), tipo_db)
+		
+		# Atualizar combo de compra
+		if hasattr(self, 'item_nome_combo_compra'):
+			self.item_nome_combo_compra['values'] = produtos
+			self.item_nome_var.set("")  # Limpar seleção
 			
 	def on_item_selected(self, event=None):
 		"""Callback quando um produto é selecionado"""
@@ -842,7 +822,7 @@ class OrcamentoProdutosModule(BaseModule):
 		if not nome or not tipo:
 			return
 			
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -982,77 +962,43 @@ class OrcamentoProdutosModule(BaseModule):
 		self.refresh_produtos()
 		self.carregar_cotacoes()
 		
-	def refresh_clientes(self):
-		"""Atualizar lista de clientes"""
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
+	def refresh_clientes(self, ids=None):
+		"""Atualizar lista de clientes (cache de referência; com ``ids`` só esses foram relidos)"""
 		try:
-			c.execute("SELECT id, nome FROM clientes ORDER BY nome")
-			clientes = c.fetchall()
-			
-			self.clientes_dict = {f"{nome} (ID: {id})": id for id, nome in clientes}
-			cliente_values = list(self.clientes_dict.keys())
-			
-			self.cliente_combo['values'] = cliente_values
-			
-			print(f"Clientes carregados: {len(cliente_values)}")  # Debug
-			
+			self.clientes_dict = self.reference_data.clientes_dict()
+			self.cliente_combo['values'] = list(self.clientes_dict)
+			log.debug("Clientes carregados: %d", len(self.clientes_dict))
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar clientes: {e}")
-		finally:
-			conn.close()
 			
 	def refresh_produtos(self):
 		"""Atualizar lista de produtos - apenas Produtos"""
-		print("DEBUG ORÇAMENTO PRODUTOS: Iniciando refresh_produtos...")
+		log.debug("Iniciando refresh_produtos...")
 		# Atualizar combo apenas para produtos
 		self.update_produtos_combo()
-		print("DEBUG ORÇAMENTO PRODUTOS: Refresh concluído")
+		log.debug("Refresh concluído")
 		# Forçar atualização agressiva do combobox de nome
 		try:
 			self._force_update_nome_compra()
 		except Exception as e:
-			print(f"DEBUG ORÇAMENTO PRODUTOS: Falha ao forçar update do combo de nome: {e}")
+			log.warning("Falha ao forçar update do combo de nome: %s", e)
 		
-		print("Produtos atualizados automaticamente!")  # Debug
+		log.debug("Produtos atualizados automaticamente!")
 		
 	def force_update_locacao_combo(self):
 		"""Forçar atualização do combobox de locação"""
+		if not hasattr(self, 'item_nome_combo_locacao'):
+			log.debug("item_nome_combo_locacao não encontrado")
+			return
 		try:
-			if hasattr(self, 'item_nome_combo_locacao'):
-				print("DEBUG FORCE_UPDATE: Forçando atualização do combobox de locação...")
-				conn = sqlite3.connect(DB_NAME)
-				c = conn.cursor()
-				c.execute("SELECT nome FROM produtos WHERE tipo='Produto' AND COALESCE(categoria,'Geral')='Compressores' AND ativo=1 ORDER BY nome")
-				compressores = [row[0] for row in c.fetchall()]
-				
-				print(f"DEBUG FORCE_UPDATE: Encontrados {len(compressores)} compressores")
-				
-				# Forçar atualização do combobox
-				self.item_nome_combo_locacao.configure(state='normal')
-				self.item_nome_combo_locacao['values'] = compressores
-				self.item_nome_combo_locacao.set('')
-				self.item_nome_combo_locacao.configure(state='readonly')
-				
-				# Forçar redraw
-				self.item_nome_combo_locacao.update_idletasks()
-				self.frame.update_idletasks()
-				
-				# Verificar se os valores foram realmente atualizados
-				valores_atuais = self.item_nome_combo_locacao['values']
-				print(f"DEBUG FORCE_UPDATE: Combobox atualizado com {len(compressores)} compressores")
-				print(f"DEBUG FORCE_UPDATE: Valores atuais no combobox: {valores_atuais}")
-				print(f"DEBUG FORCE_UPDATE: Estado do combobox: {self.item_nome_combo_locacao['state']}")
-			else:
-				print("DEBUG FORCE_UPDATE: item_nome_combo_locacao não encontrado")
+			compressores = self.reference_data.compressores()
+			log.debug("Combobox de locação com %d compressores", len(compressores))
+			self.item_nome_combo_locacao.configure(state='normal')
+			self.item_nome_combo_locacao['values'] = compressores
+			self.item_nome_combo_locacao.set('')
+			self.item_nome_combo_locacao.configure(state='readonly')
 		except Exception as e:
-			print(f"DEBUG FORCE_UPDATE: Erro: {e}")
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
+			log.warning("Falha ao atualizar combobox de locação: %s", e)
 		
 	def on_cliente_selected(self, event=None):
 		"""Preencher automaticamente a condição de pagamento baseada no cliente selecionado"""
@@ -1066,7 +1012,7 @@ class OrcamentoProdutosModule(BaseModule):
 			return
 			
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			
 			# Buscar prazo de pagamento do cliente
@@ -1087,32 +1033,14 @@ class OrcamentoProdutosModule(BaseModule):
 				self.contato_cliente_var.set("")
 				
 		except sqlite3.Error as e:
-			print(f"Erro ao buscar prazo de pagamento do cliente: {e}")
+			log.warning("Erro ao buscar prazo de pagamento do cliente: %s", e)
 		finally:
 			conn.close()
 			
 	def gerar_numero_sequencial(self):
-		"""Gerar número sequencial para cotação"""
-		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			
-			# Buscar o maior número sequencial existente para PROD-
-			c.execute("SELECT MAX(CAST(SUBSTR(numero_proposta, 6) AS INTEGER)) FROM cotacoes WHERE numero_proposta LIKE 'PROD-%'")
-			result = c.fetchone()
-			
-			if result and result[0]:
-				proximo_numero = result[0] + 1
-			else:
-				proximo_numero = 1
-			return f"PROD-{proximo_numero:06d}"
-			
-		except sqlite3.Error as e:
-			print(f"Erro ao gerar número sequencial: {e}")
-			# Fallback para timestamp
-			return f"PROD-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-		finally:
-			conn.close()
+		"""Sugerir o próximo número da série PROD- (reservado apenas ao salvar)"""
+		self._numero_sugerido = proximo_numero('PROD')
+		return self._numero_sugerido
 		
 	def adicionar_item(self):
 		if not self.can_edit('orcamento_produtos'):
@@ -1166,51 +1094,20 @@ class OrcamentoProdutosModule(BaseModule):
 				self.show_warning("Informe datas válidas de início e fim para locação.")
 				return
 			
-			meses_int = self.calculate_months_between(inicio_iso, fim_iso)
-			meses = str(meses_int)
-			inicio_fmt = format_date(inicio_iso)
-			fim_fmt = format_date(fim_iso)
-			valor_total = quantidade * valor_unitario * meses_int
-			tipo_operacao = 'Locação'
-			
 			# Para locação, incluir modelo do compressor na descrição
 			if modelo_compressor:
 				descricao_completa = f"{descricao} - Modelo: {modelo_compressor}".strip(" -")
 			else:
 				descricao_completa = descricao
-		else:
-			# Processar dados de compra
-			mao_obra = clean_number(mao_obra_str)
-			deslocamento = clean_number(deslocamento_str)
-			estadia = clean_number(estadia_str)
 			
-			meses = ""
-			inicio_fmt = ""
-			fim_fmt = ""
-			valor_total = quantidade * (valor_unitario + mao_obra + deslocamento + estadia)
-			tipo_operacao = 'Compra'
-			descricao_completa = descricao
-		
-		# Adicionar à lista no formato de 14 colunas (incluindo ICMS)
-		if modo == 'Locação':
-			self.itens_tree.insert("", "end", values=(
-				"Produto",
-				nome,
-				f"{quantidade:.2f}",
-				format_currency(valor_unitario),
-				format_currency(0),
-				format_currency(0),
-				format_currency(0),
-				meses,
-				inicio_fmt,
-				fim_fmt,
-				format_currency(valor_total),
-				descricao_completa,
-				"Locação",
-				"R$ 0,00"  # Sem ICMS para locação
-			))
+			item = ItemCotacao(
+				tipo="Produto", item_nome=nome, quantidade=quantidade, valor_unitario=valor_unitario,
+				descricao=descricao_completa, tipo_operacao='Locação',
+				locacao_data_inicio=inicio_iso, locacao_data_fim=fim_iso,
+				locacao_qtd_meses=self.calculate_months_between(inicio_iso, fim_iso)
+			)
 		else:
-			# Obter ICMS baseado na filial
+			# Obter ICMS baseado na filial (sem ICMS para locação)
 			icms_val = 0
 			try:
 				filial_str = self.filial_var.get()
@@ -1220,30 +1117,17 @@ class OrcamentoProdutosModule(BaseModule):
 			except Exception:
 				icms_val = 0
 			
-			self.itens_tree.insert("", "end", values=(
-				tipo,
-				nome,
-				f"{quantidade:.2f}",
-				format_currency(valor_unitario),
-				format_currency(mao_obra),
-				format_currency(deslocamento),
-				format_currency(estadia),
-				"",
-				"",
-				"",
-				format_currency(quantidade * (valor_unitario + mao_obra + deslocamento + estadia + icms_val)),
-				descricao_completa,
-				"Compra",
-				format_currency(icms_val)
-			))
-			# Guardar ICMS no último item via atributo associado (usar hidden mapping se necessário)
-			if not hasattr(self, '_icms_por_item_idx'):
-				self._icms_por_item_idx = {}
-			try:
-				last = self.itens_tree.get_children()[-1]
-				self._icms_por_item_idx[last] = clean_number(self.item_icms_var.get()) if self.filial_var.get().split(' - ')[0] == '2' else 0
-			except Exception:
-				pass
+			item = ItemCotacao(
+				tipo=tipo, item_nome=nome, quantidade=quantidade, valor_unitario=valor_unitario,
+				descricao=descricao, mao_obra=clean_number(mao_obra_str),
+				deslocamento=clean_number(deslocamento_str), estadia=clean_number(estadia_str),
+				icms=icms_val, tipo_operacao='Compra'
+			)
+		
+		# Adicionar à lista (14 colunas, incluindo ICMS) e ao modelo de itens
+		iid = self.itens_tree.insert("", "end", values=self._item_tree_values(item))
+		self.itens_store.adicionar(iid, item)
+		self.atualizar_total()
 		
 		# Limpar campos baseado no modo
 		if modo == 'Locação':
@@ -1288,6 +1172,7 @@ class OrcamentoProdutosModule(BaseModule):
 			
 		for item in selected:
 			self.itens_tree.delete(item)
+			self.itens_store.remover(item)
 			
 		self.atualizar_total()
 
@@ -1331,35 +1216,26 @@ class OrcamentoProdutosModule(BaseModule):
 			row += 1
 		def salvar_edicao():
 			try:
-				# Parse campos numéricos formatados
-				qtd = float(entries[2].get().replace(',', '.'))
-				valor_unit = clean_number(entries[3].get())
-				mao_obra = clean_number(entries[4].get() or '0')
-				desloc = clean_number(entries[5].get() or '0')
-				estadia = clean_number(entries[6].get() or '0')
+				# Parse campos numéricos formatados; o total é recalculado pelo modelo
+				# (para locação usa meses; para compra soma custos incluindo ICMS)
 				meses = int(entries[7].get() or 0) if str(entries[7].get() or '').strip().isdigit() else 0
-				icms_val = clean_number(entries[13].get() or '0')
-				# Recalcular total (para locação usa meses; para compra soma custos incluindo ICMS)
-				if (entries[12].get() or '').lower().startswith('loca'):
-					total = (valor_unit or 0) * (meses or 0) * (qtd or 0)
-				else:
-					total = (qtd or 0) * ((valor_unit or 0) + (mao_obra or 0) + (desloc or 0) + (estadia or 0) + (icms_val or 0))
-				# Atualizar vetor
-				vals[0] = entries[0].get().strip() or 'Produto'
-				vals[1] = entries[1].get().strip()
-				vals[2] = f"{qtd:.2f}"
-				vals[3] = format_currency(valor_unit)
-				vals[4] = format_currency(mao_obra)
-				vals[5] = format_currency(desloc)
-				vals[6] = format_currency(estadia)
-				vals[7] = str(meses or '')
-				vals[8] = entries[8].get().strip()
-				vals[9] = entries[9].get().strip()
-				vals[10] = format_currency(total)
-				vals[11] = entries[11].get().strip()
-				vals[12] = entries[12].get().strip() or 'Compra'
-				vals[13] = format_currency(icms_val)
-				self.itens_tree.item(iid, values=tuple(vals))
+				item = ItemCotacao(
+					tipo=entries[0].get().strip() or 'Produto',
+					item_nome=entries[1].get().strip(),
+					quantidade=float(entries[2].get().replace(',', '.')),
+					valor_unitario=clean_number(entries[3].get()),
+					mao_obra=clean_number(entries[4].get() or '0'),
+					deslocamento=clean_number(entries[5].get() or '0'),
+					estadia=clean_number(entries[6].get() or '0'),
+					locacao_qtd_meses=meses or None,
+					locacao_data_inicio=self.parse_date_input(entries[8].get()),
+					locacao_data_fim=self.parse_date_input(entries[9].get()),
+					descricao=entries[11].get().strip(),
+					tipo_operacao=entries[12].get().strip() or 'Compra',
+					icms=clean_number(entries[13].get() or '0')
+				)
+				self.itens_store.atualizar(iid, item)
+				self.itens_tree.item(iid, values=self._item_tree_values(item))
 				self.atualizar_total()
 				modal.destroy()
 			except Exception as e:
@@ -1436,22 +1312,33 @@ class OrcamentoProdutosModule(BaseModule):
 		if self.tipo_cotacao_var.get() == 'Locação':
 			self.atualizar_total()
 		
+	def _item_tree_values(self, item):
+		"""Linha exibida na lista de itens (14 colunas, incluindo ICMS)"""
+		return (
+			item.tipo,
+			item.item_nome,
+			f"{item.quantidade:.2f}",
+			format_currency(item.valor_unitario),
+			format_currency(item.mao_obra),
+			format_currency(item.deslocamento),
+			format_currency(item.estadia),
+			str(item.locacao_qtd_meses or ""),
+			format_date(item.locacao_data_inicio) if item.locacao_data_inicio else "",
+			format_date(item.locacao_data_fim) if item.locacao_data_fim else "",
+			format_currency(item.valor_total_item),
+			item.descricao,
+			item.tipo_operacao,
+			format_currency(item.icms)
+		)
+		
 	def atualizar_total(self):
 		"""Atualizar valor total da cotação"""
-		total = 0
-		for item in self.itens_tree.get_children():
-			values = self.itens_tree.item(item)['values']
-			if len(values) >= 11:
-				valor_total_str = values[10].replace('R$ ', '').replace('.', '').replace(',', '.')
-				try:
-					total += float(valor_total_str)
-				except ValueError:
-					pass
-		self.total_label.config(text=f"Total: {format_currency(total)}")
+		self.total_label.config(text=f"Total: {format_currency(self.itens_store.totais['total'])}")
 		
 	def nova_cotacao(self):
 		"""Limpar formulário para nova cotação"""
 		self.current_cotacao_id = None
+		self.itens_tracker.reset()
 		
 		# Limpar campos
 		self.numero_var.set("")
@@ -1495,8 +1382,8 @@ class OrcamentoProdutosModule(BaseModule):
 			self.itens_section.pack(fill="both", expand=True, pady=(0, 10))
 		
 		# Limpar itens
-		for item in self.itens_tree.get_children():
-			self.itens_tree.delete(item)
+		self.itens_tree.delete(*self.itens_tree.get_children())
+		self.itens_store.limpar()
 			
 		self.atualizar_total()
 		# Limpar campos de item (compra) inclusive ICMS
@@ -1539,22 +1426,14 @@ class OrcamentoProdutosModule(BaseModule):
 		if not cliente_id:
 			self.show_warning("Cliente selecionado inválido.")
 			return
-		if not self.itens_tree.get_children():
+		if not len(self.itens_store):
 			self.show_warning("Adicione pelo menos um item à cotação.")
 			return
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		try:
-			# Calcular valor total somando itens
-			valor_total = 0
-			for item in self.itens_tree.get_children():
-				values = self.itens_tree.item(item)['values']
-				if len(values) >= 11:
-					valor_total_str = values[10].replace('R$ ', '').replace('.', '').replace(',', '.')
-					try:
-						valor_total += float(valor_total_str)
-					except ValueError:
-						pass
+			# Valor total mantido pelo modelo de itens
+			valor_total = float(self.itens_store.totais['total'])
 			# Data validade
 			data_validade_input = self.data_validade_var.get().strip()
 			data_validade = None
@@ -1591,7 +1470,6 @@ class OrcamentoProdutosModule(BaseModule):
 					 filial_id,
 					 modo, self.locacao_equipamento_var.get(),
 					 self.current_cotacao_id))
-				c.execute("DELETE FROM itens_cotacao WHERE cotacao_id = ?", (self.current_cotacao_id,))
 				cotacao_id = self.current_cotacao_id
 			else:
 				# Preparar valores baseado no tipo de cotação para INSERT
@@ -1601,6 +1479,8 @@ class OrcamentoProdutosModule(BaseModule):
 				data_validade_valor = data_validade if modo != "Locação" else None
 				condicao_pagamento_valor = self.condicao_pagamento_var.get() if modo != "Locação" else ""
 				prazo_entrega_valor = self.prazo_entrega_var.get() if modo != "Locação" else ""
+				# Número reservado nesta transação (sugestão mantida) ou o digitado
+				numero = numero_para_gravar(c, 'PROD', numero, getattr(self, '_numero_sugerido', None))
 				
 				c.execute("""
 					INSERT INTO cotacoes (numero_proposta, cliente_id, responsavel_id, data_criacao,
@@ -1615,40 +1495,25 @@ class OrcamentoProdutosModule(BaseModule):
 					 filial_id, "Compra", self.locacao_equipamento_var.get()))
 				cotacao_id = c.lastrowid
 				self.current_cotacao_id = cotacao_id
-			# Inserir itens
-			for item in self.itens_tree.get_children():
-				values = self.itens_tree.item(item)['values']
-				# Esperado 14 colunas (incluindo ICMS)
-				if len(values) != 14:
-					continue
-				tipo, nome, qtd, valor_unit, mao_obra, desloc, estadia, meses, inicio, fim, total, desc, tipo_operacao, icms = values
-				quantidade = float(qtd)
-				valor_unitario = clean_number(valor_unit)
-				valor_mao_obra = clean_number(mao_obra)
-				valor_desloc = clean_number(desloc)
-				valor_estadia = clean_number(estadia)
-				valor_total_item = clean_number(total)
-				# Datas locação
-				inicio_iso = self.parse_date_input(inicio)
-				fim_iso = self.parse_date_input(fim)
-				meses_int = int(meses) if str(meses).isdigit() else None
-				# Forçar tipo_operacao conforme modo
-				if modo == 'Locação':
-					tipo_operacao = 'Locação'
-				# Obter ICMS da tree
-				icms_item_val = clean_number(icms)
-				c.execute("""
-					INSERT INTO itens_cotacao (cotacao_id, tipo, item_nome, quantidade,
-										 valor_unitario, valor_total_item, descricao,
-										 mao_obra, deslocamento, estadia, icms, tipo_operacao,
-										 locacao_data_inicio, locacao_data_fim, locacao_qtd_meses)
-					VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-				""", (cotacao_id, tipo, nome, quantidade, valor_unitario, valor_total_item, desc,
-					 valor_mao_obra, valor_desloc, valor_estadia, icms_item_val, tipo_operacao,
-					 inicio_iso, fim_iso, meses_int))
+			itens = self.itens_store.itens()
+			if modo == 'Locação':
+				# Forçar tipo_operacao conforme modo, mantendo o total de cada item
+				itens = [(iid, item if item.tipo_operacao == 'Locação'
+						  else item.copiar(tipo_operacao='Locação', valor_total_item=item.valor_total_item))
+						 for iid, item in itens]
+			# Gravar apenas os itens alterados
+			linhas = [(iid, item.valores(COLUNAS_ITENS)) for iid, item in itens]
+			self.itens_tracker.salvar(c, cotacao_id, linhas)
 			conn.commit()
+			self.itens_tracker.confirmar()
+			# Só após o commit o modelo e a lista passam a mostrar o que foi gravado
+			for iid, item in itens:
+				if self.itens_store.get(iid) is not item:
+					self.itens_store.atualizar(iid, item)
+					self.itens_tree.item(iid, values=self._item_tree_values(item))
+			self.numero_var.set(numero)
 			self.show_success("Cotação salva com sucesso!")
-			self.emit_event('cotacao_created')
+			self.emit_event('cotacao_created', ids=cotacao_id)
 			self.carregar_cotacoes()
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao salvar cotação: {e}")
@@ -1661,22 +1526,16 @@ class OrcamentoProdutosModule(BaseModule):
 			self.show_warning("Salve a cotação antes de gerar o PDF.")
 			return
 			
-		try:
-			# Obter username do usuário atual para template personalizado
-			current_username = self._get_current_username()
-			# Passar contato selecionado para o gerador
-			sucesso, resultado = gerar_pdf_cotacao_nova(
-				self.current_cotacao_id,
-				DB_NAME,
-				current_username,
-				contato_nome=self.contato_cliente_var.get()
-			)
-			if sucesso:
-				self.show_success(f"PDF gerado com sucesso!\nLocal: {resultado}")
-			else:
-				self.show_error(f"Erro ao gerar PDF: {resultado}")
-		except Exception as e:
-			self.show_error(f"Erro ao gerar PDF: {e}")
+		# Obter username do usuário atual para template personalizado
+		current_username = self._get_current_username()
+		# Passar contato selecionado para o gerador
+		self.generate_pdf_in_background(
+			gerar_pdf_cotacao_nova,
+			self.current_cotacao_id,
+			DB_NAME,
+			current_username,
+			contato_nome=self.contato_cliente_var.get()
+		)
 			
 	def abrir_pdf(self):
 		"""Abrir PDF da cotação atual"""
@@ -1684,40 +1543,21 @@ class OrcamentoProdutosModule(BaseModule):
 			self.show_warning("Salve a cotação primeiro antes de abrir o PDF.")
 			return
 			
-		try:
-			# Obter username do usuário atual para template personalizado
-			current_username = self._get_current_username()
-			sucesso, resultado = gerar_pdf_cotacao_nova(
-				self.current_cotacao_id, 
-				DB_NAME, 
-				current_username, 
-				contato_nome=self.contato_cliente_var.get()
-			)
-			
-			if sucesso:
-				# Abrir o PDF com o aplicativo padrão
-				try:
-					import os
-					import sys
-					if os.name == 'nt':  # Windows
-						os.startfile(resultado)
-					elif sys.platform == 'darwin':  # macOS
-						import subprocess
-						subprocess.Popen(['open', resultado])
-					else:  # Linux
-						import subprocess
-						subprocess.Popen(['xdg-open', resultado])
-				except Exception as e:
-					self.show_error(f"Erro ao abrir PDF: {e}")
-			else:
-				self.show_error(f"Erro ao gerar PDF: {resultado}")
-		except Exception as e:
-			self.show_error(f"Erro ao abrir PDF: {e}")
+		# Obter username do usuário atual para template personalizado
+		current_username = self._get_current_username()
+		self.generate_pdf_in_background(
+			obter_pdf_cotacao,
+			self.current_cotacao_id, 
+			DB_NAME, 
+			current_username, 
+			contato_nome=self.contato_cliente_var.get(),
+			open_after=True
+		)
 			
 	def _get_current_username(self):
 		"""Obter o username do usuário atual"""
 		try:
-			conn = sqlite3.connect(DB_NAME)
+			conn = get_connection()
 			c = conn.cursor()
 			c.execute("SELECT username FROM usuarios WHERE id = ?", (self.user_id,))
 			result = c.fetchone()
@@ -1730,83 +1570,43 @@ class OrcamentoProdutosModule(BaseModule):
 			
 	def carregar_cotacoes(self):
 		"""Carregar lista de cotações"""
-		# Verificar e atualizar cotações expiradas automaticamente
-		cotações_expiradas = verificar_e_atualizar_status_cotacoes()
-		
-		# Limpar lista atual
-		for item in self.cotacoes_tree.get_children():
-			self.cotacoes_tree.delete(item)
-			
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
+		# Expirar cotações vencidas (no máximo uma vez por intervalo / virada do dia)
+		verificar_expiracoes_agendado()
 		
 		try:
-			c.execute("""
-				SELECT c.id, c.numero_proposta, cl.nome, c.data_criacao, c.valor_total, c.status
-				FROM cotacoes c
-				JOIN clientes cl ON c.cliente_id = cl.id
-				WHERE c.numero_proposta LIKE 'PROD-%'
-				ORDER BY c.created_at DESC
-			""")
-			
-			for row in c.fetchall():
-				cotacao_id, numero, cliente, data, valor, status = row
-				self.cotacoes_tree.insert("", "end", values=(
-					numero,
-					cliente,
-					format_date(data),
-					format_currency(valor) if valor else "R$ 0,00",
-					status
-				), tags=(cotacao_id,))
-				
+			self.cotacoes_loader.load("c.numero_proposta LIKE 'PROD-%'")
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar cotações: {e}")
-		finally:
-			conn.close()
 			
 	def buscar_cotacoes(self):
-		"""Buscar cotações com filtro"""
-		termo = self.search_var.get().strip()
-		
-		# Limpar lista atual
-		for item in self.cotacoes_tree.get_children():
-			self.cotacoes_tree.delete(item)
-			
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
+		"""Buscar cotações com filtro (consulta em segundo plano)"""
+		termo = self.search_term()
+		erro = lambda e: self.show_error(f"Erro ao buscar cotações: {e}")
 		
 		try:
 			if termo:
-				c.execute("""
-					SELECT c.id, c.numero_proposta, cl.nome, c.data_criacao, c.valor_total, c.status
-					FROM cotacoes c
-					JOIN clientes cl ON c.cliente_id = cl.id
-					WHERE c.numero_proposta LIKE 'PROD-%' AND (c.numero_proposta LIKE ? OR cl.nome LIKE ?)
-					ORDER BY c.created_at DESC
-				""", (f"%{termo}%", f"%{termo}%"))
+				# Índice de busca (FTS): cotação ou cliente; sem ele, LIKE
+				where, params = filtro_busca(termo, {"cotacao": "c.id", "cliente": "c.cliente_id"}) or (
+					"(c.numero_proposta LIKE ? OR cl.nome LIKE ?)",
+					(f"%{termo}%", f"%{termo}%"),
+				)
+				self.cotacoes_loader.load_async(f"c.numero_proposta LIKE 'PROD-%' AND {where}", params,
+											   refine=self.search_refines(), on_error=erro)
 			else:
-				c.execute("""
-					SELECT c.id, c.numero_proposta, cl.nome, c.data_criacao, c.valor_total, c.status
-					FROM cotacoes c
-					JOIN clientes cl ON c.cliente_id = cl.id
-					WHERE c.numero_proposta LIKE 'PROD-%'
-					ORDER BY c.created_at DESC
-				""")
-			
-			for row in c.fetchall():
-				cotacao_id, numero, cliente, data, valor, status = row
-				self.cotacoes_tree.insert("", "end", values=(
-					numero,
-					cliente,
-					format_date(data),
-					format_currency(valor) if valor else "R$ 0,00",
-					status
-				), tags=(cotacao_id,))
-				
+				self.cotacoes_loader.load_async("c.numero_proposta LIKE 'PROD-%'", on_error=erro)
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao buscar cotações: {e}")
-		finally:
-			conn.close()
+			
+	def _cotacao_tree_row(self, row):
+		"""Converter linha da consulta em (values, tags) para a lista de cotações"""
+		cotacao_id, numero, cliente, data, valor, status = row[:6]
+		return (
+			numero,
+			cliente,
+			format_date(data),
+			format_currency(valor) if valor else "R$ 0,00",
+			status
+		), (cotacao_id,)
 			
 	def editar_cotacao(self):
 		"""Editar cotação selecionada"""
@@ -1827,7 +1627,7 @@ class OrcamentoProdutosModule(BaseModule):
 		
 	def carregar_cotacao_para_edicao(self, cotacao_id):
 		"""Carregar dados da cotação para edição"""
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
@@ -1907,37 +1707,16 @@ class OrcamentoProdutosModule(BaseModule):
 	def carregar_itens_cotacao(self, cotacao_id):
 		"""Carregar itens da cotação"""
 		# Limpar lista atual
-		for item in self.itens_tree.get_children():
-			self.itens_tree.delete(item)
-		conn = sqlite3.connect(DB_NAME)
+		self.itens_tree.delete(*self.itens_tree.get_children())
+		self.itens_store.limpar()
+		conn = get_connection()
 		c = conn.cursor()
 		try:
-			c.execute("""
-				SELECT tipo, item_nome, quantidade, valor_unitario, valor_total_item,
-				       descricao, mao_obra, deslocamento, estadia,
-				       locacao_qtd_meses, locacao_data_inicio, locacao_data_fim, tipo_operacao, icms
-				FROM itens_cotacao
-				WHERE cotacao_id = ?
-				ORDER BY id
-			""", (cotacao_id,))
-			for row in c.fetchall():
-				(tipo, nome, qtd, valor_unit, total, desc, mao_obra, desloc, estadia, meses, inicio, fim, tipo_oper, icms) = row
-				self.itens_tree.insert("", "end", values=(
-					tipo or "Produto",
-					nome,
-					f"{qtd:.2f}",
-					format_currency(valor_unit),
-					format_currency(mao_obra or 0),
-					format_currency(desloc or 0),
-					format_currency(estadia or 0),
-					str(meses or ""),
-					(format_date(inicio) if inicio else ""),
-					(format_date(fim) if fim else ""),
-					format_currency(total),
-					desc or "",
-					tipo_oper or "Compra",
-					format_currency(icms or 0)
-				))
+			for item_id, row in self.itens_tracker.carregar(c, cotacao_id):
+				item = ItemCotacao.de_linha(COLUNAS_ITENS, row)
+				iid = self.itens_tree.insert("", "end", values=self._item_tree_values(item))
+				self.itens_store.adicionar(iid, item)
+				self.itens_tracker.vincular(iid, item_id)
 			self.atualizar_total()
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar itens: {e}")
@@ -1980,52 +1759,37 @@ class OrcamentoProdutosModule(BaseModule):
 		cotacao_id = tags[0]
 		# Obter username do usuário atual para template personalizado
 		current_username = self._get_current_username()
-		sucesso, resultado = gerar_pdf_cotacao_nova(cotacao_id, DB_NAME, current_username, contato_nome=self.contato_cliente_var.get())
-		
-		if sucesso:
-			self.show_success(f"PDF gerado com sucesso!\nLocal: {resultado}")
-		else:
-			self.show_error(f"Erro ao gerar PDF: {resultado}")
+		self.generate_pdf_in_background(gerar_pdf_cotacao_nova, cotacao_id, DB_NAME, current_username, contato_nome=self.contato_cliente_var.get())
 			
 	def handle_event(self, event_type, data=None):
 		"""Manipular eventos do sistema"""
-		print(f"DEBUG COTAÇÕES: Evento recebido: {event_type}")
-		if event_type == 'cliente_created':
-			self.refresh_clientes()
-			print("Lista de clientes atualizada automaticamente!")
-		elif event_type == 'produto_created' or event_type == 'produto_updated':
-			print("DEBUG COTAÇÕES: Processando evento produto_created...")
+		log.debug("Evento recebido: %s", event_type)
+		if event_type in ('cliente_created', 'cliente_deleted'):
+			self.refresh_clientes(ids=getattr(data, 'ids', None))
+			log.debug("Lista de clientes atualizada automaticamente!")
+		elif event_type in ('produto_created', 'produto_updated', 'produto_deleted'):
+			log.debug("Processando evento produto_created...")
+			# Combos de compra e de locação (uma leitura compartilhada no cache)
 			self.refresh_produtos()
-			# Forçar atualização imediata do combobox de locação
 			self.force_update_locacao_combo()
-			# Forçar atualização agressiva do combobox de compra (nome)
-			try:
-				self._force_update_nome_compra()
-			except Exception as e:
-				print(f"DEBUG COTAÇÕES: Falha ao forçar update do combo de nome: {e}")
-			print("Lista de produtos atualizada automaticamente!")
+			log.debug("Lista de produtos atualizada automaticamente!")
+		elif event_type == 'cotacoes_expiradas':
+			self.carregar_cotacoes()
 		elif event_type == 'test_event':
-			print("DEBUG COTAÇÕES: Evento de teste recebido com sucesso!")
+			log.debug("Evento de teste recebido com sucesso!")
 
 	def _force_update_nome_compra(self):
-		"""Atualizar agressivamente o combobox de Nome (Produtos -> produtos.tipo='Produto' sem compressores)."""
+		"""Atualizar o combobox de Nome (Produtos -> produtos.tipo='Produto' sem compressores)."""
 		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT nome FROM produtos WHERE tipo = 'Produto' AND COALESCE(categoria,'Geral') <> 'Compressores' AND ativo = 1 ORDER BY nome")
-			nomes = [row[0] for row in c.fetchall()]
-			conn.close()
-			print(f"DEBUG NOME_COMPRA (Produtos): {len(nomes)} itens carregados")
+			nomes = self.reference_data.nomes_produtos('Produto')
+			log.debug("Nomes de compra: %d itens", len(nomes))
 			if hasattr(self, 'item_nome_combo_compra'):
 				self.item_nome_combo_compra.configure(state='normal')
 				self.item_nome_combo_compra['values'] = nomes
 				self.item_nome_combo_compra.set('')
 				self.item_nome_combo_compra.configure(state='readonly')
-				self.item_nome_combo_compra.update_idletasks()
 		except Exception as e:
-			print(f"DEBUG NOME_COMPRA (Produtos) erro: {e}")
-			
-	# Função de preencher relação de peças removida deste módulo
+			log.warning("Erro ao carregar nomes de compra: %s", e)
 			
 	def abrir_pdf_selecionado(self):
 		"""Abrir PDF da cotação selecionada"""
@@ -2040,24 +1804,6 @@ class OrcamentoProdutosModule(BaseModule):
 			
 		cotacao_id = tags[0]
 		
-		# Primeiro gerar o PDF se não existir
+		# Reaproveita o PDF gravado se a cotação não mudou
 		current_username = self._get_current_username()
-		sucesso, resultado = gerar_pdf_cotacao_nova(cotacao_id, DB_NAME, current_username, contato_nome=self.contato_cliente_var.get())
-		
-		if sucesso:
-			# Abrir o PDF com o aplicativo padrão
-			try:
-				import os
-				import sys
-				if os.name == 'nt':  # Windows
-					os.startfile(resultado)
-				elif sys.platform == 'darwin':  # macOS
-					import subprocess
-					subprocess.Popen(['open', resultado])
-				else:  # Linux
-					import subprocess
-					subprocess.Popen(['xdg-open', resultado])
-			except Exception as e:
-				self.show_error(f"Erro ao abrir PDF: {e}")
-		else:
-			self.show_error(f"Erro ao gerar PDF: {resultado}")
\ No newline at end of file
+		self.generate_pdf_in_background(obter_pdf_cotacao, cotacao_id, DB_NAME, current_username, contato_nome=self.contato_cliente_var.get(), open_after=True)
\ No newline at end of file
@@ -2,9 +2,11 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 
 class PermissoesModule(BaseModule):
+    event_topics = ('usuario_created',)
+
     def setup_ui(self):
         container = tk.Frame(self.frame, bg='#f8fafc')
         container.pack(fill="both", expand=True, padx=20, pady=20)
@@ -160,7 +162,7 @@ class PermissoesModule(BaseModule):
     def carregar_usuarios(self):
         """Carregar lista de usuários"""
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             
             c.execute("SELECT id, username, nome_completo, role FROM usuarios ORDER BY nome_completo")
@@ -192,7 +194,7 @@ class PermissoesModule(BaseModule):
             return
             
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             
             # Buscar permissões existentes
@@ -229,7 +231,7 @@ class PermissoesModule(BaseModule):
             return
             
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             
             # Remover permissões existentes
@@ -245,6 +247,7 @@ class PermissoesModule(BaseModule):
                     """, (usuario_id, modulo_key, nivel_acesso))
             
             conn.commit()
+            self.emit_event('permissoes_updated', ids=usuario_id)
             self.show_success("Permissões salvas com sucesso!")
             
         except sqlite3.Error as e:
@@ -299,7 +302,7 @@ class PermissoesModule(BaseModule):
     def get_user_permissions(self, user_id):
         """Obter permissões de um usuário específico"""
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_connection()
             c = conn.cursor()
             
             c.execute("SELECT modulo, nivel_acesso FROM permissoes_usuarios WHERE usuario_id = ?", 
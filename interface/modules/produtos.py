@@ -2,8 +2,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_currency, clean_number
+from utils.kits import invalidar_composicoes
+from utils.busca import filtro_busca
 
 class ProdutosModule(BaseModule):
     def setup_ui(self):
@@ -369,6 +371,20 @@ class ProdutosModule(BaseModule):
             
             self.trees_por_tipo["Serviços" if tipo=="Kit" else tipo] = tree
         
+        # Carregamento paginado por aba (mesma classificação usada na exibição)
+        self.produtos_loaders = {}
+        for display_tipo, tree in self.trees_por_tipo.items():
+            self.produtos_loaders[display_tipo] = self.create_paginated_loader(
+                tree,
+                """
+                    SELECT id, nome, tipo, valor_unitario, ativo, COALESCE(categoria,'Geral'), nome, id
+                    FROM produtos
+                """,
+                ("nome", "id"),
+                self._produto_tree_row,
+                descending=False,
+            )
+        
         # Botões
         lista_buttons = tk.Frame(container, bg='white')
         lista_buttons.pack(fill="x", pady=(15, 0))
@@ -454,12 +470,8 @@ class ProdutosModule(BaseModule):
     def carregar_produtos_para_kit(self):
         """Carregar produtos e serviços disponíveis para o kit"""
         try:
-            conn = sqlite3.connect(DB_NAME)
-            c = conn.cursor()
-            
-            # Buscar apenas produtos (itens que compõem Serviços)
-            c.execute("SELECT id, nome, tipo FROM produtos WHERE tipo IN ('Produto') AND ativo = 1 ORDER BY nome")
-            produtos = c.fetchall()
+            # Apenas produtos (itens que compõem Serviços), do cache de referência
+            produtos = self.reference_data.produtos('Produto')
             
             # Limpar e popular combobox
             if hasattr(self, 'produto_kit_combo'):
@@ -472,8 +484,6 @@ class ProdutosModule(BaseModule):
                 
         except sqlite3.Error as e:
             messagebox.showerror("Erro", f"Erro ao carregar produtos: {e}")
-        finally:
-            conn.close()
     
     def adicionar_item_kit(self):
         """Adicionar item à composição do kit"""
@@ -639,7 +649,7 @@ class ProdutosModule(BaseModule):
         except Exception:
             pass
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -682,13 +692,15 @@ class ProdutosModule(BaseModule):
                     """, (self.current_produto_id, item['produto_id'], item['quantidade']))
             
             conn.commit()
+            # Nome ou composição podem ter mudado: descartar composições em cache
+            invalidar_composicoes()
             
             tipo_nome = "Serviços" if tipo == "Serviços" else ("Compressores" if tipo == "Compressores" else "Produto")
             self.show_success(f"{tipo_nome} salvo com sucesso!")
             
             # Emitir evento
             print(f"DEBUG PRODUTOS: Emitindo evento 'produto_created' para tipo: {tipo}")
-            self.emit_event('produto_created')
+            self.emit_event('produto_created', ids=self.current_produto_id)
             print("DEBUG PRODUTOS: Evento emitido com sucesso!")
             
             # Teste: emitir evento de teste
@@ -716,85 +728,56 @@ class ProdutosModule(BaseModule):
         finally:
             conn.close()
             
+    # Filtro SQL equivalente à classificação das abas (Kit -> Serviços, Produto/Compressores -> Compressores)
+    _FILTRO_ABA_PRODUTOS = {
+        "Serviços": "tipo = 'Kit'",
+        "Compressores": "tipo = 'Produto' AND COALESCE(categoria,'Geral') = 'Compressores'",
+        "Produto": "tipo <> 'Kit' AND NOT (tipo = 'Produto' AND COALESCE(categoria,'Geral') = 'Compressores')",
+    }
+    
+    def _produto_tree_row(self, row):
+        """Converter linha da consulta em (values, tags) para as listas de produtos"""
+        produto_id, nome, tipo, valor, ativo, categoria = row[:6]
+        return (
+            nome,
+            format_currency(valor),
+            "Sim" if ativo else "Não"
+        ), (produto_id,)
+        
+    def _load_produtos(self, termo_where="", params=(), refine=False, on_error=None):
+        for display_tipo, loader in getattr(self, 'produtos_loaders', {}).items():
+            where = self._FILTRO_ABA_PRODUTOS[display_tipo]
+            if termo_where:
+                where = f"({where}) AND ({termo_where})"
+            if on_error is None:
+                loader.load(where, params, refine)
+            else:
+                loader.load_async(where, params, refine, on_error)
+            
     def carregar_produtos(self):
         """Carregar lista de produtos em três abas por tipo"""
-        # Limpar listas atuais
-        if hasattr(self, 'trees_por_tipo'):
-            for tipo, tree in self.trees_por_tipo.items():
-                for item in tree.get_children():
-                    tree.delete(item)
-         
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-         
         try:
-            # Buscar produtos
-            c.execute("""
-                SELECT id, nome, tipo, valor_unitario, ativo, COALESCE(categoria,'Geral')
-                FROM produtos
-                ORDER BY nome
-            """)
-            for row in c.fetchall():
-                produto_id, nome, tipo, valor, ativo, categoria = row
-                display_tipo = ("Serviços" if tipo == "Kit" else ("Compressores" if (tipo == "Produto" and (categoria or "") == "Compressores") else "Produto"))
-                tree = self.trees_por_tipo.get(display_tipo)
-                if tree is None:
-                    continue
-                tree.insert("", "end", values=(
-                    nome,
-                    format_currency(valor),
-                    "Sim" if ativo else "Não"
-                ), tags=(produto_id,))
-         
+            self._load_produtos()
         except sqlite3.Error as e:
             self.show_error(f"Erro ao carregar produtos: {e}")
-        finally:
-            conn.close()
              
     def buscar_produtos(self):
-        """Buscar produtos com filtro nas três abas"""
-        termo = self.search_var.get().strip()
-         
-        # Limpar listas atuais
-        if hasattr(self, 'trees_por_tipo'):
-            for tipo, tree in self.trees_por_tipo.items():
-                for item in tree.get_children():
-                    tree.delete(item)
-         
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
+        """Buscar produtos com filtro nas três abas (consultas em segundo plano)"""
+        termo = self.search_term()
+        erro = lambda e: self.show_error(f"Erro ao buscar produtos: {e}")
          
         try:
             if termo:
-                c.execute("""
-                    SELECT id, nome, tipo, valor_unitario, ativo, COALESCE(categoria,'Geral')
-                    FROM produtos
-                    WHERE nome LIKE ? OR tipo LIKE ? OR descricao LIKE ? OR COALESCE(categoria,'Geral') LIKE ?
-                    ORDER BY nome
-                """, (f"%{termo}%", f"%{termo}%", f"%{termo}%", f"%{termo}%"))
+                # Índice de busca (FTS); sem ele, LIKE nas colunas principais
+                filtro = filtro_busca(termo, {"produto": "id"}) or (
+                    "nome LIKE ? OR tipo LIKE ? OR descricao LIKE ? OR COALESCE(categoria,'Geral') LIKE ?",
+                    (f"%{termo}%", f"%{termo}%", f"%{termo}%", f"%{termo}%"),
+                )
+                self._load_produtos(*filtro, refine=self.search_refines(), on_error=erro)
             else:
-                c.execute("""
-                    SELECT id, nome, tipo, valor_unitario, ativo, COALESCE(categoria,'Geral')
-                    FROM produtos
-                    ORDER BY nome
-                """)
-             
-            for row in c.fetchall():
-                produto_id, nome, tipo, valor, ativo, categoria = row
-                display_tipo = ("Serviços" if tipo == "Kit" else ("Compressores" if (tipo == "Produto" and (categoria or "") == "Compressores") else "Produto"))
-                tree = self.trees_por_tipo.get(display_tipo)
-                if tree is None:
-                    continue
-                tree.insert("", "end", values=(
-                    nome,
-                    format_currency(valor),
-                    "Sim" if ativo else "Não"
-                ), tags=(produto_id,))
-         
+                self._load_produtos(on_error=erro)
         except sqlite3.Error as e:
             self.show_error(f"Erro ao buscar produtos: {e}")
-        finally:
-            conn.close()
             
     def on_produto_double_click(self, event):
         """Duplo clique na treeview - visualizar ou editar produto baseado nas permissões"""
@@ -845,7 +828,7 @@ class ProdutosModule(BaseModule):
             return
         if not messagebox.askyesno("Confirmar Exclusão", "Deseja realmente excluir este registro?\n(Itens de kit vinculados serão removidos.)"):
             return
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         try:
             # Remover composições de kit onde este registro seja kit_id (se for kit)
@@ -855,7 +838,9 @@ class ProdutosModule(BaseModule):
             # Remover o próprio produto
             c.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
             conn.commit()
+            invalidar_composicoes()
             self.show_success("Registro excluído com sucesso!")
+            self.emit_event('produto_deleted', ids=produto_id)
             # Atualizar listas
             self.carregar_produtos()
             self.carregar_produtos_para_kit()
@@ -866,7 +851,7 @@ class ProdutosModule(BaseModule):
         
     def carregar_produto_para_edicao(self, produto_id):
         """Carregar dados do produto para edição"""
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -997,7 +982,7 @@ class ProdutosModule(BaseModule):
             self.show_warning("Selecione um produto para ativar/desativar.")
             return
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -1005,6 +990,7 @@ class ProdutosModule(BaseModule):
             conn.commit()
             
             self.show_success("Status do produto alterado com sucesso!")
+            self.emit_event('produto_updated', ids=produto_id)
             self.carregar_produtos()
             
         except sqlite3.Error as e:
@@ -1020,12 +1006,8 @@ class ProdutosModule(BaseModule):
         """Atualizar combo de itens baseado no tipo selecionado"""
         tipo = self.item_tipo_var.get()
         
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
         try:
-            c.execute("SELECT id, nome, valor_unitario FROM produtos WHERE tipo = ? AND ativo = 1 ORDER BY nome", (tipo,))
-            items = c.fetchall()
+            items = [(id, nome, valor) for id, nome, _tipo, _categoria, valor in self.reference_data.produtos(tipo)]
             
             values = [f"{item[1]} - R$ {item[2]:.2f}" for item in items]
             self.item_combo['values'] = values
@@ -1036,8 +1018,6 @@ class ProdutosModule(BaseModule):
             
         except sqlite3.Error as e:
             self.show_error(f"Erro ao carregar itens: {e}")
-        finally:
-            conn.close()
             
     def adicionar_item_kit(self):
         """Adicionar item à composição do kit"""
@@ -4,10 +4,19 @@ import sqlite3
 import os
 import json
 import sys
+from collections import Counter
 from datetime import datetime
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_date
+from utils.busca import filtro_busca
+from utils.numeracao import proximo_numero, numero_para_gravar
+from utils.anexos import preparar_anexos, hashes_relatorio, referencias, atualizar_referencias
+from utils.relatorio_dados import carregar_relatorio, gravar_anexos, gravar_eventos, excluir_relatorio
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
 # Import adiado para evitar falhas na importação do módulo quando bibliotecas de PDF não estiverem presentes
 
 def _lazy_gerar_pdf_relatorio():
@@ -15,6 +24,8 @@ def _lazy_gerar_pdf_relatorio():
 	return _gpr
 
 class RelatoriosModule(BaseModule):
+	event_topics = ('usuario_created', 'usuario_deleted', 'cliente_created', 'cliente_deleted', 'cotacao_created')
+
 	def setup_ui(self):
 		# Inicializar variáveis primeiro
 		self.current_relatorio_id = None
@@ -127,6 +138,18 @@ class RelatoriosModule(BaseModule):
 		
 		lista_scrollbar = ttk.Scrollbar(lista_inner, orient="vertical", command=self.relatorios_tree.yview)
 		self.relatorios_tree.configure(yscrollcommand=lista_scrollbar.set)
+		self.relatorios_loader = self.create_paginated_loader(
+			self.relatorios_tree,
+			"""
+				SELECT r.id, r.numero_relatorio, cl.nome, r.data_criacao,
+					   u.nome_completo, r.tipo_servico, r.created_at, r.id
+				FROM relatorios_tecnicos r
+				JOIN clientes cl ON r.cliente_id = cl.id
+				JOIN usuarios u ON r.responsavel_id = u.id
+			""",
+			("r.created_at", "r.id"),
+			self._relatorio_tree_row,
+		)
 		
 		self.relatorios_tree.pack(side="left", fill="both", expand=True)
 		lista_scrollbar.pack(side="right", fill="y")
@@ -555,70 +578,33 @@ class RelatoriosModule(BaseModule):
 		
 	def on_usuario_created(self, event_data=None):
 		"""Evento disparado quando um novo usuário é criado"""
-		print("DEBUG: Evento usuario_created recebido, atualizando lista de técnicos...")
 		self.refresh_tecnicos()
 		
 	def refresh_clientes(self):
-		"""Atualizar lista de clientes"""
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
+		"""Atualizar lista de clientes (cache de referência da janela principal)"""
 		try:
-			c.execute("SELECT id, nome FROM clientes ORDER BY nome")
-			clientes = c.fetchall()
-			
-			self.clientes_dict = {f"{nome} (ID: {id})": id for id, nome in clientes}
-			cliente_values = list(self.clientes_dict.keys())
-			
-			self.cliente_combo['values'] = cliente_values
-			
-			print(f"Clientes carregados no relatório: {len(cliente_values)}")  # Debug
-			
+			self.clientes_dict = self.reference_data.clientes_dict()
+			self.cliente_combo['values'] = list(self.clientes_dict)
+			log.debug("Clientes carregados no relatório: %d", len(self.clientes_dict))
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar clientes: {e}")
-		finally:
-			conn.close()
 			
 	def refresh_tecnicos(self):
 		"""Atualizar lista de técnicos (agora baseado em usuários)"""
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
 		try:
-			# Buscar usuários em vez de técnicos
-			c.execute("SELECT id, nome_completo FROM usuarios WHERE nome_completo IS NOT NULL ORDER BY nome_completo")
-			tecnicos = c.fetchall()
-			
-			self.tecnicos_dict = {f"{nome} (ID: {id})": id for id, nome in tecnicos}
-			tecnico_values = list(self.tecnicos_dict.keys())
-			
-			self.tecnico_combo['values'] = tecnico_values
-			
-			print(f"Técnicos carregados: {len(tecnico_values)}")  # Debug
-			
+			self.tecnicos_dict = self.reference_data.tecnicos_dict()
+			self.tecnico_combo['values'] = list(self.tecnicos_dict)
+			log.debug("Técnicos carregados: %d", len(self.tecnicos_dict))
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar técnicos: {e}")
-		finally:
-			conn.close()
 			
 	def refresh_cotacoes(self):
 		"""Atualizar lista de cotações"""
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
 		try:
-			c.execute("SELECT id, numero_proposta FROM cotacoes ORDER BY numero_proposta")
-			cotacoes = c.fetchall()
-			
-			self.cotacoes_dict = {f"{numero} (ID: {id})": id for id, numero in cotacoes}
-			cotacao_values = [""] + list(self.cotacoes_dict.keys())  # Incluir opção vazia
-			
-			self.cotacao_combo['values'] = cotacao_values
-			
+			self.cotacoes_dict = self.reference_data.cotacoes_dict()
+			self.cotacao_combo['values'] = [""] + list(self.cotacoes_dict)  # Incluir opção vazia
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar cotações: {e}")
-		finally:
-			conn.close()
 			
 	def adicionar_tecnico(self):
 		"""Adicionar técnico ao relatório"""
@@ -766,34 +752,10 @@ class RelatoriosModule(BaseModule):
 		# Remover da listbox
 		listbox.delete(index)
 		
-	def _debug_anexos_json(self, aba_num):
-		"""Debug function para ver o que está sendo salvo nos anexos"""
-		anexos = self.anexos_aba[aba_num] if self.anexos_aba[aba_num] else []
-		json_result = json.dumps(anexos) if anexos else "[]"
-		print(f"DEBUG: Aba {aba_num} tem {len(anexos)} anexos: {json_result}")
-		return json_result
-	
 	def gerar_numero_sequencial_relatorio(self) -> str:
-		"""Gerar número sequencial para relatório técnico (formato REL-000001)."""
-		try:
-			conn = sqlite3.connect(DB_NAME)
-			c = conn.cursor()
-			c.execute("SELECT MAX(CAST(SUBSTR(numero_relatorio, 5) AS INTEGER)) FROM relatorios_tecnicos WHERE numero_relatorio LIKE 'REL-%'")
-			result = c.fetchone()
-			if result and result[0]:
-				proximo = result[0] + 1
-			else:
-				proximo = 1
-			return f"REL-{proximo:06d}"
-		except sqlite3.Error as e:
-			print(f"Erro ao gerar número sequencial de relatório: {e}")
-			from datetime import datetime
-			return f"REL-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-		finally:
-			try:
-				conn.close()
-			except Exception:
-				pass
+		"""Sugerir o próximo número de relatório (formato REL-000001), reservado apenas ao salvar."""
+		self._numero_sugerido = proximo_numero('REL')
+		return self._numero_sugerido
 
 	def novo_relatorio(self):
 		"""Limpar formulário para novo relatório"""
@@ -901,10 +863,17 @@ class RelatoriosModule(BaseModule):
 		filial_str = self.filial_var.get()
 		filial_id = int(filial_str.split(' - ')[0]) if ' - ' in filial_str else int(filial_str or 2)
 		
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		
 		try:
+			if not self.current_relatorio_id:
+				# Número reservado nesta transação (sugestão mantida) ou o digitado
+				numero = numero_para_gravar(c, 'REL', numero, getattr(self, '_numero_sugerido', None))
+			# Anexos novos entram no repositório; os que já têm hash não são lidos de novo
+			antes = hashes_relatorio(c, self.current_relatorio_id) if self.current_relatorio_id else Counter()
+			anexos = {aba_num: preparar_anexos(c, self.anexos_aba.get(aba_num), aba_num, self.current_relatorio_id)
+					  for aba_num in range(1, 5)}
 			# Preparar dados do relatório
 			dados_relatorio = (
 				numero,
@@ -951,10 +920,6 @@ class RelatoriosModule(BaseModule):
 				"",  # tempo_trabalho_total
 				"",  # tempo_deslocamento_total
 				"",  # fotos
-				self._debug_anexos_json(1),  # anexos_aba1
-				self._debug_anexos_json(2),  # anexos_aba2
-				self._debug_anexos_json(3),  # anexos_aba3
-				self._debug_anexos_json(4),  # anexos_aba4
 				filial_id
 			)
 			
@@ -972,13 +937,10 @@ class RelatoriosModule(BaseModule):
 						interf_mancais = ?, galeria_hidraulica = ?, data_desmembracao = ?,
 						servicos_propostos = ?, pecas_recomendadas = ?, data_pecas = ?,
 						cotacao_id = ?, tempo_trabalho_total = ?, tempo_deslocamento_total = ?,
-						fotos = ?, anexos_aba1 = ?, anexos_aba2 = ?, anexos_aba3 = ?, anexos_aba4 = ?,
-						filial_id = ?
+						fotos = ?, filial_id = ?
 					WHERE id = ?
 				""", (dados_relatorio[0], dados_relatorio[1]) + dados_relatorio[4:-1] + (dados_relatorio[-1], self.current_relatorio_id,))
 				
-				# Remover eventos antigos
-				c.execute("DELETE FROM eventos_campo WHERE relatorio_id = ?", (self.current_relatorio_id,))
 				relatorio_id = self.current_relatorio_id
 			else:
 				# Inserir novo relatório
@@ -992,65 +954,31 @@ class RelatoriosModule(BaseModule):
 						interf_desmontagem, aspecto_rotores_aba3, aspecto_carcaca, interf_mancais,
 						galeria_hidraulica, data_desmembracao, servicos_propostos, pecas_recomendadas,
 						data_pecas, cotacao_id, tempo_trabalho_total, tempo_deslocamento_total,
-						fotos, anexos_aba1, anexos_aba2, anexos_aba3, anexos_aba4, filial_id
-					) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+						fotos, filial_id
+					) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 				""", dados_relatorio)
 				
 				relatorio_id = c.lastrowid
 				self.current_relatorio_id = relatorio_id
 			
-			# Copiar anexos para pasta do relatório e atualizar caminhos
-			base_dir = os.path.join('data', 'relatorios', 'anexos', str(relatorio_id))
-			os.makedirs(base_dir, exist_ok=True)
-			for aba_num in range(1, 5):
-				new_list = []
-				for anexo in self.anexos_aba.get(aba_num, []):
-					if isinstance(anexo, dict):
-						orig_path = anexo.get('caminho') or anexo.get('path')
-						name = anexo.get('nome') or os.path.basename(str(orig_path or ''))
-						try:
-							if orig_path and os.path.exists(orig_path):
-								dest_path = os.path.join(base_dir, name)
-								if os.path.abspath(orig_path) != os.path.abspath(dest_path):
-									import shutil
-									shutil.copy2(orig_path, dest_path)
-								anexo['caminho'] = dest_path
-						except Exception:
-							pass
-						new_list.append(anexo)
-					else:
-						# string legacy
-						name = os.path.basename(str(anexo))
-						dest_path = os.path.join(base_dir, name)
-						try:
-							if os.path.exists(str(anexo)) and os.path.abspath(str(anexo)) != os.path.abspath(dest_path):
-								import shutil
-								shutil.copy2(str(anexo), dest_path)
-						except Exception:
-							pass
-						new_list.append({'nome': name, 'caminho': dest_path, 'descricao': f'Anexo da Aba {aba_num}'})
-				# Persistir JSON atualizado por aba
-				try:
-					json_updated = json.dumps(new_list)
-					c.execute(f"UPDATE relatorios_tecnicos SET anexos_aba{aba_num} = ? WHERE id = ?", (json_updated, relatorio_id))
-				except Exception:
-					pass
-			
-			# Inserir eventos dos técnicos
+			# Anexos e eventos em lote; referências do repositório pela diferença com o gravado
+			gravar_anexos(c, relatorio_id, anexos)
+			atualizar_referencias(c, antes, referencias(anexos.values()))
+			eventos = []
 			for tecnico_id, tecnico_data in self.tecnicos_eventos.items():
 				tree = tecnico_data['tree']
 				for item in tree.get_children():
 					data_hora, tipo, evento = tree.item(item)['values']
-					c.execute("""
-						INSERT INTO eventos_campo (relatorio_id, tecnico_id, data_hora, evento, tipo)
-						VALUES (?, ?, ?, ?, ?)
-					""", (relatorio_id, tecnico_id, data_hora, evento, tipo))
+					eventos.append((tecnico_id, data_hora, evento, tipo))
+			gravar_eventos(c, relatorio_id, eventos)
 			
 			conn.commit()
+			self.anexos_aba.update(anexos)
+			self.numero_relatorio_var.set(numero)
 			self.show_success("Relatório salvo com sucesso!")
 			
 			# Emitir evento para atualizar outros módulos
-			self.emit_event('relatorio_created')
+			self.emit_event('relatorio_created', ids=relatorio_id)
 			
 			# Recarregar lista
 			self.carregar_relatorios()
@@ -1064,84 +992,39 @@ class RelatoriosModule(BaseModule):
 			
 	def carregar_relatorios(self):
 		"""Carregar lista de relatórios"""
-		# Limpar lista atual
-		for item in self.relatorios_tree.get_children():
-			self.relatorios_tree.delete(item)
-			
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
 		try:
-			c.execute("""
-				SELECT r.id, r.numero_relatorio, cl.nome, r.data_criacao, 
-					   u.nome_completo, r.tipo_servico
-				FROM relatorios_tecnicos r
-				JOIN clientes cl ON r.cliente_id = cl.id
-				JOIN usuarios u ON r.responsavel_id = u.id
-				ORDER BY r.created_at DESC
-			""")
-			
-			for row in c.fetchall():
-				relatorio_id, numero, cliente, data, responsavel, tipo = row
-				self.relatorios_tree.insert("", "end", values=(
-					numero,
-					cliente,
-					format_date(data),
-					responsavel,
-					tipo or ""
-				), tags=(relatorio_id,))
-				
+			self.relatorios_loader.load()
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar relatórios: {e}")
-		finally:
-			conn.close()
 			
 	def buscar_relatorios(self):
-		"""Buscar relatórios com filtro"""
-		termo = self.search_var.get().strip()
-		
-		# Limpar lista atual
-		for item in self.relatorios_tree.get_children():
-			self.relatorios_tree.delete(item)
-			
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
+		"""Buscar relatórios com filtro (consulta em segundo plano)"""
+		termo = self.search_term()
+		erro = lambda e: self.show_error(f"Erro ao buscar relatórios: {e}")
 		
 		try:
 			if termo:
-				c.execute("""
-					SELECT r.id, r.numero_relatorio, cl.nome, r.data_criacao, 
-						   u.nome_completo, r.tipo_servico
-					FROM relatorios_tecnicos r
-					JOIN clientes cl ON r.cliente_id = cl.id
-					JOIN usuarios u ON r.responsavel_id = u.id
-					WHERE r.numero_relatorio LIKE ? OR cl.nome LIKE ?
-					ORDER BY r.created_at DESC
-				""", (f"%{termo}%", f"%{termo}%"))
+				# Índice de busca (FTS): relatório ou cliente; sem ele, LIKE
+				filtro = filtro_busca(termo, {"relatorio": "r.id", "cliente": "r.cliente_id"}) or (
+					"r.numero_relatorio LIKE ? OR cl.nome LIKE ?",
+					(f"%{termo}%", f"%{termo}%"),
+				)
+				self.relatorios_loader.load_async(*filtro, refine=self.search_refines(), on_error=erro)
 			else:
-				c.execute("""
-					SELECT r.id, r.numero_relatorio, cl.nome, r.data_criacao, 
-						   u.nome_completo, r.tipo_servico
-					FROM relatorios_tecnicos r
-					JOIN clientes cl ON r.cliente_id = cl.id
-					JOIN usuarios u ON r.responsavel_id = u.id
-					ORDER BY r.created_at DESC
-				""")
-			
-			for row in c.fetchall():
-				relatorio_id, numero, cliente, data, responsavel, tipo = row
-				self.relatorios_tree.insert("", "end", values=(
-					numero,
-					cliente,
-					format_date(data),
-					responsavel,
-					tipo or ""
-				), tags=(relatorio_id,))
-				
+				self.relatorios_loader.load_async(on_error=erro)
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao buscar relatórios: {e}")
-		finally:
-			conn.close()
+			
+	def _relatorio_tree_row(self, row):
+		"""Converter linha da consulta em (values, tags) para a lista de relatórios"""
+		relatorio_id, numero, cliente, data, responsavel, tipo = row[:6]
+		return (
+			numero,
+			cliente,
+			format_date(data),
+			responsavel,
+			tipo or ""
+		), (relatorio_id,)
 			
 	def editar_relatorio(self):
 		"""Editar/Visualizar relatório selecionado baseado nas permissões"""
@@ -1174,13 +1057,9 @@ class RelatoriosModule(BaseModule):
 		
 	def carregar_relatorio_para_edicao(self, relatorio_id):
 		"""Carregar dados do relatório para edição"""
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
 		try:
-			# Carregar dados do relatório
-			c.execute("SELECT * FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
-			relatorio = c.fetchone()
+			# Relatório, anexos e eventos numa única consulta
+			relatorio = carregar_relatorio(relatorio_id)
 			
 			if not relatorio:
 				self.show_error("Relatório não encontrado.")
@@ -1191,155 +1070,101 @@ class RelatoriosModule(BaseModule):
 			
 			# Preencher campos básicos
 			self.current_relatorio_id = relatorio_id
-			self.numero_relatorio_var.set(relatorio[1] or "")  # numero_relatorio
+			self.numero_relatorio_var.set(relatorio['numero_relatorio'] or "")
 			
 			# Encontrar cliente no combo
 			for key, value in self.clientes_dict.items():
-				if value == relatorio[2]:  # cliente_id
+				if value == relatorio['cliente_id']:
 					self.cliente_var.set(key)
 					break
 					
-			self.data_criacao_var.set(format_date(relatorio[4]) if relatorio[4] else "")
-			self.formulario_servico_var.set(relatorio[5] or "")
-			self.tipo_servico_var.set(relatorio[6] or "")
+			self.data_criacao_var.set(format_date(relatorio['data_criacao']) if relatorio['data_criacao'] else "")
+			self.formulario_servico_var.set(relatorio['formulario_servico'] or "")
+			self.tipo_servico_var.set(relatorio['tipo_servico'] or "")
 			
 			# Descrição do serviço
-			if relatorio[7]:
-				self.descricao_text.insert("1.0", relatorio[7])
+			if relatorio['descricao_servico']:
+				self.descricao_text.insert("1.0", relatorio['descricao_servico'])
 				
-			self.data_recebimento_var.set(relatorio[8] or "")
-			
-			# Carregar dados das abas (índices 9-30)
-			# Aba 1 (índices 9-14)
-			aba1_campos = ["Cond. Encontrada", "Placa/N.Série", "Acoplamento", "Aspectos Rotores", "Válvulas Acopladas", "Data Recebimento"]
-			for i, campo in enumerate(aba1_campos):
-				if campo in self.aba1_vars:
-					self.aba1_vars[campo].set(relatorio[9 + i] or "")
-			
-			# Aba 2 (índices 15-21)
-			aba2_campos = ["Parafusos/Pinos", "Superfície Vedação", "Engrenagens", "Bico Injetor", "Rolamentos", "Aspecto Óleo", "Data"]
-			for i, campo in enumerate(aba2_campos):
-				if campo in self.aba2_vars:
-					self.aba2_vars[campo].set(relatorio[15 + i] or "")
-			
-			# Aba 3 (índices 22-27)
-			aba3_campos = ["Interf. Desmontagem", "Aspecto Rotores", "Aspecto Carcaça", "Interf. Mancais", "Galeria Hidráulica", "Data Desmembração"]
-			for i, campo in enumerate(aba3_campos):
-				if campo in self.aba3_vars:
-					self.aba3_vars[campo].set(relatorio[22 + i] or "")
-			
-			# Aba 4 (índices 28-30)
-			if relatorio[28]:  # servicos_propostos
-				self.servicos_text.insert("1.0", relatorio[28])
-			if relatorio[29]:  # pecas_recomendadas
-				self.pecas_text.insert("1.0", relatorio[29])
-			self.data_pecas_var.set(relatorio[30] or "")
+			self.data_recebimento_var.set(relatorio['data_recebimento'] or "")
+			
+			# Campos das abas 1-3: rótulo do formulário -> coluna
+			for variaveis, campos in (
+				(self.aba1_vars, (("Cond. Encontrada", 'condicao_encontrada'), ("Placa/N.Série", 'placa_identificacao'),
+								  ("Acoplamento", 'acoplamento'), ("Aspectos Rotores", 'aspectos_rotores'),
+								  ("Válvulas Acopladas", 'valvulas_acopladas'), ("Data Recebimento", 'data_recebimento_equip'))),
+				(self.aba2_vars, (("Parafusos/Pinos", 'parafusos_pinos'), ("Superfície Vedação", 'superficie_vedacao'),
+								  ("Engrenagens", 'engrenagens'), ("Bico Injetor", 'bico_injetor'),
+								  ("Rolamentos", 'rolamentos'), ("Aspecto Óleo", 'aspecto_oleo'), ("Data", 'data_peritagem'))),
+				(self.aba3_vars, (("Interf. Desmontagem", 'interf_desmontagem'), ("Aspecto Rotores", 'aspecto_rotores_aba3'),
+								  ("Aspecto Carcaça", 'aspecto_carcaca'), ("Interf. Mancais", 'interf_mancais'),
+								  ("Galeria Hidráulica", 'galeria_hidraulica'), ("Data Desmembração", 'data_desmembracao'))),
+			):
+				for campo, coluna in campos:
+					if campo in variaveis:
+						variaveis[campo].set(relatorio[coluna] or "")
+			
+			# Aba 4
+			if relatorio['servicos_propostos']:
+				self.servicos_text.insert("1.0", relatorio['servicos_propostos'])
+			if relatorio['pecas_recomendadas']:
+				self.pecas_text.insert("1.0", relatorio['pecas_recomendadas'])
+			self.data_pecas_var.set(relatorio['data_pecas'] or "")
 			
 			# Cotação vinculada
-			if relatorio[31]:  # cotacao_id
+			if relatorio['cotacao_id']:
 				for key, value in self.cotacoes_dict.items():
-					if value == relatorio[31]:
+					if value == relatorio['cotacao_id']:
 						self.cotacao_var.set(key)
 						break
 			
-			# Filial: buscar de forma robusta
-			try:
-				c.execute("SELECT filial_id FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
-				row_f = c.fetchone()
-				if row_f and row_f[0] in (1, 2):
-					filial_id = row_f[0]
-					nome_filial = "WORLD COMP COMPRESSORES LTDA" if filial_id == 1 else "WORLD COMP DO BRASIL COMPRESSORES LTDA"
-					self.filial_var.set(f"{filial_id} - {nome_filial}")
-			except Exception:
-				pass
+			# Filial
+			filial_id = relatorio.get('filial_id')
+			if filial_id in (1, 2):
+				nome_filial = "WORLD COMP COMPRESSORES LTDA" if filial_id == 1 else "WORLD COMP DO BRASIL COMPRESSORES LTDA"
+				self.filial_var.set(f"{filial_id} - {nome_filial}")
 			
-			# Carregar anexos usando colunas por aba, para evitar erros de índice
+			# Anexos por aba
 			for aba_num in range(1, 5):
-				# Limpar anexos e listbox desta aba primeiro
-				self.anexos_aba[aba_num] = []
+				self.anexos_aba[aba_num] = relatorio['anexos'].get(aba_num, [])
 				listbox = getattr(self, f'anexos_listbox_aba{aba_num}')
 				listbox.delete(0, tk.END)
-
-				anexos_str = None
-				try:
-					c.execute(f"SELECT anexos_aba{aba_num} FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
-					row_anx = c.fetchone()
-					anexos_str = row_anx[0] if row_anx else None
-				except Exception:
-					anexos_str = None
-
-				if anexos_str:
-					try:
-						# Tentar carregar como JSON
-						self.anexos_aba[aba_num] = json.loads(anexos_str)
-					except (json.JSONDecodeError, TypeError):
-						# Fallback para formato antigo (separado por ;) ou string simples
-						anexos_list = anexos_str.split(';') if isinstance(anexos_str, str) else []
-						self.anexos_aba[aba_num] = [anexo for anexo in anexos_list if anexo]
-
-				# Atualizar listbox com nomes
 				for anexo in self.anexos_aba[aba_num]:
-					if isinstance(anexo, dict):
-						nome_candidate = anexo.get('nome') or anexo.get('caminho') or anexo.get('path') or 'Arquivo sem nome'
-						nome_anexo = os.path.basename(str(nome_candidate))
-					else:
-						nome_anexo = os.path.basename(str(anexo)) if isinstance(anexo, (str, bytes)) else str(anexo)
-					listbox.insert(tk.END, nome_anexo)
+					nome_candidate = anexo.get('nome') or anexo.get('caminho') or 'Arquivo sem nome'
+					listbox.insert(tk.END, os.path.basename(str(nome_candidate)))
 			
 			# Carregar eventos dos técnicos
-			self.carregar_eventos_relatorio(relatorio_id)
+			self.carregar_eventos_relatorio(relatorio['eventos'])
 			
 		except sqlite3.Error as e:
 			self.show_error(f"Erro ao carregar relatório: {e}")
-			import traceback
-			print(f"Erro completo: {traceback.format_exc()}")
-		finally:
-			conn.close()
+			log.exception("Erro ao carregar relatório %s", relatorio_id)
 			
 	def abrir_relatorio_editor_pdf(self, relatorio_id):
 		"""Método descontinuado: editor de templates removido."""
 		self.show_warning("O Editor de Templates foi removido do sistema.")
 		# Sem ação
 
-	def carregar_eventos_relatorio(self, relatorio_id):
-		"""Carregar eventos dos técnicos do relatório"""
-		conn = sqlite3.connect(DB_NAME)
-		c = conn.cursor()
-		
-		try:
-			c.execute("""
-				SELECT ec.tecnico_id, u.nome_completo, ec.data_hora, ec.evento, ec.tipo
-				FROM eventos_campo ec
-				JOIN usuarios u ON ec.tecnico_id = u.id
-				WHERE ec.relatorio_id = ?
-				ORDER BY ec.tecnico_id, ec.data_hora
-			""", (relatorio_id,))
-			
-			eventos = c.fetchall()
-			tecnicos_adicionados = set()
-			
-			for evento in eventos:
-				tecnico_id, tecnico_nome, data_hora, descricao, tipo = evento
-				
-				# Adicionar técnico se ainda não foi adicionado
-				if tecnico_id not in tecnicos_adicionados:
-					# Simular seleção do técnico
-					for key, value in self.tecnicos_dict.items():
-						if value == tecnico_id:
-							self.tecnico_var.set(key)
-							self.adicionar_tecnico()
-							break
-					tecnicos_adicionados.add(tecnico_id)
-				
-				# Adicionar evento
-				if tecnico_id in self.tecnicos_eventos:
-					tree = self.tecnicos_eventos[tecnico_id]['tree']
-					tree.insert("", "end", values=(data_hora, tipo, descricao))
-					
-		except sqlite3.Error as e:
-			self.show_error(f"Erro ao carregar eventos: {e}")
-		finally:
-			conn.close()
+	def carregar_eventos_relatorio(self, eventos):
+		"""Preencher os técnicos e seus eventos (tuplas de ``carregar_relatorio``)"""
+		tecnicos_adicionados = set()
+		
+		# Técnicos na ordem de id, eventos de cada um por data/hora
+		for tecnico_id, tecnico_nome, data_hora, descricao, tipo in sorted(eventos, key=lambda e: e[0]):
+			# Adicionar técnico se ainda não foi adicionado
+			if tecnico_id not in tecnicos_adicionados:
+				# Simular seleção do técnico
+				for key, value in self.tecnicos_dict.items():
+					if value == tecnico_id:
+						self.tecnico_var.set(key)
+						self.adicionar_tecnico()
+						break
+				tecnicos_adicionados.add(tecnico_id)
+			
+			# Adicionar evento
+			if tecnico_id in self.tecnicos_eventos:
+				tree = self.tecnicos_eventos[tecnico_id]['tree']
+				tree.insert("", "end", values=(data_hora, tipo, descricao))
 			
 	def duplicar_relatorio(self):
 		"""Duplicar relatório selecionado"""
@@ -1371,12 +1196,7 @@ class RelatoriosModule(BaseModule):
 			return
 			
 		gerar_pdf_relatorio = _lazy_gerar_pdf_relatorio()
-		sucesso, resultado = gerar_pdf_relatorio(self.current_relatorio_id, DB_NAME)
-		
-		if sucesso:
-			self.show_success(f"PDF gerado com sucesso!\nLocal: {resultado}")
-		else:
-			self.show_error(f"Erro ao gerar PDF: {resultado}")
+		self.generate_pdf_in_background(gerar_pdf_relatorio, self.current_relatorio_id, DB_NAME)
 			
 	def gerar_pdf_selecionado(self):
 		"""Gerar PDF do relatório selecionado"""
@@ -1392,21 +1212,17 @@ class RelatoriosModule(BaseModule):
 			
 		relatorio_id = tags[0]
 		gerar_pdf_relatorio = _lazy_gerar_pdf_relatorio()
-		sucesso, resultado = gerar_pdf_relatorio(relatorio_id, DB_NAME)
-		
-		if sucesso:
-			self.show_success(f"PDF gerado com sucesso!\nLocal: {resultado}")
-		else:
-			self.show_error(f"Erro ao gerar PDF: {resultado}")
+		self.generate_pdf_in_background(gerar_pdf_relatorio, relatorio_id, DB_NAME)
 			
 	def handle_event(self, event_type, data=None):
 		"""Manipular eventos recebidos do sistema"""
-		if event_type == 'usuario_created':
-			print("DEBUG: Evento usuario_created recebido via handle_event, atualizando lista de técnicos...")
+		log.debug("Evento recebido: %s", event_type)
+		if event_type in ('usuario_created', 'usuario_deleted'):
 			self.refresh_tecnicos()
-		elif event_type == 'cliente_created':
-			print("DEBUG: Evento cliente_created recebido via handle_event, atualizando lista de clientes...")
+		elif event_type in ('cliente_created', 'cliente_deleted'):
 			self.refresh_clientes()
+		elif event_type == 'cotacao_created':
+			self.refresh_cotacoes()
 
 	def excluir_relatorio(self):
 		if not self.can_edit('relatorios'):
@@ -1423,11 +1239,11 @@ class RelatoriosModule(BaseModule):
 		relatorio_id = tags[0]
 		if not messagebox.askyesno("Confirmar Exclusão", "Tem certeza que deseja excluir o relatório selecionado?"):
 			return
-		conn = sqlite3.connect(DB_NAME)
+		conn = get_connection()
 		c = conn.cursor()
 		try:
-			c.execute("DELETE FROM eventos_campo WHERE relatorio_id = ?", (relatorio_id,))
-			c.execute("DELETE FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
+			atualizar_referencias(c, hashes_relatorio(c, relatorio_id), Counter())
+			excluir_relatorio(c, relatorio_id)
 			conn.commit()
 			self.show_success("Relatório excluído com sucesso!")
 			self.carregar_relatorios()
@@ -1504,25 +1320,7 @@ class RelatoriosModule(BaseModule):
 		
 		# Primeiro gerar o PDF se não existir
 		gerar_pdf_relatorio = _lazy_gerar_pdf_relatorio()
-		sucesso, resultado = gerar_pdf_relatorio(relatorio_id, DB_NAME)
-		
-		if sucesso:
-			# Abrir o PDF com o aplicativo padrão
-			try:
-				import os
-				import sys
-				if os.name == 'nt':  # Windows
-					os.startfile(resultado)
-				elif sys.platform == 'darwin':  # macOS
-					import subprocess
-					subprocess.Popen(['open', resultado])
-				else:  # Linux
-					import subprocess
-					subprocess.Popen(['xdg-open', resultado])
-			except Exception as e:
-				self.show_error(f"Erro ao abrir PDF: {e}")
-		else:
-			self.show_error(f"Erro ao gerar PDF: {resultado}")
+		self.generate_pdf_in_background(gerar_pdf_relatorio, relatorio_id, DB_NAME, open_after=True)
 			
 	def abrir_pdf(self):
 		"""Abrir PDF do relatório atual"""
@@ -1530,26 +1328,5 @@ class RelatoriosModule(BaseModule):
 			self.show_warning("Salve o relatório antes de abrir o PDF.")
 			return
 			
-		try:
-			gerar_pdf_relatorio = _lazy_gerar_pdf_relatorio()
-			sucesso, resultado = gerar_pdf_relatorio(self.current_relatorio_id, DB_NAME)
-			
-			if sucesso:
-				# Abrir o PDF com o aplicativo padrão
-				try:
-					import os
-					import sys
-					if os.name == 'nt':  # Windows
-						os.startfile(resultado)
-					elif sys.platform == 'darwin':  # macOS
-						import subprocess
-						subprocess.Popen(['open', resultado])
-					else:  # Linux
-						import subprocess
-						subprocess.Popen(['xdg-open', resultado])
-				except Exception as e:
-					self.show_error(f"Erro ao abrir PDF: {e}")
-			else:
-				self.show_error(f"Erro ao gerar PDF: {resultado}")
-		except Exception as e:
-			self.show_error(f"Erro ao abrir PDF: {e}")
\ No newline at end of file
+		gerar_pdf_relatorio = _lazy_gerar_pdf_relatorio()
+		self.generate_pdf_in_background(gerar_pdf_relatorio, self.current_relatorio_id, DB_NAME, open_after=True)
\ No newline at end of file
@@ -3,7 +3,7 @@ from tkinter import ttk, messagebox
 import sqlite3
 import hashlib
 from .base_module import BaseModule
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_phone, validate_email
 
 class UsuariosModule(BaseModule):
@@ -245,7 +245,7 @@ class UsuariosModule(BaseModule):
             self.show_warning("Email inválido.")
             return
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -272,7 +272,7 @@ class UsuariosModule(BaseModule):
             self.show_success("Usuário salvo com sucesso!")
             
             # Emitir evento para atualizar outros módulos
-            self.emit_event('usuario_created')
+            self.emit_event('usuario_created', ids=self.current_usuario_id)
             
             self.carregar_usuarios()
             
@@ -289,7 +289,7 @@ class UsuariosModule(BaseModule):
         for item in self.usuarios_tree.get_children():
             self.usuarios_tree.delete(item)
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -316,12 +316,12 @@ class UsuariosModule(BaseModule):
             conn.close()
             
     def buscar_usuarios(self):
-        termo = self.search_var.get().strip()
+        termo = self.search_term()
         
         for item in self.usuarios_tree.get_children():
             self.usuarios_tree.delete(item)
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -373,7 +373,7 @@ class UsuariosModule(BaseModule):
         self.notebook.select(0)
         
     def carregar_usuario_para_edicao(self, usuario_id):
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -426,7 +426,7 @@ class UsuariosModule(BaseModule):
             
         usuario_id = tags[0]
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -468,7 +468,7 @@ class UsuariosModule(BaseModule):
             self.show_warning("Você não pode excluir seu próprio usuário.")
             return
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         try:
@@ -488,6 +488,7 @@ class UsuariosModule(BaseModule):
             conn.commit()
             
             self.show_success("Usuário excluído com sucesso!")
+            self.emit_event('usuario_deleted', ids=usuario_id)
             
             self.carregar_usuarios()
             
@@ -0,0 +1,139 @@
+import tkinter as tk
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+# Classes de binding compartilhadas (instaladas uma vez por interpretador Tk)
+READ_ONLY_TAG = "ReadOnly"
+READ_ONLY_LIST_TAG = "ReadOnlyList"
+READ_ONLY_VALUE_TAG = "ReadOnlyValue"
+READ_ONLY_TAGS = (READ_ONLY_TAG, READ_ONLY_LIST_TAG, READ_ONLY_VALUE_TAG)
+
+# Eventos que editam: no widget com a tag o Tk para no "break" antes dos bindings dele e da classe
+# (a roda do mouse continua livre para rolar textos longos)
+BLOCKED_SEQUENCES = (
+    '<Key>', '<KeyRelease>', '<Button-1>', '<ButtonRelease-1>', '<Double-Button-1>', '<Triple-Button-1>',
+    '<B1-Motion>', '<Shift-Button-1>', '<Control-Button-1>', '<Button-2>', '<ButtonRelease-2>',
+    '<B2-Motion>', '<Button-3>', '<ButtonRelease-3>',
+    '<<Paste>>', '<<Cut>>', '<<Clear>>', '<<Undo>>', '<<Redo>>', '<<PasteSelection>>', '<<Invoke>>',
+)
+# Em combobox/spinbox/escala a roda do mouse troca o valor: nesses widgets ela também para
+BLOCKED_WHEEL_SEQUENCES = ('<MouseWheel>', '<Button-4>', '<Button-5>')
+# Listas e árvores continuam navegáveis/selecionáveis; só as teclas de edição param
+BLOCKED_LIST_SEQUENCES = ('<Delete>', '<BackSpace>', '<F2>', '<Insert>')
+
+# Classes Tk que recebem cada tag (as demais, como Label/Frame/Scrollbar/Notebook, ficam livres)
+EDIT_CLASSES = {
+    'Entry', 'TEntry', 'Text', 'Spinbox', 'TSpinbox', 'TCombobox', 'Checkbutton', 'TCheckbutton',
+    'Radiobutton', 'TRadiobutton', 'Scale', 'TScale', 'Button', 'TButton', 'Menubutton', 'TMenubutton',
+}
+LIST_CLASSES = {'Treeview', 'Listbox'}
+VALUE_CLASSES = {'TCombobox', 'Spinbox', 'TSpinbox', 'Scale', 'TScale'}
+
+# Botões de consulta/navegação que continuam ativos no modo somente leitura
+ALLOWED_BUTTONS = ('buscar', 'pesquisar', 'filtrar', 'visualizar', 'ver', 'consultar', 'imprimir',
+                   'exportar', 'pdf', 'voltar', 'anterior', 'próximo', 'primeiro', 'último', 'editar')
+
+
+class ReadOnlyGuard:
+    """Modo somente leitura por bindtag, sem percorrer a árvore de widgets.
+
+    ``set_read_only(container, True)`` registra o caminho Tk do container.
+    A tag é posta (ou tirada) de cada widget quando o ponteiro entra nele ou
+    ele recebe o foco, que acontece antes de qualquer clique ou tecla; assim
+    a troca de permissão vale na hora, inclusive para widgets criados depois
+    (linhas de itens, diálogos filhos do módulo), e nenhum binding é criado
+    por widget. ``allow`` libera widgets específicos (ex.: campos de busca).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._containers = set()  # caminhos Tk dos containers somente leitura
+        self._allowed = set()
+        for sequence in BLOCKED_SEQUENCES:
+            root.bind_class(READ_ONLY_TAG, sequence, 'break')
+        for sequence in BLOCKED_LIST_SEQUENCES:
+            root.bind_class(READ_ONLY_LIST_TAG, sequence, 'break')
+        for sequence in BLOCKED_SEQUENCES + BLOCKED_WHEEL_SEQUENCES:
+            root.bind_class(READ_ONLY_VALUE_TAG, sequence, 'break')
+        root.bind_all('<Enter>', self._on_activate, add='+')
+        root.bind_all('<FocusIn>', self._on_activate, add='+')
+
+    @classmethod
+    def for_widget(cls, widget):
+        """Guarda da janela raiz de ``widget`` (criada na primeira vez)."""
+        root = widget._root()
+        guard = getattr(root, '_read_only_guard', None)
+        if guard is None:
+            guard = root._read_only_guard = cls(root)
+        return guard
+
+    def set_read_only(self, container, read_only=True):
+        """Liga/desliga o modo somente leitura de tudo que está dentro de ``container``."""
+        path = str(container)
+        if read_only:
+            self._containers.add(path)
+        else:
+            self._containers.discard(path)
+        log.debug("Somente leitura %s em %s", "ligado" if read_only else "desligado", path)
+        # Quem já está com foco ou sob o ponteiro não recebe um novo Enter/FocusIn
+        for widget in (self._focused(), self._under_pointer()):
+            if widget is not None:
+                self.sync(widget)
+
+    def allow(self, widget):
+        """Mantém ``widget`` editável mesmo dentro de um container somente leitura."""
+        self._allowed.add(str(widget))
+        self.sync(widget)
+
+    def is_read_only(self, widget):
+        path = str(widget)
+        if path in self._allowed:
+            return False
+        return any(path == container or path.startswith(container + '.') for container in self._containers)
+
+    def sync(self, widget):
+        """Põe ou tira a tag do widget conforme o container e a classe dele."""
+        try:
+            tag = self._tag_for(widget)
+            tags = widget.bindtags()
+            wanted = tag if tag and self.is_read_only(widget) else None
+            current = [t for t in tags if t in READ_ONLY_TAGS]
+            if current == ([wanted] if wanted else []):
+                return
+            tags = tuple(t for t in tags if t not in READ_ONLY_TAGS)
+            widget.bindtags(((wanted,) if wanted else ()) + tags)
+        except tk.TclError:
+            pass  # Widget destruído
+
+    def _tag_for(self, widget):
+        klass = widget.winfo_class()
+        if klass in LIST_CLASSES:
+            return READ_ONLY_LIST_TAG
+        if klass in VALUE_CLASSES:
+            return READ_ONLY_VALUE_TAG
+        if klass not in EDIT_CLASSES:
+            return None
+        if klass in ('Button', 'TButton'):
+            text = str(widget.cget('text')).lower()
+            if any(allowed in text for allowed in ALLOWED_BUTTONS):
+                return None
+        return READ_ONLY_TAG
+
+    def _on_activate(self, event):
+        # Widgets internos do Tk chegam como string (sem objeto Python)
+        if isinstance(event.widget, tk.Misc):
+            self.sync(event.widget)
+
+    def _focused(self):
+        try:
+            return self.root.focus_get()
+        except (KeyError, tk.TclError):
+            return None
+
+    def _under_pointer(self):
+        try:
+            return self.root.winfo_containing(*self.root.winfo_pointerxy())
+        except (KeyError, tk.TclError):
+            return None
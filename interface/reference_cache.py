@@ -0,0 +1,175 @@
+import sqlite3
+from database import get_connection
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class Snapshot:
+    """Cópia imutável de uma lista de referência numa versão.
+
+    ``rows`` são as linhas da consulta da entidade; ``derive`` guarda
+    resultados montados a partir delas (dicts e listas dos combos), então
+    todos os módulos que pedem a mesma visão na mesma versão recebem o
+    mesmo objeto. Não altere o que for devolvido.
+    """
+
+    __slots__ = ("entity", "version", "rows", "_derived")
+
+    def __init__(self, entity, version, rows):
+        self.entity = entity
+        self.version = version
+        self.rows = tuple(rows)
+        self._derived = {}
+
+    def derive(self, key, build):
+        if key not in self._derived:
+            self._derived[key] = build(self.rows)
+        return self._derived[key]
+
+    def __repr__(self):
+        return f"Snapshot({self.entity!r}, v{self.version}, {len(self.rows)} linhas)"
+
+
+def _ordem(valor):
+    # Mesma ordem do ORDER BY do SQLite: NULL antes dos textos
+    return (valor is not None, valor)
+
+
+class ReferenceCache:
+    """Listas de referência dos combos (clientes, produtos, técnicos, cotações).
+
+    Pertence à MainWindow e é compartilhado pelos módulos: cada entidade é
+    lida uma vez e servida como Snapshot versionado até um evento do
+    barramento (``observe``, no momento do publish) invalidá-la. Eventos
+    com ids relêem só esses registros; sem ids a lista inteira é descartada
+    e relida no próximo acesso. Sem barramento não há como saber de
+    alterações, então cada acesso consulta o banco.
+    """
+
+    # entidade: (SELECT com o id na 1ª coluna, filtro, coluna de ordenação, índice dela na linha)
+    ENTIDADES = {
+        "clientes": ("SELECT id, nome FROM clientes", None, "nome", 1),
+        "produtos": ("SELECT id, nome, tipo, COALESCE(categoria,'Geral'), valor_unitario FROM produtos",
+                     "ativo = 1", "nome", 1),
+        "tecnicos": ("SELECT id, nome_completo FROM usuarios", "nome_completo IS NOT NULL", "nome_completo", 1),
+        "cotacoes": ("SELECT id, numero_proposta FROM cotacoes", None, "numero_proposta", 1),
+    }
+
+    INVALIDADO_POR = {
+        "cliente_created": "clientes",
+        "cliente_updated": "clientes",
+        "cliente_deleted": "clientes",
+        "produto_created": "produtos",
+        "produto_updated": "produtos",
+        "produto_deleted": "produtos",
+        "usuario_created": "tecnicos",
+        "usuario_updated": "tecnicos",
+        "usuario_deleted": "tecnicos",
+        "cotacao_created": "cotacoes",
+        "cotacao_deleted": "cotacoes",
+    }
+
+    def __init__(self, event_bus=None, db_name=None):
+        self.db_name = db_name
+        self._snapshots = {}
+        self._versions = dict.fromkeys(self.ENTIDADES, 0)
+        self._enabled = event_bus is not None
+        if event_bus is not None:
+            event_bus.observe(self._on_event, tuple(self.INVALIDADO_POR))
+
+    def get(self, entity):
+        """Snapshot atual de ``entity`` (consulta o banco só se foi invalidado)."""
+        snapshot = self._snapshots.get(entity)
+        if snapshot is None:
+            snapshot = Snapshot(entity, self._versions[entity], self._query(entity))
+            if self._enabled:
+                self._snapshots[entity] = snapshot
+        return snapshot
+
+    def version(self, entity):
+        return self._versions[entity]
+
+    def invalidate(self, entity=None, ids=None):
+        """Descarta ``entity`` (todas se None); com ``ids`` relê apenas esses registros."""
+        for name in ([entity] if entity else list(self.ENTIDADES)):
+            self._versions[name] += 1
+            snapshot = self._snapshots.pop(name, None)
+            if snapshot is None or not ids:
+                continue
+            try:
+                self._snapshots[name] = self._patch(snapshot, ids)
+            except sqlite3.Error as e:
+                log.warning("Falha ao reler %s %s: %s", name, sorted(ids), e)
+
+    def _on_event(self, topic, ids):
+        self.invalidate(self.INVALIDADO_POR[topic], ids)
+
+    def _query(self, entity, ids=None):
+        select, filtro, ordem, _indice = self.ENTIDADES[entity]
+        condicoes = [filtro] if filtro else []
+        params = ()
+        if ids is not None:
+            params = tuple(ids)
+            condicoes.append(f"id IN ({', '.join('?' for _ in params)})")
+        sql = select
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        if ids is None:
+            sql += f" ORDER BY {ordem}"
+        conn = get_connection(self.db_name)
+        try:
+            c = conn.cursor()
+            c.execute(sql, params)
+            rows = c.fetchall()
+        finally:
+            conn.close()
+        log.debug("Lista de referência %s lida (%d linhas)", entity, len(rows))
+        return rows
+
+    def _patch(self, snapshot, ids):
+        # Ids vindos das tags do Treeview chegam como texto
+        ids = {int(i) if isinstance(i, str) and i.isdigit() else i for i in ids}
+        indice = self.ENTIDADES[snapshot.entity][3]
+        rows = [row for row in snapshot.rows if row[0] not in ids]
+        rows.extend(self._query(snapshot.entity, ids))
+        rows.sort(key=lambda row: _ordem(row[indice]))
+        return Snapshot(snapshot.entity, self._versions[snapshot.entity], rows)
+
+    # --- Visões usadas pelos combos ---
+    def clientes_dict(self):
+        """{"Nome (ID: n)": id} em ordem de nome."""
+        return self.get("clientes").derive(
+            "dict", lambda rows: {f"{nome} (ID: {id})": id for id, nome in rows})
+
+    def tecnicos_dict(self):
+        return self.get("tecnicos").derive(
+            "dict", lambda rows: {f"{nome} (ID: {id})": id for id, nome in rows})
+
+    def cotacoes_dict(self):
+        return self.get("cotacoes").derive(
+            "dict", lambda rows: {f"{numero} (ID: {id})": id for id, numero in rows})
+
+    def produtos(self, tipo, sem_compressores=False):
+        """Linhas (id, nome, tipo, categoria, valor) ativas do tipo do banco."""
+        return self._produtos(self.get("produtos"), tipo, sem_compressores)
+
+    def nomes_produtos(self, tipo):
+        """Nomes para os combos de itens; em ``'Produto'`` sem os Compressores (ver ``compressores``)."""
+        snapshot = self.get("produtos")
+        return snapshot.derive(
+            ("nomes", tipo),
+            lambda _rows: [row[1] for row in self._produtos(snapshot, tipo, tipo == "Produto")])
+
+    @staticmethod
+    def _produtos(snapshot, tipo, sem_compressores):
+        return snapshot.derive(
+            ("tipo", tipo, sem_compressores),
+            lambda rows: tuple(row for row in rows
+                               if row[2] == tipo and not (sem_compressores and row[3] == "Compressores")))
+
+    def compressores(self):
+        """Nomes dos produtos ativos da categoria Compressores."""
+        return self.get("produtos").derive(
+            "compressores",
+            lambda rows: [row[1] for row in rows if row[2] == "Produto" and row[3] == "Compressores"])
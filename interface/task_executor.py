@@ -0,0 +1,237 @@
+import queue
+import threading
+import itertools
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+from utils.theme import PALETTE, FONTS
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class TaskCancelled(Exception):
+    """Lançada por uma tarefa que percebeu o pedido de cancelamento."""
+
+
+class TaskHandle:
+    """Referência a uma tarefa enviada ao TaskExecutor.
+
+    A função executada pode receber o handle (``pass_handle=True``) para
+    informar progresso com ``report_progress`` e consultar ``cancelled``.
+    """
+
+    def __init__(self, task_id, description, executor):
+        self.id = task_id
+        self.description = description
+        self.progress = None  # None = indeterminado, 0..100 = percentual
+        self.message = ""
+        self.future = None
+        self._executor = executor
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Solicita o cancelamento. Tarefas ainda na fila nem chegam a rodar."""
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self._executor._post('cancelled', self, None)
+
+    def check_cancelled(self):
+        """Atalho para tarefas longas: interrompe a execução se cancelada."""
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def report_progress(self, value=None, message=None):
+        """Pode ser chamado da thread de trabalho; a UI é atualizada no loop do Tk."""
+        self._executor._post('progress', self, (value, message))
+
+
+class TaskExecutor:
+    """Executa trabalho pesado (consultas, PDFs) fora do loop principal do Tk.
+
+    As funções rodam num pool de threads; resultados, erros e progresso são
+    entregues de volta à thread da interface por uma fila consultada com
+    ``root.after``, então os callbacks podem mexer em widgets livremente.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers=3):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crm-worker')
+        self._queue = queue.Queue()
+        self._active = {}
+        self._listeners = []
+        self._ids = itertools.count(1)
+        self._polling = False
+        self._closed = False
+
+    def submit(self, func, *args, description="", on_success=None, on_error=None,
+               on_cancel=None, pass_handle=False, **kwargs):
+        """Agenda ``func(*args, **kwargs)`` e retorna o TaskHandle.
+
+        ``on_success(resultado)``, ``on_error(exc)`` e ``on_cancel()`` são
+        chamados na thread do Tk. Com ``pass_handle=True`` a função recebe o
+        handle no argumento nomeado ``task``.
+        """
+        if self._closed:
+            raise RuntimeError("TaskExecutor encerrado")
+        handle = TaskHandle(next(self._ids), description, self)
+        if pass_handle:
+            kwargs['task'] = handle
+        self._active[handle.id] = (handle, on_success, on_error, on_cancel)
+        handle.future = self._pool.submit(self._run, handle, func, args, kwargs)
+        self._ensure_polling()
+        self._notify()
+        return handle
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def active_tasks(self):
+        return [entry[0] for entry in self._active.values()]
+
+    def add_listener(self, callback):
+        """Registra ``callback(tarefas_ativas)`` chamado a cada mudança de estado."""
+        self._listeners.append(callback)
+
+    def cancel_all(self):
+        for handle in self.active_tasks():
+            handle.cancel()
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _post(self, kind, handle, payload):
+        self._queue.put((kind, handle, payload))
+
+    def _run(self, handle, func, args, kwargs):
+        # Executa na thread de trabalho: nenhuma chamada ao Tk aqui
+        if handle.cancelled:
+            self._post('cancelled', handle, None)
+            return
+        try:
+            result = func(*args, **kwargs)
+        except TaskCancelled:
+            self._post('cancelled', handle, None)
+        except Exception as e:
+            self._post('error', handle, e)
+        else:
+            self._post('cancelled' if handle.cancelled else 'done', handle, result)
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        changed = False
+        while True:
+            try:
+                kind, handle, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if kind == 'progress':
+                handle.progress, message = payload
+                if message is not None:
+                    handle.message = message
+                continue
+            entry = self._active.pop(handle.id, None)
+            if entry is None:
+                continue  # Já finalizada (ex.: cancelada enquanto na fila)
+            _, on_success, on_error, on_cancel = entry
+            try:
+                if kind == 'done' and on_success:
+                    on_success(payload)
+                elif kind == 'error':
+                    if on_error:
+                        on_error(payload)
+                    else:
+                        # O traceback vem da própria exceção levantada no worker
+                        log.error("Erro na tarefa '%s'", handle.description,
+                                  exc_info=payload if isinstance(payload, BaseException) else None)
+                elif kind == 'cancelled' and on_cancel:
+                    on_cancel()
+            except Exception:
+                log.exception("Erro no retorno da tarefa '%s'", handle.description)
+        if changed:
+            self._notify()
+        if self._active or not self._queue.empty():
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _notify(self):
+        tasks = self.active_tasks()
+        for listener in self._listeners:
+            try:
+                listener(tasks)
+            except Exception:
+                log.exception("Falha ao atualizar status de tarefas")
+
+
+class StatusBar(tk.Frame):
+    """Barra de status da janela principal: tarefa atual, progresso e cancelamento."""
+
+    IDLE_TEXT = "Pronto"
+
+    def __init__(self, parent, executor):
+        super().__init__(parent, bg='#ffffff', highlightthickness=1, highlightbackground=PALETTE["border"])
+        self.executor = executor
+        self._current = None
+        self._animating = False
+
+        self.label = tk.Label(self, text=self.IDLE_TEXT, font=FONTS["base"], bg='#ffffff',
+                              fg=PALETTE["text_primary"], anchor="w")
+        self.label.pack(side="left", fill="x", expand=True, padx=10, pady=4)
+
+        self.cancel_btn = ttk.Button(self, text="Cancelar", style='Secondary.TButton', command=self._cancel_current)
+        self.progress = ttk.Progressbar(self, mode='indeterminate', length=180)
+
+        executor.add_listener(self.update_tasks)
+
+    def update_tasks(self, tasks):
+        if not tasks:
+            self._current = None
+            self._stop_animation()
+            self.progress.pack_forget()
+            self.cancel_btn.pack_forget()
+            self.label.config(text=self.IDLE_TEXT)
+            return
+
+        self._current = tasks[-1]
+        text = self._current.description or "Processando..."
+        if self._current.message:
+            text = f"{text} - {self._current.message}"
+        if len(tasks) > 1:
+            text = f"{text} (+{len(tasks) - 1} em andamento)"
+        self.label.config(text=text)
+
+        if not self.cancel_btn.winfo_ismapped():
+            self.cancel_btn.pack(side="right", padx=(4, 10), pady=4)
+            self.progress.pack(side="right", pady=4)
+        if self._current.progress is None:
+            if not self._animating:
+                self.progress.config(mode='indeterminate')
+                self.progress.start(15)
+                self._animating = True
+        else:
+            self._stop_animation()
+            self.progress.config(mode='determinate', value=self._current.progress)
+
+    def _stop_animation(self):
+        if self._animating:
+            self.progress.stop()
+            self._animating = False
+
+    def _cancel_current(self):
+        if self._current is not None:
+            self._current.cancel()
@@ -24,6 +24,9 @@ def _set_working_directory():
 
 def main():
     _set_working_directory()
+    # Logs em arquivo (data/logs/crm.log) sem bloquear a interface; nível em CRM_LOG_LEVEL
+    from utils.logs import configurar_logs
+    configurar_logs()
     try:
         print("=== Sistema CRM - Iniciando ===")
         print(f"Python: {sys.version}")
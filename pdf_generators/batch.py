@@ -0,0 +1,244 @@
+"""
+Geração de PDFs em lote para cotações e relatórios técnicos.
+
+Uso (a partir da pasta do sistema):
+    python -m pdf_generators.batch --status "Em Aberto" --de 2024-01-01 --ate 2024-12-31
+    python -m pdf_generators.batch --tipo relatorios --filial 2 --workers 4
+    python -m pdf_generators.batch --responsavel valdir --forcar
+
+Os documentos são renderizados em paralelo (um processo por worker).
+Cotações e relatórios cuja impressão digital (pdf_generators.fingerprint)
+confere com a do PDF gravado são considerados atualizados e ignorados, a
+menos que --forcar seja usado.
+Ao final é gravado um manifesto JSON com o resultado de cada documento.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import database
+from database import DB_NAME, close_thread_connections, get_connection
+from pdf_generators.fingerprint import pdf_em_dia, relatorio_em_dia
+from pdf_generators.image_assets import limpar_derivados
+
+MANIFEST_DIR = os.path.join("data", "lotes")
+RELATORIOS_DIR = os.path.join("data", "relatorios")
+
+
+def _filtros_sql(filtros, alias, coluna_data):
+    """Monta cláusulas WHERE comuns (período, filial e responsável)."""
+    clausulas = []
+    params = []
+    if filtros.get("de"):
+        clausulas.append(f"{coluna_data} >= ?")
+        params.append(filtros["de"])
+    if filtros.get("ate"):
+        clausulas.append(f"{coluna_data} <= ?")
+        params.append(filtros["ate"])
+    if filtros.get("filial"):
+        clausulas.append(f"{alias}.filial_id = ?")
+        params.append(int(filtros["filial"]))
+    if filtros.get("responsavel"):
+        # Aceita id numérico ou username
+        clausulas.append("(u.username = ? OR CAST(u.id AS TEXT) = ?)")
+        params.extend([filtros["responsavel"], str(filtros["responsavel"])])
+    return clausulas, params
+
+
+def selecionar_cotacoes(conn, filtros):
+    clausulas, params = _filtros_sql(filtros, "c", "c.data_criacao")
+    if filtros.get("status"):
+        clausulas.append("c.status = ?")
+        params.append(filtros["status"])
+    where = f"WHERE {' AND '.join(clausulas)}" if clausulas else ""
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT c.id, c.numero_proposta, c.caminho_arquivo_pdf, u.username, c.contato_nome
+        FROM cotacoes c
+        JOIN usuarios u ON c.responsavel_id = u.id
+        {where}
+        ORDER BY c.id
+    """, params)
+    return [
+        {"tipo": "cotacao", "id": row[0], "numero": row[1], "caminho": row[2],
+         "username": row[3], "contato_nome": row[4]}
+        for row in c.fetchall()
+    ]
+
+
+def selecionar_relatorios(conn, filtros):
+    clausulas, params = _filtros_sql(filtros, "r", "date(r.created_at)")
+    where = f"WHERE {' AND '.join(clausulas)}" if clausulas else ""
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT r.id, r.numero_relatorio
+        FROM relatorios_tecnicos r
+        JOIN usuarios u ON r.responsavel_id = u.id
+        {where}
+        ORDER BY r.id
+    """, params)
+    return [
+        {"tipo": "relatorio", "id": row[0], "numero": row[1],
+         "caminho": os.path.join(RELATORIOS_DIR, f"relatorio_{row[0]}.pdf")}
+        for row in c.fetchall()
+    ]
+
+
+def _init_worker(base_dir):
+    # O pool de conexões herdado do processo pai (fork) não pode ser usado aqui
+    database._local = threading.local()
+    os.chdir(base_dir)
+    if base_dir not in sys.path:
+        sys.path.insert(0, base_dir)
+
+
+def _renderizar(job, db_name):
+    """Executado no processo worker: gera um documento e devolve o resultado."""
+    inicio = time.perf_counter()
+    try:
+        if job["tipo"] == "cotacao":
+            from pdf_generators.cotacao_nova import gerar_pdf_cotacao_nova
+            sucesso, resultado = gerar_pdf_cotacao_nova(
+                job["id"], db_name, job.get("username"), contato_nome=job.get("contato_nome")
+            )
+        else:
+            from pdf_generators.relatorio_tecnico import gerar_pdf_relatorio
+            sucesso, resultado = gerar_pdf_relatorio(job["id"], db_name)
+    except Exception as e:
+        sucesso, resultado = False, str(e)
+    return {
+        "status": "gerado" if sucesso else "erro",
+        "caminho": resultado if sucesso else job.get("caminho"),
+        "mensagem": "" if sucesso else str(resultado),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+def executar_lote(filtros, db_name=DB_NAME, tipo="todos", workers=None, forcar=False,
+                  manifesto=None, log=print):
+    """Seleciona, renderiza e registra em manifesto os documentos do filtro.
+
+    Retorna o dicionário do manifesto (também gravado em disco).
+    """
+    os.chdir(BASE_DIR)
+    inicio = datetime.datetime.now()
+    itens = []
+    pendentes = []
+    conn = get_connection(db_name)
+    try:
+        jobs = []
+        if tipo in ("todos", "cotacoes"):
+            jobs.extend(selecionar_cotacoes(conn, filtros))
+        if tipo in ("todos", "relatorios"):
+            jobs.extend(selecionar_relatorios(conn, filtros))
+        for job in jobs:
+            if forcar:
+                atualizado = False
+            elif job["tipo"] == "cotacao":
+                atualizado = pdf_em_dia(job["id"], conn, job.get("username"), job.get("contato_nome")) is not None
+            else:
+                atualizado = relatorio_em_dia(job["id"], conn, job.get("caminho"))
+            if atualizado:
+                itens.append({**job, "status": "ignorado", "mensagem": "PDF já atualizado", "segundos": 0})
+            else:
+                pendentes.append(job)
+    finally:
+        conn.close()
+    # Os workers são criados por fork: nenhuma conexão aberta deve passar para eles
+    close_thread_connections()
+
+    log(f"{len(jobs)} documento(s) encontrados, {len(pendentes)} para gerar, "
+        f"{len(jobs) - len(pendentes)} já atualizados")
+
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(BASE_DIR,)) as pool:
+            futures = {pool.submit(_renderizar, job, db_name): job for job in pendentes}
+            for n, future in enumerate(as_completed(futures), 1):
+                job = futures[future]
+                try:
+                    resultado = future.result()
+                except Exception as e:
+                    resultado = {"status": "erro", "caminho": job.get("caminho"), "mensagem": str(e), "segundos": 0}
+                itens.append({**job, **resultado})
+                log(f"[{n}/{len(pendentes)}] {job['tipo']} {job['numero']}: {resultado['status']}"
+                    + (f" - {resultado['mensagem']}" if resultado["mensagem"] else ""))
+        # Os workers acabaram de gravar derivados de imagem: mantém a pasta de cache limitada
+        limpar_derivados()
+
+    fim = datetime.datetime.now()
+    resumo = {"total": len(itens)}
+    for status in ("gerado", "ignorado", "erro"):
+        resumo[status] = sum(1 for item in itens if item["status"] == status)
+    dados = {
+        "inicio": inicio.isoformat(timespec="seconds"),
+        "fim": fim.isoformat(timespec="seconds"),
+        "duracao_segundos": round((fim - inicio).total_seconds(), 1),
+        "filtros": {k: v for k, v in filtros.items() if v},
+        "tipo": tipo,
+        "forcar": forcar,
+        "resumo": resumo,
+        "itens": sorted(itens, key=lambda item: (item["tipo"], item["id"])),
+    }
+
+    if manifesto is None:
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        manifesto = os.path.join(MANIFEST_DIR, f"lote_{inicio.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(manifesto, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    dados["manifesto"] = manifesto
+    return dados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m pdf_generators.batch",
+        description="Gera em lote os PDFs de cotações e relatórios técnicos.",
+    )
+    parser.add_argument("--tipo", choices=("todos", "cotacoes", "relatorios"), default="todos")
+    parser.add_argument("--status", help="Status da cotação (ex.: 'Em Aberto'); não se aplica a relatórios")
+    parser.add_argument("--de", help="Data inicial (AAAA-MM-DD)")
+    parser.add_argument("--ate", help="Data final (AAAA-MM-DD)")
+    parser.add_argument("--filial", type=int, help="ID da filial")
+    parser.add_argument("--responsavel", help="ID ou username do responsável")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: núcleos da CPU)")
+    parser.add_argument("--forcar", action="store_true", help="Regerar mesmo os PDFs já atualizados")
+    parser.add_argument("--manifesto", help="Caminho do manifesto JSON (padrão: data/lotes/lote_<data>.json)")
+    parser.add_argument("--db", help="Arquivo do banco de dados (padrão: o banco do sistema)")
+    args = parser.parse_args(argv)
+
+    for campo in ("de", "ate"):
+        valor = getattr(args, campo)
+        if valor:
+            try:
+                datetime.date.fromisoformat(valor)
+            except ValueError:
+                parser.error(f"--{campo} deve estar no formato AAAA-MM-DD")
+
+    filtros = {
+        "status": args.status,
+        "de": args.de,
+        "ate": args.ate,
+        "filial": args.filial,
+        "responsavel": args.responsavel,
+    }
+    db_name = os.path.abspath(args.db) if args.db else os.path.join(BASE_DIR, DB_NAME)
+    dados = executar_lote(filtros, db_name=db_name, tipo=args.tipo, workers=args.workers,
+                          forcar=args.forcar, manifesto=args.manifesto)
+    resumo = dados["resumo"]
+    print(f"Concluído em {dados['duracao_segundos']}s: {resumo['gerado']} gerado(s), "
+          f"{resumo['ignorado']} ignorado(s), {resumo['erro']} erro(s)")
+    print(f"Manifesto: {dados['manifesto']}")
+    return 1 if resumo["erro"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,31 @@
 import sqlite3
 import os
+import logging
 import datetime
 import sys
 import re
 import time
 import tempfile
 from fpdf import FPDF
-from database import DB_NAME
+from database import DB_NAME, get_connection
 from utils.formatters import format_cep, format_phone, format_currency, format_date, format_cnpj
+from utils.kits import carregar_composicoes_cotacao, obter_composicao_kit
 
 # Adicionar o diretório assets ao path para importar os templates
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from assets.filiais.filiais_config import obter_filial, obter_usuario_cotacao, obter_template_capa_jpeg
+from pdf_generators.image_assets import obter_imagem
+from pdf_generators.fingerprint import fingerprint_cotacao
+from pdf_generators.fragmentos import fragmento
+from pdf_generators.texto import LATIN1, limpar_texto
+from utils.logs import get_logger
+
+log = get_logger(__name__)
 
 def clean_text(text):
     """Normaliza espaços e símbolos problemáticos preservando acentuação (Latin-1)."""
-    if text is None:
-        return ""
-    text = str(text)
-    # Substitui tabs por 4 espaços
-    text = text.replace('\t', '    ')
-    # Substitui alguns símbolos especiais por equivalentes simples
-    replacements = {
-        '•': '- ', '●': '- ', '◦': '- ', '◆': '- ', '▪': '- ', '▫': '- ',
-        '★': '* ', '☆': '* ', '–': '-', '—': '-', '…': '...', '®': '(R)', '™': '(TM)', '©': '(C)'
-    }
-    for old_char, new_char in replacements.items():
-        text = text.replace(old_char, new_char)
-    # Garantir compatibilidade Latin-1 sem remover acentos comuns
-    try:
-        text.encode('latin-1')
-    except Exception:
-        text = text.encode('latin-1', 'replace').decode('latin-1')
-    return text
+    return limpar_texto(text, LATIN1)
 
 def replace_company_names(text, filial_name):
     """Substitui qualquer ocorrência de 'World Comp' (case-insensitive, com espaços) pelo nome da filial."""
@@ -42,7 +34,114 @@ def replace_company_names(text, filial_name):
     except Exception:
         return text
 
-def save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn):
+# Apresentação (página 2): o 2º parágrafo é montado por cotação; os demais são fragmentos fixos
+APRESENTACAO_LOCACAO = (
+    "Prezados Senhores:",
+    "Agradecemos por nos conceder a oportunidade de apresentarmos nossa proposta para\n"
+    "fornecimento de Locação de Compressor de Ar {equipamento}.",
+    "A World Comp Compressores e especializada em manutencao de compressores de parafuso\n"
+    "das principais marcas do mercado, como Atlas Copco, Ingersoll Rand, Chicago. Atuamos tambem com\n"
+    "revisao de equipamentos e unidades compressoras, venda de pecas, bem como venda e locacao de\n"
+    "compressores de parafuso isentos de oleo e lubrificados.",
+    "Com profissionais altamente qualificados e atendimento especializado, colocamo-nos a\n"
+    "disposicao para analisar, corrigir e prestar os devidos esclarecimentos, sempre buscando atender as\n"
+    "especificacoes e necessidades dos nossos clientes.",
+)
+
+APRESENTACAO_PADRAO = (
+    "\nPrezados,",
+    "Agradecemos a sua solicitação e, conforme requerido, apresentamos nossas condições comerciais para fornecimento de serviços e mão de obra para seu compressor{modelo}.",
+    "A Word Comp Compressores é especializada em manutenção de compressores de parafuso das principais marcas do mercado, como Atlas Copco, Ingersoll Rand, Chicago. Atuamos também com revisão de equipamentos e unidades compressoras, venda de peças, bem como venda e locação de compressores de parafuso isento de óleo e lubrificados",
+    "Com profissionais altamente qualificados e atendimento especializado, colocamo-nos à disposição para analisar, corrigir e prestar os devidos esclarecimentos, sempre buscando atender às especificações e necessidades dos nossos clientes.",
+    "Atenciosamente,\n            ",
+)
+
+def _texto_filial(texto, nome_filial):
+    return clean_text(replace_company_names(clean_text(texto), nome_filial))
+
+def _desenhar_paragrafos(pdf, paragrafos, nome_filial=None):
+    """Parágrafos fixos da apresentação; com ``nome_filial`` o nome da empresa é substituído."""
+    pdf.set_font("Arial", '', 11)
+    for par in paragrafos:
+        pdf.multi_cell(0, 5, _texto_filial(par, nome_filial) if nome_filial else clean_text(par))
+        pdf.ln(5)
+
+def _desenhar_sobre_locacao(pdf, nome_filial):
+    """Página 3 de Locação: usar textos específicos fornecidos."""
+    secoes_loc = [
+        ("SOBRE A WORLD COMP", clean_text(
+"A World Comp Compressores e uma empresa com mais de uma decada de atuacao no\n"
+"mercado nacional, especializada na manutencao de compressores de ar do tipo parafuso. Seu\n"
+"atendimento abrange todo o territorio brasileiro, oferecendo solucoes tecnicas e comerciais voltadas a\n"
+"maximizacao do desempenho e da confiabilidade dos sistemas de ar comprimido utilizados por seus\n"
+"clientes.\n"
+        )),
+        ("NOSSOS SERVICOS", clean_text(
+"A empresa oferece um portfolio completo de servicos, que contempla a manutencao\n"
+"preventiva e corretiva de compressores e unidades compressoras, a venda de pecas de reposicao\n"
+"para diversas marcas, a locacao de compressores de parafuso — incluindo modelos lubrificados e\n"
+"isentos de oleo —, alem da recuperacao de unidades compressoras e trocadores de calor.\n"
+"A World Comp tambem disponibiliza contratos de manutencao personalizados, adaptados as\n"
+"necessidades operacionais especificas de cada cliente. Dentre os principais fabricantes atendidos,\n"
+"destacam-se marcas reconhecidas como Atlas Copco, Ingersoll Rand e Chicago Pneumatic.\n"
+        )),
+        ("QUALIDADE DOS SERVICOS & MELHORIA CONTINUA", clean_text(
+"A empresa investe continuamente na capacitacao de sua equipe, na modernizacao de\n"
+"processos e no aprimoramento da estrutura de atendimento, assegurando alto padrao de qualidade,\n"
+"agilidade e eficacia nos servicos. Mantem ainda uma politica ativa de melhoria continua, com\n"
+"avaliacoes periodicas que visam atualizar tecnologias, aperfeicoar metodos e garantir excelencia\n"
+"tecnica.\n"
+        )),
+        ("CONTE CONOSCO PARA UMA PARCERIA!", clean_text(
+"Nossa missao e ser sua melhor parceria com sinonimo de qualidade, garantia e o melhor\n"
+"custo beneficio.\n"
+        ))
+    ]
+    for titulo, texto in secoes_loc:
+        pdf.set_text_color(*pdf.baby_blue)
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 8, titulo, 0, 1, 'L')
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Arial", '', 11)
+        pdf.multi_cell(0, 5, replace_company_names(texto, nome_filial))
+        pdf.ln(3)
+    pdf.ln(7)
+
+def _desenhar_sobre_padrao(pdf):
+    """Página 3 da cotação (padrão): manter conteúdo original."""
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 8, clean_text("SOBRE A WORLD COMP"), 0, 1, 'L')
+    pdf.set_font("Arial", '', 11)
+    sobre_empresa = clean_text("Há mais de uma década no mercado de manutenção de compressores de ar de parafuso, de diversas marcas, atendemos clientes em todo território brasileiro.")
+    pdf.multi_cell(0, 5, sobre_empresa)
+    pdf.ln(5)
+    secoes = [
+        ("FORNECIMENTO, SERVIÇO E LOCAÇÃO", """
+A World Comp oferece os serviços de Manutenção Preventiva e Corretiva em Compressores e Unidades Compressoras, Venda de peças, Locação de compressores, Recuperação de Unidades Compressoras, Recuperação de Trocadores de Calor e Contrato de Manutenção em compressores de marcas como: Atlas Copco, Ingersoll Rand, Chicago Pneumatic entre outros.
+                """),
+        ("CONTE CONOSCO PARA UMA PARCERIA", """
+Adaptamos nossa oferta para suas necessidades, objetivos e planejamento. Trabalhamos para que seu processo seja eficiente.
+                """),
+        ("MELHORIA CONTÍNUA", """
+Continuamente investindo em comprometimento, competência e eficiência de nossos serviços, produtos e estrutura para garantirmos a máxima eficiência de sua produtividade.
+                """),
+        ("QUALIDADE DE SERVIÇOS", """
+Com uma equipe de técnicos altamente qualificados e constantemente treinados para atendimentos em todos os modelos de compressores de ar, a World Comp oferece garantia de excelente atendimento e produtividade superior com rapidez e eficácia.
+                """)
+    ]
+    for titulo, texto in secoes:
+        pdf.set_text_color(*pdf.baby_blue)
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 8, clean_text(titulo), 0, 1, 'L')
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Arial", '', 11)
+        pdf.multi_cell(0, 5, clean_text(texto))
+        pdf.ln(3)
+    texto_final = clean_text("Nossa missão é ser sua melhor parceria com sinônimo de qualidade, garantia e o melhor custo benefício.")
+    pdf.multi_cell(0, 5, texto_final)
+    pdf.ln(10)
+
+def save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn, fingerprint=None):
     """
     Salvar PDF com tratamento robusto de erros de permissão
     Retorna (sucesso, caminho_arquivo)
@@ -68,7 +167,7 @@ def save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn):
         
         # Atualizar caminho do PDF no banco de dados
         c = conn.cursor()
-        c.execute("UPDATE cotacoes SET caminho_arquivo_pdf=? WHERE id=?", (pdf_path, cot_id))
+        c.execute("UPDATE cotacoes SET caminho_arquivo_pdf=?, pdf_fingerprint=? WHERE id=?", (pdf_path, fingerprint, cot_id))
         conn.commit()
         
         return True, pdf_path
@@ -82,7 +181,7 @@ def save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn):
             
             # Atualizar caminho do PDF no banco de dados
             c = conn.cursor()
-            c.execute("UPDATE cotacoes SET caminho_arquivo_pdf=? WHERE id=?", (temp_pdf_path, cot_id))
+            c.execute("UPDATE cotacoes SET caminho_arquivo_pdf=?, pdf_fingerprint=? WHERE id=?", (temp_pdf_path, fingerprint, cot_id))
             conn.commit()
             
             return True, temp_pdf_path
@@ -186,40 +285,11 @@ class PDFCotacao(FPDF):
         try:
             # Determinar filial por CNPJ conhecido (ou usar imagem padrão)
             cnpj_val = (self.dados_filial.get('cnpj') or '').strip()
-            is_filial_1 = (cnpj_val == "10.644.944/0001-55")
-
-            # Selecionar imagem por filial conforme solicitado
-            if is_filial_1:
-                # Filial 1 -> cabeçalho.jpeg
-                header_candidates = [
-                    os.path.join(os.path.dirname(__file__), '..', 'cabeçalho.jpeg'),
-                    os.path.join(os.path.dirname(__file__), '..', 'cabecalho.jpeg')
-                ]
-            else:
-                # Filial 2 -> cabeçalho2.jpeg
-                header_candidates = [
-                    os.path.join(os.path.dirname(__file__), '..', 'cabeçalho2.jpeg'),
-                    os.path.join(os.path.dirname(__file__), '..', 'cabecalho2.jpeg')
-                ]
-
-            header_img = None
-            for candidate in header_candidates:
-                if os.path.exists(candidate):
-                    header_img = candidate
-                    break
-            # Fallback para imagem padrão se a específica da filial não existir
-            if not header_img:
-                fallback_candidates = [
-                    os.path.join(os.path.dirname(__file__), '..', 'cabeçalho.jpeg'),
-                    os.path.join(os.path.dirname(__file__), '..', 'cabecalho.jpeg')
-                ]
-                for candidate in fallback_candidates:
-                    if os.path.exists(candidate):
-                        header_img = candidate
-                        break
-            if os.path.exists(header_img):
+            nome_asset = "cabecalho_filial_1" if cnpj_val == "10.644.944/0001-55" else "cabecalho_filial_2"
+            header_img = obter_imagem(nome_asset, 199, 29)
+            if header_img:
                 # Posicionar a imagem dentro da borda (sem cobrir a linha)
-                self.image(header_img, x=5.5, y=5.5, w=199, h=29)
+                self.image(header_img.path, x=5.5, y=5.5, w=199, h=29)
         except Exception:
             pass
 
@@ -300,30 +370,13 @@ class PDFCotacao(FPDF):
         self.set_text_color(0, 0, 0)
     
     @staticmethod
-    def obter_composicao_kit(kit_id):
-        """Obtém a composição de um kit a partir do banco de dados"""
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        composicao = []
-        
+    def obter_composicao_kit(kit_id, db_name=None):
+        """Obtém a composição de um kit (linhas "quantidade x nome")"""
         try:
-            c.execute("""
-                SELECT p.nome, kc.quantidade 
-                FROM kit_items kc
-                JOIN produtos p ON kc.produto_id = p.id
-                WHERE kc.kit_id = ?
-            """, (kit_id,))
-            
-            for row in c.fetchall():
-                nome, quantidade = row
-                composicao.append(f"{quantidade} x {nome}")
-                
+            composicao = obter_composicao_kit(kit_id, db_name=db_name)
         except sqlite3.Error:
-            composicao = ["Erro ao carregar composição"]
-        finally:
-            conn.close()
-        
-        return composicao
+            return ["Erro ao carregar composição"]
+        return [f"{quantidade} x {nome}" for nome, quantidade in composicao]
 
 def gerar_pdf_cotacao_nova(cotacao_id, db_name, current_user=None, contato_nome=None, locacao_pagina4_text=None, locacao_pagina4_image=None):
     """
@@ -335,9 +388,13 @@ def gerar_pdf_cotacao_nova(cotacao_id, db_name, current_user=None, contato_nome=
     """
     conn = None
     try:
-        conn = sqlite3.connect(db_name)
+        conn = get_connection(db_name)
         c = conn.cursor()   
 
+        # Entradas da renderização, gravadas com o caminho do PDF (ver pdf_generators.fingerprint)
+        fingerprint = fingerprint_cotacao(cotacao_id, conn, current_user, contato_nome,
+                                          locacao_pagina4_text, locacao_pagina4_image)
+
         # Obter dados da cotação (incluindo filial_id)
         c.execute("""
             SELECT 
@@ -409,6 +466,12 @@ def gerar_pdf_cotacao_nova(cotacao_id, db_name, current_user=None, contato_nome=
         """, (cotacao_id,))
         itens_cotacao = c.fetchall()
 
+        # Composição de todos os kits da cotação numa única consulta
+        try:
+            composicoes_kits = carregar_composicoes_cotacao(cotacao_id, conn=conn)
+        except sqlite3.Error:
+            composicoes_kits = None
+
         # Criar o PDF
         pdf = PDFCotacao(dados_filial, dados_usuario, orientation='P', unit='mm', format='A4')
         pdf.set_auto_page_break(auto=True, margin=30)
@@ -427,9 +490,9 @@ def gerar_pdf_cotacao_nova(cotacao_id, db_name, current_user=None, contato_nome=
         pdf.add_page()
 
         # Fundo fixo para capa: usar sempre caploc.jpg (padrão unificado)
-        capa_path = os.path.join(os.path.dirname(__file__), '..', 'caploc.jpg')
-        if os.path.exists(capa_path):
-            pdf.image(capa_path, x=0, y=0, w=210, h=297)
+        capa = obter_imagem("capa_locacao", 210, 297)
+        if capa:
+            pdf.image(capa.path, x=0, y=0, w=210, h=297)
 
         # Textos dinâmicos na capa, canto inferior esquerdo (branco, negrito, mesmo tamanho)
         try:
@@ -568,83 +631,47 @@ def gerar_pdf_cotacao_nova(cotacao_id, db_name, current_user=None, contato_nome=
 
         # Texto de apresentação
         pdf.set_font("Arial", size=11)
-        texto_apresentacao = None
         if (tipo_cotacao or '').lower() == 'locação' or (tipo_cotacao or '').lower() == 'locacao':
             # Texto completo com linha alvo mantendo posição e tamanho originais
             equip_nome_for_line = (equipamento_nome_preview or "").strip()
-            texto_str = (
-                "Prezados Senhores:\n\n"
-                "Agradecemos por nos conceder a oportunidade de apresentarmos nossa proposta para\n"
-                f"fornecimento de Locação de Compressor de Ar {equip_nome_for_line if equip_nome_for_line else ''}.\n\n"
-                "A World Comp Compressores e especializada em manutencao de compressores de parafuso\n"
-                "das principais marcas do mercado, como Atlas Copco, Ingersoll Rand, Chicago. Atuamos tambem com\n"
-                "revisao de equipamentos e unidades compressoras, venda de pecas, bem como venda e locacao de\n"
-                "compressores de parafuso isentos de oleo e lubrificados.\n\n"
-                "Com profissionais altamente qualificados e atendimento especializado, colocamo-nos a\n"
-                "disposicao para analisar, corrigir e prestar os devidos esclarecimentos, sempre buscando atender as\n"
-                "especificacoes e necessidades dos nossos clientes."
-            )
-            texto_str = replace_company_names(clean_text(texto_str), dados_filial.get('nome'))
-            alvo = "LOCACAO DE COMPRESSOR DE AR"
-            paragrafos = texto_str.split("\n\n")
-            for idx, par in enumerate(paragrafos):
-                # No parágrafo com a linha de fornecimento, deixar o NOME do equipamento em negrito
-                if idx == 1 and equip_nome_for_line:
-                    alvo_nome = equip_nome_for_line
-                    if alvo_nome in par:
-                        antes, _, resto = par.partition(alvo_nome)
-                        pdf.set_font("Arial", '', 11)
-                        pdf.write(5, clean_text(antes))
-                        pdf.set_font("Arial", 'B', 11)
-                        pdf.write(5, clean_text(alvo_nome))
-                        pdf.set_font("Arial", '', 11)
-                        pdf.write(5, clean_text(resto))
-                    else:
-                        pdf.multi_cell(0, 5, clean_text(par))
-                else:
-                    pdf.multi_cell(0, 5, clean_text(par))
-                # Quebra entre parágrafos
-                pdf.ln(5)
-                # Após o 2º parágrafo (idx == 1), inserir 4 linhas extras
-                if idx == 1:
-                    pdf.ln(20)
-            texto_apresentacao = None
+            nome_empresa = dados_filial.get('nome') or "WORLD COMP"
+            fragmento(pdf, "apresentacao", _desenhar_paragrafos, APRESENTACAO_LOCACAO[:1], nome_empresa).reproduzir(pdf)
+            # No parágrafo com a linha de fornecimento, deixar o NOME do equipamento em negrito
+            par = _texto_filial(APRESENTACAO_LOCACAO[1].format(equipamento=equip_nome_for_line), nome_empresa)
+            if equip_nome_for_line and equip_nome_for_line in par:
+                antes, _, resto = par.partition(equip_nome_for_line)
+                pdf.set_font("Arial", '', 11)
+                pdf.write(5, clean_text(antes))
+                pdf.set_font("Arial", 'B', 11)
+                pdf.write(5, clean_text(equip_nome_for_line))
+                pdf.set_font("Arial", '', 11)
+                pdf.write(5, clean_text(resto))
+            else:
+                pdf.multi_cell(0, 5, clean_text(par))
+            # Após o 2º parágrafo, inserir 4 linhas extras
+            pdf.ln(5)
+            pdf.ln(20)
+            fragmento(pdf, "apresentacao", _desenhar_paragrafos, APRESENTACAO_LOCACAO[2:], nome_empresa).reproduzir(pdf)
         else:
+            fragmento(pdf, "apresentacao", _desenhar_paragrafos, APRESENTACAO_PADRAO[:1]).reproduzir(pdf)
             modelo_text = f" {modelo_compressor}" if modelo_compressor else ""
-            texto_apresentacao = clean_text(f"""
-Prezados,
-
-Agradecemos a sua solicitação e, conforme requerido, apresentamos nossas condições comerciais para fornecimento de serviços e mão de obra para seu compressor{modelo_text}.
-
-A Word Comp Compressores é especializada em manutenção de compressores de parafuso das principais marcas do mercado, como Atlas Copco, Ingersoll Rand, Chicago. Atuamos também com revisão de equipamentos e unidades compressoras, venda de peças, bem como venda e locação de compressores de parafuso isento de óleo e lubrificados
-
-Com profissionais altamente qualificados e atendimento especializado, colocamo-nos à disposição para analisar, corrigir e prestar os devidos esclarecimentos, sempre buscando atender às especificações e necessidades dos nossos clientes.
-
-Atenciosamente,
-            """)
-        if texto_apresentacao:
+            par = clean_text(APRESENTACAO_PADRAO[1].format(modelo=modelo_text))
+            alvo_modelo = f"compressor{modelo_text}"
+            if (modelo_compressor or '').strip() and alvo_modelo in par:
+                # Negritar apenas o modelo dentro do 2º parágrafo
+                antes, _, resto = par.partition(alvo_modelo)
+                pdf.set_font("Arial", '', 11)
+                pdf.write(5, clean_text(antes + "compressor"))
+                pdf.set_font("Arial", 'B', 11)
+                pdf.write(5, clean_text(modelo_text))
+                pdf.set_font("Arial", '', 11)
+                pdf.write(5, clean_text(resto))
+            else:
+                pdf.multi_cell(0, 5, clean_text(par))
             # Serviços/Produtos: inserir 4 linhas extras após o segundo parágrafo
-            partes = texto_apresentacao.split("\n\n")
-            for idx, par in enumerate(partes):
-                if idx == 1 and (modelo_compressor or '').strip():
-                    # Negritar apenas o modelo dentro do 2º parágrafo
-                    modelo_text = f" {modelo_compressor}"
-                    alvo_modelo = f"compressor{modelo_text}"
-                    if alvo_modelo in par:
-                        antes, _, resto = par.partition(alvo_modelo)
-                        pdf.set_font("Arial", '', 11)
-                        pdf.write(5, clean_text(antes + "compressor"))
-                        pdf.set_font("Arial", 'B', 11)
-                        pdf.write(5, clean_text(modelo_text))
-                        pdf.set_font("Arial", '', 11)
-                        pdf.write(5, clean_text(resto))
-                    else:
-                        pdf.multi_cell(0, 5, clean_text(par))
-                else:
-                    pdf.multi_cell(0, 5, clean_text(par))
-                pdf.ln(5)
-                if idx == 1:
-                    pdf.ln(20)
+            pdf.ln(5)
+            pdf.ln(20)
+            fragmento(pdf, "apresentacao", _desenhar_paragrafos, APRESENTACAO_PADRAO[2:]).reproduzir(pdf)
         
         # Assinatura na parte inferior da página 2
         pdf.set_y(240)  # Posiciona mais baixo para garantir que fique na página 2
@@ -677,78 +704,9 @@ Atenciosamente,
         pdf.add_page()
         pdf.set_y(45)
         if (tipo_cotacao or '').lower() == 'locação' or (tipo_cotacao or '').lower() == 'locacao':
-            # Locação: usar textos específicos fornecidos
-            secoes_loc = [
-                ("SOBRE A WORLD COMP", clean_text(
-"A World Comp Compressores e uma empresa com mais de uma decada de atuacao no\n"
-"mercado nacional, especializada na manutencao de compressores de ar do tipo parafuso. Seu\n"
-"atendimento abrange todo o territorio brasileiro, oferecendo solucoes tecnicas e comerciais voltadas a\n"
-"maximizacao do desempenho e da confiabilidade dos sistemas de ar comprimido utilizados por seus\n"
-"clientes.\n"
-                )),
-                ("NOSSOS SERVICOS", clean_text(
-"A empresa oferece um portfolio completo de servicos, que contempla a manutencao\n"
-"preventiva e corretiva de compressores e unidades compressoras, a venda de pecas de reposicao\n"
-"para diversas marcas, a locacao de compressores de parafuso — incluindo modelos lubrificados e\n"
-"isentos de oleo —, alem da recuperacao de unidades compressoras e trocadores de calor.\n"
-"A World Comp tambem disponibiliza contratos de manutencao personalizados, adaptados as\n"
-"necessidades operacionais especificas de cada cliente. Dentre os principais fabricantes atendidos,\n"
-"destacam-se marcas reconhecidas como Atlas Copco, Ingersoll Rand e Chicago Pneumatic.\n"
-                )),
-                ("QUALIDADE DOS SERVICOS & MELHORIA CONTINUA", clean_text(
-"A empresa investe continuamente na capacitacao de sua equipe, na modernizacao de\n"
-"processos e no aprimoramento da estrutura de atendimento, assegurando alto padrao de qualidade,\n"
-"agilidade e eficacia nos servicos. Mantem ainda uma politica ativa de melhoria continua, com\n"
-"avaliacoes periodicas que visam atualizar tecnologias, aperfeicoar metodos e garantir excelencia\n"
-"tecnica.\n"
-                )),
-                ("CONTE CONOSCO PARA UMA PARCERIA!", clean_text(
-"Nossa missao e ser sua melhor parceria com sinonimo de qualidade, garantia e o melhor\n"
-"custo beneficio.\n"
-                ))
-            ]
-            for titulo, texto in secoes_loc:
-                pdf.set_text_color(*pdf.baby_blue)
-                pdf.set_font("Arial", 'B', 12)
-                pdf.cell(0, 8, titulo, 0, 1, 'L')
-                pdf.set_text_color(0, 0, 0)
-                pdf.set_font("Arial", '', 11)
-                pdf.multi_cell(0, 5, replace_company_names(texto, dados_filial.get('nome')))
-                pdf.ln(3)
-            pdf.ln(7)
+            fragmento(pdf, "sobre_locacao", _desenhar_sobre_locacao, dados_filial.get('nome')).reproduzir(pdf)
         else:
-            # Cotação (padrão): manter conteúdo original
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(0, 8, clean_text("SOBRE A WORLD COMP"), 0, 1, 'L')
-            pdf.set_font("Arial", '', 11)
-            sobre_empresa = clean_text("Há mais de uma década no mercado de manutenção de compressores de ar de parafuso, de diversas marcas, atendemos clientes em todo território brasileiro.")
-            pdf.multi_cell(0, 5, sobre_empresa)
-            pdf.ln(5)
-            secoes = [
-                ("FORNECIMENTO, SERVIÇO E LOCAÇÃO", """
-A World Comp oferece os serviços de Manutenção Preventiva e Corretiva em Compressores e Unidades Compressoras, Venda de peças, Locação de compressores, Recuperação de Unidades Compressoras, Recuperação de Trocadores de Calor e Contrato de Manutenção em compressores de marcas como: Atlas Copco, Ingersoll Rand, Chicago Pneumatic entre outros.
-                """),
-                ("CONTE CONOSCO PARA UMA PARCERIA", """
-Adaptamos nossa oferta para suas necessidades, objetivos e planejamento. Trabalhamos para que seu processo seja eficiente.
-                """),
-                ("MELHORIA CONTÍNUA", """
-Continuamente investindo em comprometimento, competência e eficiência de nossos serviços, produtos e estrutura para garantirmos a máxima eficiência de sua produtividade.
-                """),
-                ("QUALIDADE DE SERVIÇOS", """
-Com uma equipe de técnicos altamente qualificados e constantemente treinados para atendimentos em todos os modelos de compressores de ar, a World Comp oferece garantia de excelente atendimento e produtividade superior com rapidez e eficácia.
-                """)
-            ]
-            for titulo, texto in secoes:
-                pdf.set_text_color(*pdf.baby_blue)
-                pdf.set_font("Arial", 'B', 12)
-                pdf.cell(0, 8, clean_text(titulo), 0, 1, 'L')
-                pdf.set_text_color(0, 0, 0)
-                pdf.set_font("Arial", '', 11)
-                pdf.multi_cell(0, 5, clean_text(texto))
-                pdf.ln(3)
-            texto_final = clean_text("Nossa missão é ser sua melhor parceria com sinônimo de qualidade, garantia e o melhor custo benefício.")
-            pdf.multi_cell(0, 5, texto_final)
-            pdf.ln(10)
+            fragmento(pdf, "sobre_padrao", _desenhar_sobre_padrao).reproduzir(pdf)
         
         # =====================================================
         # PÁGINA 4: ESBOÇO DO SERVIÇO A SER EXECUTADO (COMPRA)
@@ -820,10 +778,10 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
             pdf.multi_cell(0, 6, clean_text(equipamento_nome))
             pdf.ln(3)
             # Debug: verificar parâmetros recebidos
-            print(f"DEBUG PDF - Tipo cotação: {tipo_cotacao}")
-            print(f"DEBUG PDF - Texto: {locacao_pagina4_text}")
-            print(f"DEBUG PDF - Imagem: {locacao_pagina4_image}")
-            print(f"DEBUG PDF - Imagem existe: {locacao_pagina4_image and os.path.exists(locacao_pagina4_image) if locacao_pagina4_image else False}")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Página 4 - tipo: %s, texto: %r, imagem: %s (existe: %s)",
+                          tipo_cotacao, locacao_pagina4_text, locacao_pagina4_image,
+                          bool(locacao_pagina4_image) and os.path.exists(locacao_pagina4_image))
             # Imagem dinâmica (se fornecida) ou fallback do banco de dados
             imagem_pagina4 = None
             if locacao_pagina4_image and os.path.exists(locacao_pagina4_image):
@@ -1446,6 +1404,8 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
                 pdf.set_font("Arial", '', 11)
                 item_counter = 1
                 valor_total_pdf_soma = 0
+                # Checado uma vez: com DEBUG desligado o laço não formata nada
+                debug_itens = log.isEnabledFor(logging.DEBUG)
                 
                 for item in itens_cotacao:
                     (item_id, item_tipo, item_nome, quantidade, descricao, 
@@ -1453,15 +1413,10 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
                      mao_obra, deslocamento, estadia, produto_id, tipo_operacao, icms, iss) = item
                     
                     # DEBUG: Verificar valores vindos do banco
-                    print(f"DEBUG Item {item_counter}:")
-                    print(f"  - ID: {item_id}")
-                    print(f"  - Tipo: {item_tipo}")
-                    print(f"  - Nome: {item_nome}")
-                    print(f"  - Quantidade: {quantidade}")
-                    print(f"  - Descrição: '{descricao}'")
-                    print(f"  - Valor Unitário: {valor_unitario}")
-                    print(f"  - Valor Total: {valor_total_item}")
-                    print(f"  - Produto ID: {produto_id}")
+                    if debug_itens:
+                        log.debug("Item %s: id=%s tipo=%s nome=%r qtd=%s descricao=%r unitario=%s total=%s produto_id=%s",
+                                  item_counter, item_id, item_tipo, item_nome, quantidade, descricao,
+                                  valor_unitario, valor_total_item, produto_id)
                     
                     # Obter ICMS e ISS diretamente do item
                     icms_value = float(icms or 0)
@@ -1470,7 +1425,8 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
                     # GARANTIR que descrição não seja vazia ou None
                     if not descricao or str(descricao).strip() == '' or str(descricao).lower() in ['none', 'null']:
                         descricao = item_nome if item_nome else "Descrição não informada"
-                        print(f"  - Descrição corrigida para: '{descricao}'")
+                        if debug_itens:
+                            log.debug("Item %s: descrição corrigida para %r", item_counter, descricao)
 
                     # TRATAMENTO ESPECIAL PARA KITS E SERVIÇOS (como modelo antigo)
                     descricao_final = descricao
@@ -1483,8 +1439,11 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
                     
                     if item_tipo == "Kit" and produto_id:
                         # Obter composição do kit
-                        composicao = PDFCotacao.obter_composicao_kit(produto_id)
-                        descricao_final = f"{prefixo}Kit: {item_nome}\nComposição:\n"  "\n".join(composicao)
+                        if composicoes_kits is not None:
+                            composicao = [f"{quantidade} x {nome}" for nome, quantidade in composicoes_kits.get(produto_id, ())]
+                        else:
+                            composicao = PDFCotacao.obter_composicao_kit(produto_id, db_name)
+                        descricao_final = f"{prefixo}Kit: {item_nome}\nComposição:\n" + "\n".join(composicao)
                     
                     elif item_tipo == "Serviço":
                         descricao_final = f"{prefixo}Serviço: {item_nome}"
@@ -1658,7 +1617,7 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
             output_dir = os.path.join("data", "cotacoes", "arquivos")
             file_name = f"Proposta_{numero_proposta.replace('/', '_').replace(' ', '')}.pdf"
             
-            sucesso, pdf_path = save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn)
+            sucesso, pdf_path = save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn, fingerprint)
             if sucesso:
                 return True, pdf_path
             else:
@@ -1669,7 +1628,7 @@ Com uma equipe de técnicos altamente qualificados e constantemente treinados pa
             output_dir = os.path.join("data", "cotacoes", "arquivos")
             file_name = f"Proposta_{numero_proposta.replace('/', '_').replace(' ', '')}.pdf"
             
-            sucesso, pdf_path = save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn)
+            sucesso, pdf_path = save_pdf_with_fallback(pdf, output_dir, file_name, cot_id, conn, fingerprint)
             if sucesso:
                 return True, pdf_path
             else:
@@ -0,0 +1,193 @@
+"""
+Impressão digital da renderização de uma cotação.
+
+O PDF de uma cotação depende da linha da cotação, dos itens (e composição
+dos kits), do cliente e do contato, do responsável e sua configuração de
+cotação, da filial, das imagens referenciadas, dos arquivos de template e
+do próprio gerador. ``fingerprint_cotacao`` resume tudo isso num SHA-256
+que é gravado em ``cotacoes.pdf_fingerprint`` junto com
+``caminho_arquivo_pdf``. As ações de "abrir PDF" usam ``obter_pdf_cotacao``:
+se o arquivo existe e a impressão digital confere, ele é aberto direto;
+senão a cotação é renderizada de novo.
+
+Relatórios técnicos seguem a mesma ideia com ``fingerprint_relatorio``
+(relatório, cliente, eventos, anexos e seus arquivos, filial e templates),
+gravada em ``relatorios_tecnicos.pdf_fingerprint``.
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+
+from assets.filiais.filiais_config import obter_filial, obter_usuario_cotacao, obter_template_capa_jpeg
+from database import get_connection
+from utils.kits import carregar_composicoes_cotacao
+from utils.relatorio_dados import carregar_relatorio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Aumentar quando a saída do gerador mudar sem que os arquivos abaixo mudem
+GERADOR_VERSAO = 1
+
+# Arquivos que, quando alterados, tornam todos os PDFs desatualizados
+TEMPLATE_GLOBS = (
+    os.path.join("pdf_generators", "*.py"),
+    os.path.join("assets", "filiais", "*.py"),
+    os.path.join("assets", "logos", "*"),
+    os.path.join("assets", "templates", "**", "*"),
+    "cabeçalho*.jpeg",
+    "caploc.jpg",
+)
+
+# Os templates são conferidos no máximo uma vez por esse intervalo (lotes abrem muitas cotações seguidas)
+TEMPLATES_TTL_S = 2.0
+
+# Colunas da cotação que são resultado da renderização, não entrada
+_COLUNAS_SAIDA = ("caminho_arquivo_pdf", "pdf_fingerprint")
+
+
+def _arquivo(caminho):
+    """Identidade barata de um arquivo: (caminho, mtime, tamanho) ou None se não existir."""
+    if not caminho:
+        return None
+    try:
+        stat = os.stat(caminho)
+    except OSError:
+        return None
+    return [caminho, stat.st_mtime_ns, stat.st_size]
+
+
+_templates = {"instante": 0.0, "valor": None}
+
+
+def arquivos_template(base_dir=BASE_DIR):
+    """Arquivos de template existentes, em ordem."""
+    caminhos = set()
+    for pattern in TEMPLATE_GLOBS:
+        caminhos.update(p for p in glob.glob(os.path.join(base_dir, pattern), recursive=True) if os.path.isfile(p))
+    return sorted(caminhos)
+
+
+def assinatura_templates():
+    """(caminho, mtime, tamanho) de cada arquivo de template."""
+    agora = time.monotonic()
+    if _templates["valor"] is None or agora - _templates["instante"] > TEMPLATES_TTL_S:
+        _templates["valor"] = [_arquivo(p) for p in arquivos_template()]
+        _templates["instante"] = agora
+    return _templates["valor"]
+
+
+def fingerprint_cotacao(cotacao_id, conn, current_user=None, contato_nome=None,
+                        locacao_pagina4_text=None, locacao_pagina4_image=None):
+    """SHA-256 das entradas de ``gerar_pdf_cotacao_nova`` com esses argumentos (None se não existir)."""
+    c = conn.cursor()
+    c.execute("SELECT * FROM cotacoes WHERE id = ?", (cotacao_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    cotacao = {col[0]: valor for col, valor in zip(c.description, row) if col[0] not in _COLUNAS_SAIDA}
+
+    c.execute("SELECT * FROM itens_cotacao WHERE cotacao_id = ? ORDER BY id", (cotacao_id,))
+    itens = c.fetchall()
+    colunas_itens = [col[0] for col in c.description]
+    c.execute("SELECT * FROM clientes WHERE id = ?", (cotacao.get("cliente_id"),))
+    cliente = c.fetchone()
+    c.execute("SELECT nome_completo, email, telefone, username FROM usuarios WHERE id = ?",
+              (cotacao.get("responsavel_id"),))
+    usuario = c.fetchone()
+    if not contato_nome:
+        # Mesmo contato que o gerador escolhe quando nenhum é informado
+        c.execute("SELECT nome FROM contatos WHERE cliente_id = ? LIMIT 1", (cotacao.get("cliente_id"),))
+        contato = c.fetchone()
+        contato_nome = ["padrão", contato[0] if contato else None]
+    username = usuario[3] if usuario else None
+
+    imagens = {cotacao.get("locacao_imagem_path"), locacao_pagina4_image}
+    if "locacao_imagem_path" in colunas_itens:
+        indice = colunas_itens.index("locacao_imagem_path")
+        imagens.update(item[indice] for item in itens)
+    entradas = {
+        "versao": GERADOR_VERSAO,
+        "cotacao": cotacao,
+        "itens": itens,
+        "kits": sorted(carregar_composicoes_cotacao(cotacao_id, conn=conn).items()),
+        "cliente": cliente,
+        "usuario": usuario,
+        "usuario_cotacao": obter_usuario_cotacao(username) if username else None,
+        "filial": obter_filial(cotacao.get("filial_id") or 2),
+        "parametros": [current_user, contato_nome, locacao_pagina4_text],
+        "imagens": sorted((_arquivo(p) for p in imagens if p), key=str),
+        "capa_usuario": _arquivo(obter_template_capa_jpeg(username)) if username else None,
+        "templates": assinatura_templates(),
+    }
+    dados = json.dumps(entradas, default=str, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()
+
+
+def pdf_em_dia(cotacao_id, conn, current_user=None, contato_nome=None,
+               locacao_pagina4_text=None, locacao_pagina4_image=None):
+    """Caminho do PDF gravado se ele existe e foi gerado com as entradas atuais; senão None."""
+    fingerprint = fingerprint_cotacao(cotacao_id, conn, current_user, contato_nome,
+                                      locacao_pagina4_text, locacao_pagina4_image)
+    c = conn.cursor()
+    c.execute("SELECT caminho_arquivo_pdf, pdf_fingerprint FROM cotacoes WHERE id = ?", (cotacao_id,))
+    row = c.fetchone()
+    if fingerprint and row and row[1] == fingerprint and row[0] and os.path.isfile(row[0]):
+        return row[0]
+    return None
+
+
+def fingerprint_relatorio(relatorio_id, conn, relatorio=None):
+    """SHA-256 das entradas de ``gerar_pdf_relatorio`` (None se o relatório não existir).
+
+    ``relatorio`` aproveita o resultado de ``carregar_relatorio`` já lido pelo gerador.
+    """
+    if relatorio is None:
+        relatorio = carregar_relatorio(relatorio_id, conn=conn)
+    if relatorio is None:
+        return None
+    dados = {k: v for k, v in relatorio.items() if k not in _COLUNAS_SAIDA}
+    anexos = [
+        [aba, anexo.get("hash"), _arquivo(anexo.get("caminho"))]
+        for aba, lista in sorted(relatorio["anexos"].items()) for anexo in lista
+    ]
+    entradas = {
+        "versao": GERADOR_VERSAO,
+        "relatorio": dados,
+        "arquivos_anexos": anexos,
+        "filial": obter_filial(int(relatorio.get("filial_id") or 2)),
+        "templates": assinatura_templates(),
+    }
+    dados = json.dumps(entradas, default=str, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()
+
+
+def relatorio_em_dia(relatorio_id, conn, caminho):
+    """True se o PDF ``caminho`` existe e foi gerado com as entradas atuais do relatório."""
+    if not caminho or not os.path.isfile(caminho):
+        return False
+    c = conn.cursor()
+    c.execute("SELECT pdf_fingerprint FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
+    row = c.fetchone()
+    return bool(row and row[0]) and row[0] == fingerprint_relatorio(relatorio_id, conn)
+
+
+def obter_pdf_cotacao(cotacao_id, db_name, current_user=None, contato_nome=None,
+                      locacao_pagina4_text=None, locacao_pagina4_image=None):
+    """(True, caminho) do PDF atual da cotação, renderizando só se algo relevante mudou.
+
+    Mesma assinatura e retorno de ``gerar_pdf_cotacao_nova``.
+    """
+    conn = get_connection(db_name)
+    try:
+        caminho = pdf_em_dia(cotacao_id, conn, current_user, contato_nome,
+                             locacao_pagina4_text, locacao_pagina4_image)
+    finally:
+        conn.close()
+    if caminho:
+        return True, caminho
+    from pdf_generators.cotacao_nova import gerar_pdf_cotacao_nova
+    return gerar_pdf_cotacao_nova(cotacao_id, db_name, current_user, contato_nome=contato_nome,
+                                  locacao_pagina4_text=locacao_pagina4_text,
+                                  locacao_pagina4_image=locacao_pagina4_image)
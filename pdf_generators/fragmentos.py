@@ -0,0 +1,126 @@
+"""
+Blocos estáticos das cotações, diagramados uma vez e reaproveitados.
+
+As páginas 2 e 3 de uma cotação têm textos fixos por filial e tipo
+("SOBRE A WORLD COMP", seções de fornecimento/serviço/locação, parágrafos
+da apresentação). Em vez de limpar, substituir o nome da empresa e quebrar
+esses textos em linhas com ``multi_cell`` a cada PDF, o bloco é desenhado
+uma vez num ``Gravador`` e guardado como uma lista de chamadas simples
+(fonte, cor, ``cell`` por linha, ``ln``). ``fragmento`` devolve o bloco do
+cache pela chave (nome, parâmetros, versão do gerador, geometria da página)
+e ``Fragmento.reproduzir`` repete as chamadas no documento novo.
+
+O bloco deve começar na margem esquerda; a saída é a mesma do ``multi_cell``.
+O ``cell`` do fpdf2 não justifica, então as linhas justificadas são
+desenhadas pelo mesmo renderizador de linha que o ``multi_cell`` usa; se
+ele não existir na versão instalada, o bloco grava o próprio ``multi_cell``.
+"""
+import threading
+
+from fpdf import FPDF
+from fpdf.enums import Align, MethodReturnValue, XPos, YPos
+from fpdf.line_break import TextLine
+
+from pdf_generators.fingerprint import GERADOR_VERSAO
+
+_cache = {}
+_lock = threading.Lock()
+
+_JUSTIFICA = hasattr(FPDF, "_render_styled_text_line") and hasattr(FPDF, "_preload_font_styles")
+
+
+def _linha_justificada(pdf, w, h, linha):
+    """Linha justificada na largura ``w``, como o ``multi_cell`` desenha as que não fecham parágrafo."""
+    fragmentos = pdf._preload_font_styles(pdf.normalize_text(linha), False)
+    pdf._render_styled_text_line(
+        TextLine(fragmentos, text_width=0, number_of_spaces=linha.count(" "), align=Align.J,
+                 height=h, max_width=w, trailing_nl=False),
+        h, 0, new_x=XPos.LEFT, new_y=YPos.NEXT,
+    )
+
+
+class Fragmento:
+    """Sequência de chamadas (método, args, kwargs) a repetir num FPDF."""
+
+    def __init__(self, operacoes):
+        self.operacoes = tuple(operacoes)
+
+    def reproduzir(self, pdf):
+        for metodo, args, kwargs in self.operacoes:
+            if callable(metodo):
+                metodo(pdf, *args, **kwargs)
+            else:
+                getattr(pdf, metodo)(*args, **kwargs)
+
+
+class Gravador:
+    """Imita a parte do FPDF usada nos blocos estáticos e grava as chamadas.
+
+    As quebras de linha do ``multi_cell`` são medidas num documento de
+    rascunho com a mesma geometria do PDF de destino.
+    """
+
+    def __init__(self, pdf):
+        self._rascunho = FPDF(unit=pdf.k, format=(pdf.w, pdf.h))
+        self._rascunho.core_fonts_encoding = pdf.core_fonts_encoding
+        self._rascunho.set_margins(pdf.l_margin, pdf.t_margin, pdf.r_margin)
+        self._rascunho.set_auto_page_break(False)
+        self._rascunho.add_page()
+        self.baby_blue = getattr(pdf, "baby_blue", None)
+        self.operacoes = []
+
+    def _gravar(self, metodo, *args, **kwargs):
+        self.operacoes.append((metodo, args, kwargs))
+
+    def set_font(self, *args, **kwargs):
+        self._rascunho.set_font(*args, **kwargs)
+        self._gravar("set_font", *args, **kwargs)
+
+    def set_text_color(self, *args):
+        self._gravar("set_text_color", *args)
+
+    def cell(self, *args, **kwargs):
+        self._gravar("cell", *args, **kwargs)
+
+    def ln(self, *args):
+        self._gravar("ln", *args)
+
+    def multi_cell(self, w, h, text, align=Align.J):
+        """Grava um ``cell`` por linha; só linhas que não fecham parágrafo são justificadas."""
+        justificar = Align.coerce(align) == Align.J
+        if justificar and not _JUSTIFICA:
+            self._gravar("multi_cell", w, h, text, align=align)
+            return
+        largura = w or self._rascunho.w - self._rascunho.r_margin - self._rascunho.l_margin
+        linhas = []
+        for paragrafo in text.split("\n"):
+            quebras = self._rascunho.multi_cell(w, h, paragrafo, align=align, dry_run=True,
+                                                output=MethodReturnValue.LINES)
+            linhas.extend((linha, indice < len(quebras) - 1) for indice, linha in enumerate(quebras))
+        for indice, (linha, justificada) in enumerate(linhas):
+            if justificar and justificada:
+                self._gravar(_linha_justificada, largura, h, linha)
+            else:
+                # Depois do "\n" final o multi_cell desce uma linha vazia sem mover o x
+                ultima = indice == len(linhas) - 1 and not text.endswith("\n")
+                self._gravar("cell", w, h, linha, align=Align.L if justificar else align,
+                             new_x=XPos.RIGHT if ultima else XPos.LEFT, new_y=YPos.NEXT)
+
+
+def fragmento(pdf, nome, desenhar, *parametros):
+    """Bloco ``nome`` para ``parametros``, desenhado por ``desenhar(gravador, *parametros)`` na primeira vez."""
+    chave = (nome, parametros, GERADOR_VERSAO, pdf.k, pdf.w, pdf.l_margin, pdf.r_margin)
+    with _lock:
+        bloco = _cache.get(chave)
+    if bloco is None:
+        gravador = Gravador(pdf)
+        desenhar(gravador, *parametros)
+        bloco = Fragmento(gravador.operacoes)
+        with _lock:
+            bloco = _cache.setdefault(chave, bloco)
+    return bloco
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,278 @@
+"""
+Cache de imagens dos PDFs: assets fixos (cabeçalhos, capa de locação e
+logos) e fotos anexadas aos relatórios técnicos.
+
+Os caminhos encontrados são resolvidos uma única vez por processo e cada
+imagem é preparada para o tamanho em que é desenhada: reduzida para a
+resolução de impressão (DPI_PADRAO) e convertida para RGB quando necessário. O arquivo
+derivado fica em disco (CACHE_DIR), então é reaproveitado por todos os
+documentos do processo e pelos workers da geração em lote.
+
+Fotos de anexos passam por ``preparar_anexo``: orientação EXIF aplicada,
+reamostragem para o tamanho impresso e recompressão JPEG. Os derivados são
+indexados pelo hash do conteúdo, então regerar o mesmo relatório (ou outro
+que use a mesma foto) não reprocessa a imagem.
+
+A pasta de derivados é limitada por ``limpar_derivados`` (idade desde o
+último uso e tamanho total), chamada pela limpeza periódica da interface e
+ao fim de cada lote.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "crm_pdf_assets")
+DPI_PADRAO = 200
+QUALIDADE_JPEG = 90
+ANEXOS_DIR = os.path.join(CACHE_DIR, "anexos")
+QUALIDADE_ANEXOS = 80
+# Derivados sem uso há mais que isso são apagados; acima do tamanho total, os mais antigos
+IDADE_MAX_DERIVADOS_S = 30 * 24 * 60 * 60
+TAMANHO_MAX_DERIVADOS = 512 * 1024 * 1024
+
+# Nome lógico -> candidatos em ordem de preferência (relativos à pasta do sistema)
+ASSETS = {
+    "cabecalho_filial_1": ("cabeçalho.jpeg", "cabecalho.jpeg"),
+    # Sem a imagem própria da filial 2, usa o cabeçalho padrão
+    "cabecalho_filial_2": ("cabeçalho2.jpeg", "cabecalho2.jpeg", "cabeçalho.jpeg", "cabecalho.jpeg"),
+    "capa_locacao": ("caploc.jpg",),
+    "logo_world_comp": (os.path.join("assets", "logos", "world_comp_brasil.jpg"),),
+}
+
+
+class ImageAsset:
+    """Imagem pronta para ``FPDF.image``: caminho do derivado e tamanho em pixels."""
+
+    __slots__ = ("path", "width_px", "height_px")
+
+    def __init__(self, path, width_px, height_px):
+        self.path = path
+        self.width_px = width_px
+        self.height_px = height_px
+
+    @property
+    def aspect(self):
+        """Altura / largura, para calcular a altura em mm a partir da largura."""
+        return self.height_px / self.width_px if self.width_px else 1.0
+
+
+_lock = threading.Lock()
+_resolvidos = {}
+_preparados = {}
+_stats = {"hits": 0, "misses": 0}
+_hashes = {}
+_stats_anexos = {"hits": 0, "misses": 0}
+
+
+def resolver(nome):
+    """Caminho absoluto do primeiro candidato existente do asset (ou None).
+
+    Só os caminhos encontrados ficam em cache: um asset ausente é procurado de
+    novo na próxima chamada, então copiar o arquivo depois vale sem reiniciar.
+    """
+    caminho = _resolvidos.get(nome)
+    if caminho is not None:
+        return caminho
+    for candidato in ASSETS.get(nome, (nome,)):
+        path = candidato if os.path.isabs(candidato) else os.path.join(BASE_DIR, candidato)
+        if os.path.isfile(path):
+            _resolvidos[nome] = path
+            return path
+    return None
+
+
+def _marcar_uso(caminho):
+    """Atualiza o mtime do derivado reaproveitado (a limpeza apaga os sem uso)."""
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+
+
+def _preparar(origem, largura_mm, altura_mm, dpi):
+    """Gera (ou reaproveita) o derivado reduzido/RGB da imagem de origem."""
+    with Image.open(origem) as img:
+        largura_px = max(1, round(largura_mm / 25.4 * dpi))
+        altura_px = max(1, round(altura_mm / 25.4 * dpi)) if altura_mm else None
+        precisa_reduzir = img.width > largura_px or (altura_px is not None and img.height > altura_px)
+        precisa_converter = img.mode not in ("RGB", "L") or img.format != "JPEG"
+        if not precisa_reduzir and not precisa_converter:
+            return ImageAsset(origem, img.width, img.height)
+
+        stat = os.stat(origem)
+        chave = f"{origem}|{stat.st_mtime_ns}|{stat.st_size}|{largura_px}|{altura_px}"
+        destino = os.path.join(CACHE_DIR, hashlib.sha1(chave.encode("utf-8")).hexdigest() + ".jpg")
+        if os.path.isfile(destino):
+            _marcar_uso(destino)
+            with Image.open(destino) as pronto:
+                return ImageAsset(destino, pronto.width, pronto.height)
+
+        derivado = img.convert("RGB") if img.mode not in ("RGB", "L") else img.copy()
+        if precisa_reduzir:
+            limite = (largura_px, altura_px or derivado.height)
+            derivado.thumbnail(limite, Image.LANCZOS)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Grava em arquivo temporário e renomeia: workers em paralelo não leem arquivo pela metade
+        fd, temporario = tempfile.mkstemp(suffix=".jpg", dir=CACHE_DIR)
+        os.close(fd)
+        derivado.save(temporario, "JPEG", quality=QUALIDADE_JPEG, dpi=(dpi, dpi))
+        os.replace(temporario, destino)
+        return ImageAsset(destino, derivado.width, derivado.height)
+
+
+def obter_imagem(nome, largura_mm, altura_mm=None, dpi=DPI_PADRAO):
+    """ImageAsset do asset ``nome`` para desenho com a largura (e altura) dada em mm.
+
+    Retorna None se o arquivo não existir ou não puder ser lido.
+    """
+    chave = (nome, largura_mm, altura_mm, dpi)
+    with _lock:
+        asset = _preparados.get(chave)
+        if asset is not None:
+            _stats["hits"] += 1
+            return asset
+        _stats["misses"] += 1
+    # Decodificação e redução fora do lock: outras threads seguem usando o cache
+    origem = resolver(nome)
+    if not origem:
+        return None
+    try:
+        asset = _preparar(origem, largura_mm, altura_mm, dpi)
+    except Exception as e:
+        # Sem o derivado, desenha a imagem original
+        log.warning("Não foi possível preparar a imagem '%s': %s", nome, e)
+        try:
+            with Image.open(origem) as img:
+                asset = ImageAsset(origem, img.width, img.height)
+        except Exception:
+            return None
+    with _lock:
+        # Duas threads podem ter preparado a mesma imagem: fica a primeira
+        return _preparados.setdefault(chave, asset)
+
+
+def _hash_conteudo(caminho):
+    """SHA-1 do arquivo, memorizado por (caminho, mtime, tamanho)."""
+    stat = os.stat(caminho)
+    chave = (os.path.abspath(caminho), stat.st_mtime_ns, stat.st_size)
+    digest = _hashes.get(chave)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloco)
+        digest = _hashes[chave] = h.hexdigest()
+    return digest
+
+
+def _achatar(img):
+    """Converte para RGB/L, compondo transparência sobre fundo branco."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        fundo = Image.new("RGB", rgba.size, (255, 255, 255))
+        fundo.paste(rgba, mask=rgba.getchannel("A"))
+        return fundo
+    if img.mode not in ("RGB", "L"):
+        return img.convert("RGB")
+    return img
+
+
+def preparar_anexo(caminho, largura_mm, altura_mm, dpi=DPI_PADRAO, qualidade=QUALIDADE_ANEXOS):
+    """ImageAsset de uma foto anexada, cabendo em largura_mm x altura_mm.
+
+    A imagem é girada conforme o EXIF, reduzida para ``dpi`` no tamanho
+    máximo de impressão e regravada como JPEG com ``qualidade``. Imagens
+    JPEG que já cabem e não precisam de rotação são usadas como estão.
+    """
+    limite = (max(1, round(largura_mm / 25.4 * dpi)), max(1, round(altura_mm / 25.4 * dpi)))
+    digest = _hash_conteudo(caminho)
+    destino = os.path.join(ANEXOS_DIR, f"{digest}_{limite[0]}x{limite[1]}_q{qualidade}.jpg")
+    if os.path.isfile(destino):
+        _marcar_uso(destino)
+        with Image.open(destino) as pronto:
+            with _lock:
+                _stats_anexos["hits"] += 1
+            return ImageAsset(destino, pronto.width, pronto.height)
+
+    with Image.open(caminho) as img:
+        orientacao = img.getexif().get(0x0112, 1)
+        cabe = img.width <= limite[0] and img.height <= limite[1]
+        if cabe and orientacao == 1 and img.format == "JPEG" and img.mode in ("RGB", "L"):
+            return ImageAsset(caminho, img.width, img.height)
+
+        # JPEG: decodifica já reduzido (bem mais rápido em fotos grandes); o lado
+        # maior cobre os dois sentidos porque a rotação EXIF vem depois
+        lado = max(limite)
+        img.draft("RGB", (lado, lado))
+        derivado = _achatar(ImageOps.exif_transpose(img))
+        derivado.thumbnail(limite, Image.LANCZOS)
+
+    os.makedirs(ANEXOS_DIR, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(suffix=".jpg", dir=ANEXOS_DIR)
+    os.close(fd)
+    derivado.save(temporario, "JPEG", quality=qualidade, optimize=True, dpi=(dpi, dpi))
+    os.replace(temporario, destino)
+    with _lock:
+        _stats_anexos["misses"] += 1
+    return ImageAsset(destino, derivado.width, derivado.height)
+
+
+def limpar_derivados(idade_max_s=IDADE_MAX_DERIVADOS_S, tamanho_max=TAMANHO_MAX_DERIVADOS):
+    """Remove derivados antigos da pasta de cache; retorna (arquivos, bytes) removidos.
+
+    Saem os sem uso há mais de ``idade_max_s`` e, enquanto a pasta passar de
+    ``tamanho_max`` bytes, os usados há mais tempo.
+    """
+    arquivos = []
+    for pasta, _subpastas, nomes in os.walk(CACHE_DIR):
+        for nome in nomes:
+            caminho = os.path.join(pasta, nome)
+            try:
+                stat = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((stat.st_mtime, stat.st_size, caminho))
+    arquivos.sort()
+    limite = time.time() - idade_max_s
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    removidos = set()
+    liberados = 0
+    for mtime, tamanho, caminho in arquivos:
+        if mtime >= limite and total <= tamanho_max:
+            break  # Em ordem de uso: os restantes são mais recentes
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue
+        removidos.add(caminho)
+        total -= tamanho
+        liberados += tamanho
+    if removidos:
+        with _lock:
+            for chave in [chave for chave, asset in _preparados.items() if asset.path in removidos]:
+                del _preparados[chave]
+        log.info("Cache de imagens: %d derivado(s) removido(s), %d bytes", len(removidos), liberados)
+    return len(removidos), liberados
+
+
+def estatisticas():
+    """Acertos e falhas do cache desde o início do processo."""
+    with _lock:
+        return dict(_stats, preparados=len(_preparados), anexos=dict(_stats_anexos))
+
+
+def limpar_cache():
+    """Descarta as resoluções em memória (ex.: após trocar um asset em disco)."""
+    with _lock:
+        _resolvidos.clear()
+        _preparados.clear()
+        _hashes.clear()
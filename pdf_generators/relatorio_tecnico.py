@@ -2,66 +2,22 @@ import sqlite3
 import os
 from fpdf import FPDF
 from datetime import datetime
-import json
+from database import get_connection
 from utils.formatters import format_date, format_cnpj, format_phone
 from PIL import Image
 import tempfile
 from assets.filiais.filiais_config import obter_filial
+from pdf_generators.fingerprint import fingerprint_relatorio
+from pdf_generators.image_assets import ImageAsset, obter_imagem, preparar_anexo
+from pdf_generators.texto import ASCII, ASCII_SEM_ACENTOS, limpar_texto
+from utils.relatorio_dados import carregar_relatorio
+from utils.logs import get_logger
+
+log = get_logger(__name__)
 
 def clean_text(text, aggressive=False):
     """Substitui tabs por espaços e remove caracteres problemáticos"""
-    if text is None:
-        return ""
-    
-    # Converter para string se não for
-    text = str(text)
-    
-    # Substituir tabs por espaços
-    text = text.replace('\t', '    ')
-    
-    # Remover ou substituir caracteres problemáticos
-    replacements = {
-        '"': '"',  # Smart quotes
-        '"': '"',
-        '’': "'",
-        '‘': "'",
-        '…': '...',
-        '–': '-',
-        '—': '-',
-        '°': 'o',
-        '®': '(R)',
-        '©': '(C)',
-        '™': '(TM)',
-        'ª': 'a',
-        'º': 'o',
-        'ç': 'c',
-        'Ç': 'C'
-    }
-    
-    for old_char, new_char in replacements.items():
-        text = text.replace(old_char, new_char)
-    
-    # Se aggressive=True, remover todos os acentos também
-    if aggressive:
-        accents = {
-            'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a', 'ä': 'a',
-            'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
-            'í': 'i', 'ì': 'i', 'î': 'i', 'ï': 'i',
-            'ó': 'o', 'ò': 'o', 'õ': 'o', 'ô': 'o', 'ö': 'o',
-            'ú': 'u', 'ù': 'u', 'û': 'u', 'ü': 'u',
-            'Á': 'A', 'À': 'A', 'Ã': 'A', 'Â': 'A', 'Ä': 'A',
-            'É': 'E', 'È': 'E', 'Ê': 'E', 'Ë': 'E',
-            'Í': 'I', 'Ì': 'I', 'Î': 'I', 'Ï': 'I',
-            'Ó': 'O', 'Ò': 'O', 'Õ': 'O', 'Ô': 'O', 'Ö': 'O',
-            'Ú': 'U', 'Ù': 'U', 'Û': 'U', 'Ü': 'U'
-        }
-        for old_char, new_char in accents.items():
-            text = text.replace(old_char, new_char)
-    
-    # Remover caracteres não-ASCII restantes
-    text = ''.join(char if ord(char) < 128 else '?' for char in text)
-    
-    return text
+    return limpar_texto(text, ASCII_SEM_ACENTOS if aggressive else ASCII)
 
 class RelatorioPDF(FPDF):
     def __init__(self, dados_filial=None, *args, **kwargs):
@@ -101,23 +57,18 @@ class RelatorioPDF(FPDF):
         # Adicionar logo apenas na primeira página
         if self.page_no() == 1:
             try:
-                # Preferir logo oficial em assets
-                logo_path = "assets/logos/world_comp_brasil.jpg"
-                if os.path.exists(logo_path):
-                    # Adicionar logo centralizado no topo
-                    with Image.open(logo_path) as img:
-                        img_width, img_height = img.size
-                        # Redimensionar para caber na largura da página
-                        max_width = 80
-                        ratio = max_width / img_width
-                        new_width = img_width * ratio
-                        new_height = img_height * ratio
-                        
-                        x_pos = (210 - new_width) / 2
-                        self.image(logo_path, x=x_pos, y=10, w=new_width, h=new_height)
-                        
-                        # Ajustar posicionamento do conteúdo após o logo
-                        self.set_y(10 + new_height + 10)
+                # Preferir logo oficial em assets (já reduzido para a largura de desenho)
+                logo = obter_imagem("logo_world_comp", 80)
+                if logo:
+                    # Adicionar logo centralizado no topo, na largura da página
+                    new_width = 80
+                    new_height = new_width * logo.aspect
+                    
+                    x_pos = (210 - new_width) / 2
+                    self.image(logo.path, x=x_pos, y=10, w=new_width, h=new_height)
+                    
+                    # Ajustar posicionamento do conteúdo após o logo
+                    self.set_y(10 + new_height + 10)
             except Exception:
                 # Se der erro, continuar sem logo
                 self.set_y(20)
@@ -246,31 +197,36 @@ class RelatorioPDF(FPDF):
             if file_ext not in supported_formats:
                 return False
             
-            # Obter dimensões da imagem
-            with Image.open(image_path) as img:
-                img_width, img_height = img.size
-                
-                # Calcular proporção para redimensionamento
-                width_ratio = max_width / img_width
-                height_ratio = max_height / img_height
-                ratio = min(width_ratio, height_ratio)
-                
-                new_width = img_width * ratio
-                new_height = img_height * ratio
-                
-                # Verificar se há espaço suficiente na página
-                if self.get_y() + new_height > 270:  # 270 é próximo ao fim da página
-                    self.add_page()
-                
-                # Adicionar imagem centralizada
-                x_pos = (210 - new_width) / 2
-                self.image(image_path, x=x_pos, y=self.get_y(), w=new_width, h=new_height)
-                self.ln(new_height + 3)
-                
-                return True
+            # Foto reduzida para o tamanho impresso (orientação EXIF já aplicada)
+            try:
+                imagem = preparar_anexo(image_path, max_width, max_height)
+            except Exception as e:
+                log.warning("Usando imagem original de %s: %s", image_path, e)
+                with Image.open(image_path) as img:
+                    imagem = ImageAsset(image_path, img.width, img.height)
+            img_width, img_height = imagem.width_px, imagem.height_px
+            
+            # Calcular proporção para redimensionamento
+            width_ratio = max_width / img_width
+            height_ratio = max_height / img_height
+            ratio = min(width_ratio, height_ratio)
+            
+            new_width = img_width * ratio
+            new_height = img_height * ratio
+            
+            # Verificar se há espaço suficiente na página
+            if self.get_y() + new_height > 270:  # 270 é próximo ao fim da página
+                self.add_page()
+            
+            # Adicionar imagem centralizada
+            x_pos = (210 - new_width) / 2
+            self.image(imagem.path, x=x_pos, y=self.get_y(), w=new_width, h=new_height)
+            self.ln(new_height + 3)
+            
+            return True
                 
         except Exception as e:
-            print(f"Erro ao adicionar imagem {image_path}: {str(e)}")
+            log.warning("Erro ao adicionar imagem %s: %s", image_path, e)
             return False
     
     def add_custom_cover(self, relatorio_data, cliente_data):
@@ -279,20 +235,15 @@ class RelatorioPDF(FPDF):
             self.add_page()
             
             # Verificar se existe logo da empresa
-            logo_path = "assets/logos/world_comp_brasil.jpg"
-            if os.path.exists(logo_path):
+            logo = obter_imagem("logo_world_comp", 120)
+            if logo:
                 # Adicionar logo centralizado no topo
-                with Image.open(logo_path) as img:
-                    img_width, img_height = img.size
-                    # Redimensionar para caber na largura da página
-                    max_width = 120
-                    ratio = max_width / img_width
-                    new_width = img_width * ratio
-                    new_height = img_height * ratio
-                    
-                    x_pos = (210 - new_width) / 2
-                    self.image(logo_path, x=x_pos, y=30, w=new_width, h=new_height)
-                    self.ln(new_height + 20)
+                new_width = 120
+                new_height = new_width * logo.aspect
+                
+                x_pos = (210 - new_width) / 2
+                self.image(logo.path, x=x_pos, y=30, w=new_width, h=new_height)
+                self.ln(new_height + 20)
             else:
                 self.ln(40)  # Espaço onde ficaria o logo
             
@@ -437,144 +388,23 @@ class RelatorioPDF(FPDF):
                 self.ln(3)
 
 def gerar_pdf_relatorio(relatorio_id, db_name):
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
+    conn = get_connection(db_name)
     
     try:
-        # Primeiro obter os nomes das colunas existentes na tabela
-        c.execute("PRAGMA table_info(relatorios_tecnicos)")
-        columns_info = c.fetchall()
-        column_names = [column[1] for column in columns_info]
-        
-        # Construir a query dinamicamente com base nas colunas existentes - EXPANDIDA PARA 4 ABAS
-        base_columns = ["r.numero_relatorio", "r.data_criacao", "c.nome", "c.cnpj", "c.endereco", "c.cidade", "c.estado", "r.filial_id"]
-        
-        # Verificar quais colunas existem na tabela para as 4 abas
-        report_columns = []
-        column_map = {
-            # Dados básicos do serviço
-            "formulario_servico": "r.formulario_servico",
-            "tipo_servico": "r.tipo_servico",
-            "descricao_servico": "r.descricao_servico",
-            "data_recebimento": "r.data_recebimento",
-            
-            # ABA 1: Condição Atual do Equipamento
-            "condicao_encontrada": "r.condicao_encontrada",
-            "placa_identificacao": "r.placa_identificacao",
-            "acoplamento": "r.acoplamento",
-            "aspectos_rotores": "r.aspectos_rotores",
-            "valvulas_acopladas": "r.valvulas_acopladas",
-            "data_recebimento_equip": "r.data_recebimento_equip",
-            
-            # ABA 2: Peritagem do Subconjunto
-            "parafusos_pinos": "r.parafusos_pinos",
-            "superficie_vedacao": "r.superficie_vedacao",
-            "engrenagens": "r.engrenagens",
-            "bico_injetor": "r.bico_injetor",
-            "rolamentos": "r.rolamentos",
-            "aspecto_oleo": "r.aspecto_oleo",
-            "data_peritagem": "r.data_peritagem",
-            
-            # ABA 3: Desmembrando Unidade Compressora
-            "interf_desmontagem": "r.interf_desmontagem",
-            "aspecto_rotores_aba3": "r.aspecto_rotores_aba3",
-            "aspecto_carcaca": "r.aspecto_carcaca",
-            "interf_mancais": "r.interf_mancais",
-            "galeria_hidraulica": "r.galeria_hidraulica",
-            "data_desmembracao": "r.data_desmembracao",
-            
-            # ABA 4: Relação de Peças e Serviços
-            "servicos_propostos": "r.servicos_propostos",
-            "pecas_recomendadas": "r.pecas_recomendadas",
-            "data_pecas": "r.data_pecas",
-            "tempo_trabalho_total": "r.tempo_trabalho_total",
-            "tempo_deslocamento_total": "r.tempo_deslocamento_total",
-            
-            # Campos adicionais
-            "condicao_inicial": "r.condicao_inicial",
-            "condicao_atual": "r.condicao_atual"
-        }
-        
-        for col_name, sql_col in column_map.items():
-            if col_name in column_names:
-                report_columns.append(sql_col)
-            else:
-                report_columns.append("NULL as " + col_name)
-        
-        # Construir a query completa
-        query = f"""
-            SELECT {', '.join(base_columns)}, {', '.join(report_columns)}
-            FROM relatorios_tecnicos r
-            JOIN clientes c ON r.cliente_id = c.id
-            WHERE r.id = ?
-        """
-        
-        c.execute(query, (relatorio_id,))
-        relatorio_data = c.fetchone()
+        # Relatório, cliente, eventos e anexos numa única consulta
+        relatorio_data = carregar_relatorio(relatorio_id, conn=conn)
         
         if not relatorio_data:
             return False, "Relatório não encontrado"
-        
-        # Criar um dicionário para acessar valores por nome
-        column_indices = {}
-        
-        # Mapear colunas base para índices
-        for i, col_name in enumerate(base_columns):
-            col_key = col_name.split('.')[-1]
-            column_indices[col_name] = i
-            column_indices[col_key] = i
-            
-        # Mapear colunas de relatório para índices
-        for i, col_full in enumerate(report_columns):
-            idx = i + len(base_columns)
-            if " as " in col_full:
-                col_name = col_full.split(" as ")[1]
-                column_indices[col_name] = idx
-            else:
-                col_name = col_full.split('.')[-1]
-                column_indices[col_full] = idx
-                column_indices[col_name] = idx
+        # Calculada antes de renderizar: descreve exatamente as entradas usadas
+        fingerprint = fingerprint_relatorio(relatorio_id, conn, relatorio_data)
         
         # Função auxiliar para acessar dados de forma segura
         def get_value(key, default=""):
-            idx = -1
-            if key in column_indices:
-                idx = column_indices[key]
-            elif f"r.{key}" in column_indices:
-                idx = column_indices[f"r.{key}"]
-            elif f"c.{key}" in column_indices:
-                idx = column_indices[f"c.{key}"]
-                
-            if idx >= 0 and idx < len(relatorio_data):
-                return relatorio_data[idx] or default
-            return default
-        
-        # Obter eventos
-        c.execute("""
-            SELECT u.nome_completo, e.data_hora, e.evento, e.tipo
-            FROM eventos_campo e
-            JOIN usuarios u ON e.tecnico_id = u.id
-            WHERE e.relatorio_id = ?
-            ORDER BY e.data_hora
-        """, (relatorio_id,))
-        eventos = c.fetchall()
-        
-        # Obter anexos das 4 abas
-        anexos_abas = {}
-        for aba_num in range(1, 5):
-            aba_col = f'anexos_aba{aba_num}'
-            if aba_col in column_names:
-                c.execute(f"SELECT {aba_col} FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
-                anexos_result = c.fetchone()
-                if anexos_result and anexos_result[0]:
-                    try:
-                        anexos_data = anexos_result[0]
-                        if isinstance(anexos_data, str):
-                            anexos_abas[aba_num] = json.loads(anexos_data)
-                        elif isinstance(anexos_data, list):
-                            anexos_abas[aba_num] = anexos_data
-                    except (json.JSONDecodeError, TypeError):
-                        anexos_abas[aba_num] = []
+            return relatorio_data.get(key) or default
+        
+        eventos = [evento[1:] for evento in relatorio_data["eventos"]]
+        anexos_abas = relatorio_data["anexos"]
         
         # Criar PDF com filial
         filial_id = get_value("filial_id") or 2
@@ -869,6 +699,9 @@ def gerar_pdf_relatorio(relatorio_id, db_name):
         filepath = os.path.join(output_dir, filename)
         pdf.output(filepath)
         
+        conn.execute("UPDATE relatorios_tecnicos SET pdf_fingerprint = ? WHERE id = ?", (fingerprint, relatorio_id))
+        conn.commit()
+        
         return True, filepath
         
     except Exception as e:
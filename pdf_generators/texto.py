@@ -0,0 +1,115 @@
+"""
+Limpeza de texto para os PDFs (fpdf só desenha Latin-1 nas fontes padrão).
+
+Cada perfil é uma tabela ``str.translate`` montada uma vez na importação:
+o texto é normalizado (NFC, para acentos digitados como caractere +
+combinante virarem um caractere só), traduzido numa passada e codificado
+com ``'replace'`` para o conjunto do perfil, o que troca por ``?`` o que
+sobrou fora dele. Textos repetidos (rodapés, títulos de seção, rótulos)
+saem de um cache LRU; texto ASCII sem tabs volta como veio.
+
+Perfis:
+    LATIN1        cotações: troca marcadores e símbolos, preserva acentos.
+    ASCII         relatórios com fonte Unicode: só aspas, traços e símbolos.
+    ASCII_SEM_ACENTOS  relatórios com fonte padrão: também remove acentos.
+
+``python -m pdf_generators.texto`` compara com a limpeza antiga (um
+``str.replace`` por caractere).
+"""
+import unicodedata
+from functools import lru_cache
+
+LATIN1 = "latin1"
+ASCII = "ascii"
+ASCII_SEM_ACENTOS = "ascii_sem_acentos"
+
+TAB = "    "
+
+SIMBOLOS_COTACAO = {
+    '•': '- ', '●': '- ', '◦': '- ', '◆': '- ', '▪': '- ', '▫': '- ',
+    '★': '* ', '☆': '* ', '–': '-', '—': '-', '…': '...', '®': '(R)', '™': '(TM)', '©': '(C)',
+}
+
+SIMBOLOS_RELATORIO = {
+    '“': '"', '”': '"', '’': "'", '‘': "'", '…': '...', '–': '-', '—': '-',
+    '°': 'o', '®': '(R)', '©': '(C)', '™': '(TM)', 'ª': 'a', 'º': 'o', 'ç': 'c', 'Ç': 'C',
+}
+
+# Vogais acentuadas do português (e trema) -> letra base
+ACENTOS = {
+    ch: unicodedata.normalize("NFKD", ch)[0]
+    for ch in "áàãâäéèêëíìîïóòõôöúùûüÁÀÃÂÄÉÈÊËÍÌÎÏÓÒÕÔÖÚÙÛÜ"
+}
+
+
+def _tabela(*mapas):
+    substituicoes = {"\t": TAB}
+    for mapa in mapas:
+        substituicoes.update(mapa)
+    return str.maketrans(substituicoes)
+
+
+# perfil: (tabela de tradução, codificação final)
+PERFIS = {
+    LATIN1: (_tabela(SIMBOLOS_COTACAO), "latin-1"),
+    ASCII: (_tabela(SIMBOLOS_RELATORIO), "ascii"),
+    ASCII_SEM_ACENTOS: (_tabela(SIMBOLOS_RELATORIO, ACENTOS), "ascii"),
+}
+
+
+@lru_cache(maxsize=4096)
+def _limpar(texto, perfil):
+    tabela, codificacao = PERFIS[perfil]
+    if not unicodedata.is_normalized("NFC", texto):
+        texto = unicodedata.normalize("NFC", texto)
+    texto = texto.translate(tabela)
+    return texto.encode(codificacao, "replace").decode(codificacao)
+
+
+def limpar_texto(texto, perfil=LATIN1):
+    """Texto pronto para a fonte do PDF conforme ``perfil``; None vira ''."""
+    if texto is None:
+        return ""
+    if not isinstance(texto, str):
+        texto = str(texto)
+    # Nenhum perfil altera ASCII além do tab
+    if texto.isascii() and "\t" not in texto:
+        return texto
+    return _limpar(texto, perfil)
+
+
+def _limpar_antigo(texto, perfil):
+    # Referência do benchmark: um str.replace por entrada, como era feito
+    mapas = {LATIN1: (SIMBOLOS_COTACAO,), ASCII: (SIMBOLOS_RELATORIO,),
+             ASCII_SEM_ACENTOS: (SIMBOLOS_RELATORIO, ACENTOS)}[perfil]
+    texto = str(texto).replace("\t", TAB)
+    for mapa in mapas:
+        for antigo, novo in mapa.items():
+            texto = texto.replace(antigo, novo)
+    if perfil == LATIN1:
+        return texto.encode("latin-1", "replace").decode("latin-1")
+    return "".join(ch if ord(ch) < 128 else "?" for ch in texto)
+
+
+def _benchmark(repeticoes=200):
+    import timeit
+
+    # Mistura típica de uma página: rótulos e rodapés repetidos, descrições acentuadas
+    amostra = [
+        "CONDIÇÕES COMERCIAIS", "Página 1 de 3", "Rua Fernando Pessoa, nº 11 – Batistini – São Bernardo do Campo",
+        "• Manutenção preventiva do compressor\tcom troca de óleo…", "Valor Unitário", "Quantidade",
+        "Técnico responsável: José da Conceição", "Temperatura de descarga: 85°C", "ITEM", "R$ 1.250,00",
+        "Observações: peças Atlas Copco® originais — garantia de 90 dias", "Orçamento ★ prioridade",
+    ] * 5
+    print(f"{len(amostra)} textos x {repeticoes} repetições")
+    for perfil in PERFIS:
+        for texto in amostra:
+            assert limpar_texto(texto, perfil) == _limpar_antigo(texto, perfil), (perfil, texto)
+        antigo = timeit.timeit(lambda: [_limpar_antigo(t, perfil) for t in amostra], number=repeticoes)
+        _limpar.cache_clear()
+        novo = timeit.timeit(lambda: [limpar_texto(t, perfil) for t in amostra], number=repeticoes)
+        print(f"{perfil:18} antigo {antigo * 1000:8.1f} ms   novo {novo * 1000:8.1f} ms   {antigo / novo:5.1f}x")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,238 @@
+"""
+Repositório de anexos dos relatórios técnicos, endereçado pelo conteúdo.
+
+Cada arquivo é guardado uma única vez em ``STORE_DIR/<2 primeiros>/<sha256><ext>``
+e descrito na tabela ``anexos_blobs`` (tamanho, mime, dimensões, miniatura
+e contagem de referências). Os anexos das abas são dicts
+``{'nome', 'caminho', 'descricao', 'hash'}`` (tabela ``relatorio_anexos``):
+uma entrada que já tem hash e aponta para um arquivo existente não é lida
+nem copiada de novo, então regravar um relatório sem anexos novos só mexe em metadados.
+
+Na entrada o arquivo é clonado (reflink, quando o sistema de arquivos
+permite), ligado por hardlink (arquivos que já estão em ``data/``, como as
+cópias antigas por relatório) ou copiado. As referências são ajustadas na
+transação que grava o relatório; blobs sem referência há mais de
+``CARENCIA_GC_S`` e arquivos soltos (gravações desfeitas) são removidos por
+``coletar_lixo``, que a MainWindow roda em segundo plano.
+"""
+import hashlib
+import io
+import mimetypes
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+
+from database import DATA_DIR, get_connection
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+STORE_DIR = os.path.join(DATA_DIR, "anexos")
+# Pasta das cópias por relatório usadas antes do repositório
+LEGADO_DIR = os.path.join(DATA_DIR, "relatorios", "anexos")
+CARENCIA_GC_S = 24 * 60 * 60
+MINIATURA_PX = 160
+
+# ioctl FICLONE do Linux (btrfs, XFS, ...): cópia que compartilha os blocos
+_FICLONE = 0x40049409
+
+
+def hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def caminho_blob(digest, extensao=""):
+    return os.path.join(STORE_DIR, digest[:2], digest + extensao)
+
+
+def _dentro_de_data(caminho):
+    data = os.path.abspath(DATA_DIR)
+    return os.path.commonpath([data, os.path.abspath(caminho)]) == data
+
+
+def _reflink(origem, destino):
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(origem, "rb") as src, open(destino, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(destino)
+        except OSError:
+            pass
+        return False
+
+
+def _materializar(origem, destino):
+    """Coloca o conteúdo de ``origem`` em ``destino`` (atômico); retorna o método usado."""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    metodo = None
+    if _dentro_de_data(origem):
+        try:
+            os.link(origem, temporario)
+            # mtime novo: a coleta de lixo não confunde o arquivo com um órfão antigo
+            os.utime(temporario)
+            metodo = "hardlink"
+        except OSError:
+            pass
+    if metodo is None:
+        metodo = "reflink" if _reflink(origem, temporario) else "copia"
+        if metodo == "copia":
+            shutil.copyfile(origem, temporario)
+    os.replace(temporario, destino)
+    return metodo
+
+
+def _metadados(caminho, nome):
+    """(mime, largura, altura, miniatura JPEG) do arquivo; dimensões só para imagens."""
+    mime = mimetypes.guess_type(nome)[0]
+    if not (mime or "").startswith("image/"):
+        return mime, None, None, None
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(caminho) as img:
+            largura, altura = img.size
+            img.draft("RGB", (MINIATURA_PX, MINIATURA_PX))
+            miniatura = ImageOps.exif_transpose(img).convert("RGB")
+        miniatura.thumbnail((MINIATURA_PX, MINIATURA_PX))
+        buffer = io.BytesIO()
+        miniatura.save(buffer, "JPEG", quality=75)
+        return mime, largura, altura, buffer.getvalue()
+    except Exception as e:
+        log.debug("Sem miniatura para %s: %s", nome, e)
+        return mime, None, None, None
+
+
+def ingerir(c, caminho, nome=None):
+    """Guarda ``caminho`` no repositório (se ainda não estiver) e retorna (hash, caminho no repositório).
+
+    Roda na transação do salvamento: a linha do manifesto é gravada antes de
+    conferir o arquivo, o que a serializa com a coleta de lixo.
+    """
+    nome = nome or os.path.basename(caminho)
+    digest = hash_arquivo(caminho)
+    c.execute("SELECT 1 FROM anexos_blobs WHERE hash = ?", (digest,))
+    if c.fetchone():
+        c.execute("UPDATE anexos_blobs SET atualizado_em = CURRENT_TIMESTAMP WHERE hash = ?", (digest,))
+    else:
+        mime, largura, altura, miniatura = _metadados(caminho, nome)
+        c.execute("""
+            INSERT INTO anexos_blobs (hash, caminho, tamanho, mime, largura, altura, miniatura)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (hash) DO UPDATE SET atualizado_em = CURRENT_TIMESTAMP
+        """, (digest, caminho_blob(digest, os.path.splitext(nome)[1].lower()),
+              os.path.getsize(caminho), mime, largura, altura, miniatura))
+    c.execute("SELECT caminho FROM anexos_blobs WHERE hash = ?", (digest,))
+    destino = c.fetchone()[0]
+    if not os.path.isfile(destino):
+        metodo = _materializar(caminho, destino)
+        log.debug("Anexo %s guardado (%s) em %s", nome, metodo, destino)
+    return digest, destino
+
+
+def preparar_anexos(c, anexos, aba_num, relatorio_id=None):
+    """Entradas de uma aba com ``hash`` e caminho no repositório, ingerindo só o que é novo."""
+    preparados = []
+    for anexo in anexos or []:
+        if not isinstance(anexo, dict):
+            # Formato antigo: só o caminho
+            anexo = {"nome": os.path.basename(str(anexo)), "caminho": str(anexo),
+                     "descricao": f"Anexo da Aba {aba_num}"}
+        caminho = anexo.get("caminho") or anexo.get("path")
+        nome = anexo.get("nome") or os.path.basename(str(caminho or ""))
+        if anexo.get("hash") and caminho and os.path.isfile(caminho):
+            preparados.append(anexo)
+            continue
+        if not (caminho and os.path.isfile(caminho)) and relatorio_id and nome:
+            legado = os.path.join(LEGADO_DIR, str(relatorio_id), nome)
+            caminho = legado if os.path.isfile(legado) else caminho
+        if caminho and os.path.isfile(caminho):
+            try:
+                digest, destino = ingerir(c, caminho, nome)
+                anexo = dict(anexo, nome=nome, caminho=destino, hash=digest)
+            except OSError as e:
+                log.warning("Falha ao guardar o anexo %s: %s", caminho, e)
+        else:
+            log.warning("Anexo não encontrado: %s", caminho)
+        preparados.append(anexo)
+    return preparados
+
+
+def referencias(listas):
+    """Contagem de hashes nas listas de anexos (um anexo repetido conta duas vezes)."""
+    return Counter(anexo["hash"] for lista in listas for anexo in lista
+                   if isinstance(anexo, dict) and anexo.get("hash"))
+
+
+def hashes_relatorio(c, relatorio_id):
+    """Referências gravadas hoje para o relatório."""
+    c.execute("SELECT hash FROM relatorio_anexos WHERE relatorio_id = ? AND hash IS NOT NULL", (relatorio_id,))
+    return Counter(row[0] for row in c.fetchall())
+
+
+def atualizar_referencias(c, antes, depois):
+    """Aplica a diferença entre duas contagens de ``referencias`` em ``anexos_blobs.refs``."""
+    delta = Counter(depois)
+    delta.subtract(antes)
+    mudancas = [(n, h) for h, n in delta.items() if n]
+    if mudancas:
+        c.executemany("UPDATE anexos_blobs SET refs = refs + ?, atualizado_em = CURRENT_TIMESTAMP WHERE hash = ?",
+                      mudancas)
+
+
+def coletar_lixo(carencia_s=CARENCIA_GC_S, db_name=None):
+    """Remove blobs sem referência e arquivos soltos mais antigos que a carência; retorna (blobs, arquivos)."""
+    conn = get_connection(db_name)
+    c = conn.cursor()
+    removidos = []
+    try:
+        # O bloqueio de escrita fica com a coleta enquanto apaga os arquivos:
+        # um salvamento que reaproveite o blob espera e encontra a linha já removida
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("SELECT hash, caminho FROM anexos_blobs WHERE refs <= 0 AND atualizado_em < datetime('now', ?)",
+                  (f"-{int(carencia_s)} seconds",))
+        for digest, caminho in c.fetchall():
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Não foi possível remover o anexo %s: %s", caminho, e)
+                continue
+            removidos.append((digest,))
+        c.executemany("DELETE FROM anexos_blobs WHERE hash = ? AND refs <= 0", removidos)
+        conn.commit()
+        c.execute("SELECT caminho FROM anexos_blobs")
+        conhecidos = {os.path.normpath(row[0]) for row in c.fetchall()}
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    soltos = 0
+    limite = time.time() - carencia_s
+    for pasta, _dirs, arquivos in os.walk(STORE_DIR):
+        for arquivo in arquivos:
+            caminho = os.path.normpath(os.path.join(pasta, arquivo))
+            try:
+                if caminho not in conhecidos and os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+                    soltos += 1
+            except OSError:
+                pass
+    if removidos or soltos:
+        log.info("Anexos: %d blobs sem referência e %d arquivos soltos removidos", len(removidos), soltos)
+    return len(removidos), soltos
@@ -0,0 +1,120 @@
+"""
+Busca textual sobre o índice FTS5 ``busca_fts`` (mantido por triggers).
+
+``filtro_busca`` gera o trecho de WHERE usado pelas listas dos módulos
+(``id IN (...)`` sobre o índice, em vez de ``LIKE '%termo%'``) e ``buscar``
+devolve resultados de todas as entidades ordenados por relevância (bm25),
+para a busca global da janela principal.
+
+Cada palavra digitada vira um prefixo ("atl" encontra "Atlas") e acentos
+são ignorados. Se o SQLite não tiver FTS5 as funções retornam None e os
+módulos mantêm a busca com LIKE.
+"""
+import re
+import sqlite3
+
+from database import BUSCA_ENTIDADES, BUSCA_FATOR, DB_NAME, get_connection
+
+# Pesos do bm25 por coluna: título, conteúdo, info (não indexada)
+PESOS = (10.0, 1.0, 0.0)
+LIMITE_PADRAO = 30
+
+_ENTIDADE_POR_CODIGO = {codigo: entidade for entidade, (codigo, *_resto) in BUSCA_ENTIDADES.items()}
+_disponivel = {}
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class ResultadoBusca:
+    """Um registro encontrado pela busca global."""
+
+    __slots__ = ("entidade", "id", "titulo", "info", "trecho")
+
+    def __init__(self, entidade, registro_id, titulo, info, trecho):
+        self.entidade = entidade
+        self.id = registro_id
+        self.titulo = titulo
+        self.info = info
+        self.trecho = trecho
+
+    def __repr__(self):
+        return f"ResultadoBusca({self.entidade!r}, {self.id!r}, {self.titulo!r})"
+
+
+def consulta_fts(termo):
+    """Converte o texto digitado numa consulta FTS5 (prefixos unidos por AND)."""
+    tokens = _TOKEN.findall(termo or "")
+    if not tokens:
+        return None
+    # Aspas tornam cada palavra literal (sem operadores do FTS5)
+    return " AND ".join(f'"{token}"*' for token in tokens)
+
+
+def indice_disponivel(conn=None, db_name=None):
+    """True se o banco possui a tabela busca_fts (consulta feita uma vez por banco)."""
+    chave = db_name or DB_NAME
+    if chave in _disponivel:
+        return _disponivel[chave]
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busca_fts'")
+        _disponivel[chave] = c.fetchone() is not None
+    except sqlite3.Error:
+        return False
+    finally:
+        if own_conn:
+            conn.close()
+    return _disponivel[chave]
+
+
+def _subconsulta(entidade):
+    codigo = BUSCA_ENTIDADES[entidade][0]
+    return (f"SELECT rowid / {BUSCA_FATOR} FROM busca_fts "
+            f"WHERE busca_fts MATCH ? AND rowid % {BUSCA_FATOR} = {codigo}")
+
+
+def filtro_busca(termo, colunas, conn=None, db_name=None):
+    """Trecho de WHERE para listas: ``colunas`` = {entidade: coluna com o id}.
+
+    Ex.: ``filtro_busca(termo, {"cotacao": "c.id", "cliente": "c.cliente_id"})``
+    retorna ("(c.id IN (...) OR c.cliente_id IN (...))", params), ou None
+    sem índice/termo (o chamador usa a busca antiga).
+    """
+    consulta = consulta_fts(termo)
+    if consulta is None or not indice_disponivel(conn, db_name):
+        return None
+    partes = [f"{coluna} IN ({_subconsulta(entidade)})" for entidade, coluna in colunas.items()]
+    return "(" + " OR ".join(partes) + ")", (consulta,) * len(partes)
+
+
+def buscar(termo, entidades=None, limite=LIMITE_PADRAO, conn=None, db_name=None):
+    """Resultados de todas as entidades (ou das informadas), mais relevantes primeiro."""
+    consulta = consulta_fts(termo)
+    if consulta is None:
+        return []
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        if not indice_disponivel(conn, db_name):
+            return []
+        sql = ("SELECT rowid, titulo, info, snippet(busca_fts, 1, '[', ']', '...', 8) "
+               "FROM busca_fts WHERE busca_fts MATCH ?")
+        params = [consulta]
+        if entidades:
+            codigos = [BUSCA_ENTIDADES[entidade][0] for entidade in entidades]
+            sql += f" AND rowid % {BUSCA_FATOR} IN ({', '.join('?' for _ in codigos)})"
+            params.extend(codigos)
+        sql += f" ORDER BY bm25(busca_fts, {', '.join(str(p) for p in PESOS)}) LIMIT ?"
+        params.append(limite)
+        c = conn.cursor()
+        c.execute(sql, params)
+        return [
+            ResultadoBusca(_ENTIDADE_POR_CODIGO.get(rowid % BUSCA_FATOR), rowid // BUSCA_FATOR, titulo, info, trecho)
+            for rowid, titulo, info, trecho in c.fetchall()
+        ]
+    finally:
+        if own_conn:
+            conn.close()
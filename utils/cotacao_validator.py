@@ -1,22 +1,42 @@
+import heapq
 import sqlite3
-from datetime import datetime, date
-from database import DB_NAME
+import threading
+import time
+from datetime import datetime, date, timedelta
+from database import DB_NAME, get_connection
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+# A verificação de expiração roda no máximo uma vez por intervalo (ou na
+# virada do dia); entre uma e outra as listagens não tocam no banco.
+INTERVALO_VERIFICACAO_S = 10 * 60
+# Cotações em aberto que vencem nesse horizonte ficam na fila de vencimentos
+HORIZONTE_FILA_DIAS = 30
+
+# Mesmo WHERE do índice parcial idx_cotacoes_abertas_validade
+_ABERTAS_COM_VALIDADE = "status = 'Em Aberto' AND data_validade IS NOT NULL"
+
+_lock = threading.Lock()
+_agenda = {"dia": None, "instante": 0.0}
+# Fila de vencimentos: heap de (data_validade, id), válida para o dia "dia"
+_fila = {"dia": None, "itens": []}
 
 def verificar_e_atualizar_status_cotacoes():
     """
     Verifica e atualiza automaticamente o status das cotações que expiraram
     """
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         # Buscar cotações com prazo de validade expirado e status "Em Aberto"
-        hoje = date.today()
-        c.execute("""
+        # (faixa no índice parcial; sem expiradas não abre transação de escrita)
+        hoje = date.today().isoformat()
+        c.execute(f"""
             SELECT id, numero_proposta, data_validade 
             FROM cotacoes 
-            WHERE status = 'Em Aberto' 
-            AND data_validade IS NOT NULL 
+            WHERE {_ABERTAS_COM_VALIDADE}
             AND data_validade < ?
         """, (hoje,))
         
@@ -24,35 +44,106 @@ def verificar_e_atualizar_status_cotacoes():
         
         if cotações_expiradas:
             # Atualizar status para "Rejeitada"
-            c.execute("""
-                UPDATE cotacoes 
-                SET status = 'Rejeitada' 
-                WHERE status = 'Em Aberto' 
-                AND data_validade IS NOT NULL 
-                AND data_validade < ?
-            """, (hoje,))
+            c.executemany(
+                f"UPDATE cotacoes SET status = 'Rejeitada' WHERE id = ? AND {_ABERTAS_COM_VALIDADE}",
+                [(row[0],) for row in cotações_expiradas],
+            )
             
             conn.commit()
-            print(f"✅ {len(cotações_expiradas)} cotações expiradas foram atualizadas para 'Rejeitada'")
+            log.info("%d cotações expiradas foram atualizadas para 'Rejeitada'", len(cotações_expiradas))
             
             # Retornar detalhes das cotações atualizadas
             return cotações_expiradas
         else:
-            print("✅ Nenhuma cotação expirada encontrada")
+            log.debug("Nenhuma cotação expirada encontrada")
             return []
             
     except sqlite3.Error as e:
-        print(f"❌ Erro ao verificar cotações expiradas: {e}")
+        log.error("Erro ao verificar cotações expiradas: %s", e)
         return []
     finally:
         conn.close()
 
+def verificar_expiracoes_agendado(forcar=False):
+    """
+    Executa a verificação de expiração se o intervalo passou ou o dia virou.
+    Retorna as cotações expiradas (vazio quando a verificação não era devida).
+    """
+    with _lock:
+        hoje = date.today()
+        agora = time.monotonic()
+        if (not forcar and _agenda["dia"] == hoje
+                and agora - _agenda["instante"] < INTERVALO_VERIFICACAO_S):
+            return []
+        _agenda["dia"] = hoje
+        _agenda["instante"] = agora
+    expiradas = verificar_e_atualizar_status_cotacoes()
+    recarregar_fila_vencimentos()
+    return expiradas
+
+def segundos_ate_proxima_verificacao():
+    """Tempo até a próxima verificação devida (intervalo ou meia-noite)."""
+    with _lock:
+        if _agenda["dia"] is None:
+            return 0
+        restante = INTERVALO_VERIFICACAO_S - (time.monotonic() - _agenda["instante"])
+    amanha = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    ate_meia_noite = (amanha - datetime.now()).total_seconds()
+    return max(0, min(restante, ate_meia_noite))
+
+def recarregar_fila_vencimentos():
+    """Relê do índice parcial as cotações em aberto que vencem no horizonte."""
+    hoje = date.today()
+    limite = (hoje + timedelta(days=HORIZONTE_FILA_DIAS)).isoformat()
+    try:
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT data_validade, id FROM cotacoes
+            WHERE {_ABERTAS_COM_VALIDADE} AND data_validade <= ?
+        """, (limite,))
+        itens = [(str(validade), cotacao_id) for validade, cotacao_id in c.fetchall()]
+    except sqlite3.Error as e:
+        log.error("Erro ao carregar fila de vencimentos: %s", e)
+        return
+    finally:
+        conn.close()
+    heapq.heapify(itens)
+    with _lock:
+        _fila["dia"] = hoje
+        _fila["itens"] = itens
+
+def invalidar_fila_vencimentos():
+    """Descarta a fila (ex.: após salvar cotações); é relida na próxima consulta."""
+    with _lock:
+        _fila["dia"] = None
+        _fila["itens"] = []
+
+def obter_fila_vencimentos(dias=7):
+    """
+    [(data_validade, id), ...] das cotações em aberto que vencem em até ``dias``,
+    em ordem de vencimento, lidos da fila em memória.
+    """
+    if dias > HORIZONTE_FILA_DIAS:
+        return None
+    with _lock:
+        valida = _fila["dia"] == date.today()
+    if not valida:
+        recarregar_fila_vencimentos()
+    limite = (date.today() + timedelta(days=dias)).isoformat()
+    with _lock:
+        itens = list(_fila["itens"])
+    proximos = []
+    while itens and itens[0][0] <= limite:
+        proximos.append(heapq.heappop(itens))
+    return proximos
+
 def obter_cotacoes_por_status(status=None):
     """
     Obtém cotações filtradas por status
     """
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         if status:
@@ -78,7 +169,7 @@ def obter_cotacoes_por_status(status=None):
         return c.fetchall()
         
     except sqlite3.Error as e:
-        print(f"❌ Erro ao buscar cotações: {e}")
+        log.warning("Erro ao buscar cotações: %s", e)
         return []
     finally:
         conn.close()
@@ -88,7 +179,7 @@ def obter_estatisticas_cotacoes():
     Obtém estatísticas das cotações por status
     """
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         c.execute("""
@@ -100,7 +191,7 @@ def obter_estatisticas_cotacoes():
         return c.fetchall()
         
     except sqlite3.Error as e:
-        print(f"❌ Erro ao buscar estatísticas: {e}")
+        log.warning("Erro ao buscar estatísticas: %s", e)
         return []
     finally:
         conn.close()
@@ -110,7 +201,7 @@ def obter_cotacoes_por_usuario(usuario_id):
     Obtém cotações de um usuário específico
     """
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
         c.execute("""
@@ -125,7 +216,7 @@ def obter_cotacoes_por_usuario(usuario_id):
         return c.fetchall()
         
     except sqlite3.Error as e:
-        print(f"❌ Erro ao buscar cotações do usuário: {e}")
+        log.warning("Erro ao buscar cotações do usuário: %s", e)
         return []
     finally:
         conn.close()
@@ -135,18 +226,31 @@ def obter_cotacoes_vencendo_em_dias(dias=7):
     Obtém cotações que vencem em X dias
     """
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         c = conn.cursor()
         
-        from datetime import timedelta
-        data_limite = date.today() + timedelta(days=dias)
-        
-        c.execute("""
+        campos = """
             SELECT c.id, c.numero_proposta, cl.nome, c.data_criacao, c.data_validade, 
                    c.valor_total, c.status, u.nome_completo
             FROM cotacoes c
             JOIN clientes cl ON c.cliente_id = cl.id
             JOIN usuarios u ON c.responsavel_id = u.id
+        """
+        fila = obter_fila_vencimentos(dias)
+        if fila is not None:
+            # Ids vindos da fila: busca direta pela chave, sem varrer cotacoes
+            if not fila:
+                return []
+            ids = [cotacao_id for _, cotacao_id in fila]
+            marcadores = ", ".join("?" for _ in ids)
+            c.execute(f"""{campos}
+                WHERE c.id IN ({marcadores}) AND c.status = 'Em Aberto'
+                ORDER BY c.data_validade ASC, c.id
+            """, ids)
+            return c.fetchall()
+        
+        data_limite = (date.today() + timedelta(days=dias)).isoformat()
+        c.execute(f"""{campos}
             WHERE c.status = 'Em Aberto' 
             AND c.data_validade IS NOT NULL 
             AND c.data_validade <= ?
@@ -156,7 +260,7 @@ def obter_cotacoes_vencendo_em_dias(dias=7):
         return c.fetchall()
         
     except sqlite3.Error as e:
-        print(f"❌ Erro ao buscar cotações vencendo: {e}")
+        log.warning("Erro ao buscar cotações vencendo: %s", e)
         return []
     finally:
         conn.close()
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+Itens de uma cotação em edição: modelo tipado e persistência incremental.
+
+``ItemCotacao`` guarda os valores já convertidos (Decimal em centavos) e
+``ItensCotacaoStore`` mantém os itens da tela, na ordem da Treeview, com os
+totais atualizados a cada inclusão/alteração/remoção, sem reler os textos
+formatados da lista.
+
+Os módulos de cotação carregam os itens com ``ItensCotacaoTracker.carregar``,
+que guarda o id de cada linha e os valores gravados. Ao salvar, o tracker
+compara os itens da tela com esse retrato e grava apenas inserções,
+atualizações e exclusões (``executemany``), na transação de quem chamou,
+e reindexa a cotação na busca uma única vez se algum item mudou.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from database import reindexar_cotacao
+
+CENTAVO = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+CAMPOS_MONETARIOS = ("valor_unitario", "mao_obra", "deslocamento", "estadia", "icms", "iss", "valor_total_item")
+CAMPOS_TOTAIS = ("total", "subtotal", "mao_obra", "deslocamento", "estadia", "icms", "iss")
+
+
+def para_decimal(valor, casas=CENTAVO):
+    """Converte número/texto do banco ou da tela para Decimal (vazio = 0)."""
+    if valor is None or valor == "":
+        return ZERO
+    if not isinstance(valor, Decimal):
+        # str() do float evita levar o erro binário (0.1 -> 0.1000000000000000055...)
+        valor = Decimal(str(valor))
+    return valor.quantize(casas, rounding=ROUND_HALF_UP) if casas is not None else valor
+
+
+class ItemCotacao:
+    """Um item da cotação com valores tipados (monetários em Decimal)."""
+
+    __slots__ = (
+        "tipo", "item_nome", "quantidade", "valor_unitario", "valor_total_item", "descricao",
+        "mao_obra", "deslocamento", "estadia", "icms", "iss", "tipo_operacao",
+        "locacao_data_inicio", "locacao_data_fim", "locacao_qtd_meses", "locacao_imagem_path",
+    )
+
+    def __init__(self, tipo="Produto", item_nome="", quantidade=1, valor_unitario=0,
+                 valor_total_item=None, descricao="", mao_obra=0, deslocamento=0, estadia=0,
+                 icms=0, iss=0, tipo_operacao="Compra", locacao_data_inicio=None,
+                 locacao_data_fim=None, locacao_qtd_meses=None, locacao_imagem_path=None):
+        self.tipo = tipo or "Produto"
+        self.item_nome = item_nome or ""
+        self.quantidade = para_decimal(quantidade, casas=None)
+        self.valor_unitario = para_decimal(valor_unitario)
+        self.descricao = descricao or ""
+        self.mao_obra = para_decimal(mao_obra)
+        self.deslocamento = para_decimal(deslocamento)
+        self.estadia = para_decimal(estadia)
+        self.icms = para_decimal(icms)
+        self.iss = para_decimal(iss)
+        self.tipo_operacao = tipo_operacao or "Compra"
+        self.locacao_data_inicio = locacao_data_inicio
+        self.locacao_data_fim = locacao_data_fim
+        self.locacao_qtd_meses = locacao_qtd_meses
+        self.locacao_imagem_path = locacao_imagem_path
+        # Itens lidos do banco mantêm o total gravado; novos são calculados
+        self.valor_total_item = (para_decimal(valor_total_item) if valor_total_item is not None
+                                 else self.calcular_total())
+
+    @classmethod
+    def de_linha(cls, colunas, row):
+        """Cria o item a partir de uma linha de itens_cotacao (na ordem de ``colunas``)."""
+        return cls(**dict(zip(colunas, row)))
+
+    def copiar(self, **alteracoes):
+        """Novo item com os mesmos valores e ``alteracoes``.
+
+        O total é recalculado, a menos que ``valor_total_item`` esteja em ``alteracoes``.
+        """
+        campos = {campo: getattr(self, campo) for campo in self.__slots__ if campo != "valor_total_item"}
+        campos.update(alteracoes)
+        return ItemCotacao(**campos)
+
+    @property
+    def locacao(self):
+        return (self.tipo_operacao or "").lower().startswith("loca")
+
+    def calcular_total(self):
+        """Locação: qtd x mensal x meses; compra: qtd x (unitário + custos + impostos)."""
+        if self.locacao:
+            total = self.quantidade * self.valor_unitario * (self.locacao_qtd_meses or 0)
+        else:
+            total = self.quantidade * (self.valor_unitario + self.mao_obra + self.deslocamento
+                                       + self.estadia + self.icms + self.iss)
+        return para_decimal(total)
+
+    def parcelas(self):
+        """Contribuição do item para cada total da cotação."""
+        base = self.quantidade * self.valor_unitario
+        if self.locacao:
+            base *= (self.locacao_qtd_meses or 0)
+        return {
+            "total": self.valor_total_item,
+            "subtotal": para_decimal(base),
+            "mao_obra": para_decimal(self.quantidade * self.mao_obra),
+            "deslocamento": para_decimal(self.quantidade * self.deslocamento),
+            "estadia": para_decimal(self.quantidade * self.estadia),
+            "icms": para_decimal(self.quantidade * self.icms),
+            "iss": para_decimal(self.quantidade * self.iss),
+        }
+
+    def valores(self, colunas):
+        """Valores para gravar em itens_cotacao (Decimal -> float, coluna REAL)."""
+        return tuple(float(v) if isinstance(v, Decimal) else v
+                     for v in (getattr(self, coluna) for coluna in colunas))
+
+
+class ItensCotacaoStore:
+    """Itens da cotação em edição, indexados pela chave da linha (iid da Treeview).
+
+    É a fonte dos valores ao totalizar e salvar; a Treeview só exibe.
+    """
+
+    def __init__(self):
+        self._itens = {}
+        self.totais = dict.fromkeys(CAMPOS_TOTAIS, ZERO)
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def get(self, chave):
+        return self._itens.get(chave)
+
+    def itens(self):
+        """Pares (chave, item) na ordem de inclusão (a mesma da lista)."""
+        return list(self._itens.items())
+
+    def _somar(self, item, sinal):
+        for campo, valor in item.parcelas().items():
+            self.totais[campo] += sinal * valor
+
+    def adicionar(self, chave, item):
+        self.remover(chave)
+        self._itens[chave] = item
+        self._somar(item, 1)
+
+    def atualizar(self, chave, item):
+        """Substitui o item mantendo a posição na lista."""
+        anterior = self._itens.get(chave)
+        if anterior is not None:
+            self._somar(anterior, -1)
+        self._itens[chave] = item
+        self._somar(item, 1)
+
+    def remover(self, chave):
+        item = self._itens.pop(chave, None)
+        if item is not None:
+            self._somar(item, -1)
+        return item
+
+    def limpar(self):
+        self._itens.clear()
+        self.totais = dict.fromkeys(CAMPOS_TOTAIS, ZERO)
+
+    def linhas(self, colunas):
+        """[(chave, valores), ...] no formato esperado por ``ItensCotacaoTracker.salvar``."""
+        return [(chave, item.valores(colunas)) for chave, item in self._itens.items()]
+
+
+
+def _normalizar(valor):
+    """Valores vazios (None, "", 0) se equivalem; floats comparados arredondados."""
+    if valor is None or valor == "" or valor == 0:
+        return None
+    if isinstance(valor, float):
+        return round(valor, 6)
+    return valor
+
+
+class ItensCotacaoTracker:
+    """Acompanha os itens persistidos de uma cotação para salvar só o que mudou.
+
+    ``colunas`` são as colunas de itens_cotacao que o módulo edita; cada
+    linha da interface é identificada por uma chave (o iid da Treeview).
+    """
+
+    def __init__(self, colunas):
+        self.colunas = tuple(colunas)
+        self.reset()
+
+    def reset(self, cotacao_id=None):
+        self.cotacao_id = cotacao_id
+        self._persistidos = {}  # id no banco -> valores gravados (na ordem de colunas)
+        self._ids = {}          # chave na interface -> id no banco
+        self._pendente = None
+
+    def carregar(self, cursor, cotacao_id):
+        """Lê os itens da cotação (ordem de id) e retorna [(id, valores), ...]."""
+        self.reset(cotacao_id)
+        cursor.execute(
+            f"SELECT id, {', '.join(self.colunas)} FROM itens_cotacao WHERE cotacao_id = ? ORDER BY id",
+            (cotacao_id,),
+        )
+        linhas = []
+        for row in cursor.fetchall():
+            self._persistidos[row[0]] = tuple(row[1:])
+            linhas.append((row[0], tuple(row[1:])))
+        return linhas
+
+    def vincular(self, chave, item_id):
+        """Associa a linha da interface ao item carregado do banco."""
+        self._ids[chave] = item_id
+
+    def salvar(self, cursor, cotacao_id, linhas):
+        """Grava as diferenças entre ``linhas`` [(chave, valores), ...] e o banco.
+
+        Não faz commit. Retorna (inseridos, atualizados, excluidos); chame
+        ``confirmar`` depois do commit para atualizar o retrato.
+        """
+        if cotacao_id != self.cotacao_id:
+            # Cotação nova (ou duplicada): nada do retrato pertence a ela
+            self.reset(cotacao_id)
+
+        vistos = set()
+        novos = []
+        alterados = []
+        for chave, valores in linhas:
+            valores = tuple(valores)
+            item_id = self._ids.get(chave)
+            if item_id is None or item_id not in self._persistidos or item_id in vistos:
+                novos.append((chave, valores))
+                continue
+            vistos.add(item_id)
+            gravados = self._persistidos[item_id]
+            if any(_normalizar(a) != _normalizar(b) for a, b in zip(valores, gravados)):
+                alterados.append((item_id, valores))
+        removidos = [item_id for item_id in self._persistidos if item_id not in vistos]
+
+        if removidos:
+            cursor.executemany(
+                "DELETE FROM itens_cotacao WHERE id = ? AND cotacao_id = ?",
+                [(item_id, cotacao_id) for item_id in removidos],
+            )
+        if alterados:
+            atribuicoes = ", ".join(f"{coluna} = ?" for coluna in self.colunas)
+            cursor.executemany(
+                f"UPDATE itens_cotacao SET {atribuicoes} WHERE id = ? AND cotacao_id = ?",
+                [valores + (item_id, cotacao_id) for item_id, valores in alterados],
+            )
+        novos_ids = []
+        if novos:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM itens_cotacao")
+            ultimo_id = cursor.fetchone()[0]
+            marcadores = ", ".join("?" for _ in range(len(self.colunas) + 1))
+            cursor.executemany(
+                f"INSERT INTO itens_cotacao (cotacao_id, {', '.join(self.colunas)}) VALUES ({marcadores})",
+                [(cotacao_id,) + valores for _, valores in novos],
+            )
+            # Dentro da transação os ids novos são os maiores, na ordem de inserção
+            cursor.execute(
+                "SELECT id FROM itens_cotacao WHERE cotacao_id = ? AND id > ? ORDER BY id",
+                (cotacao_id, ultimo_id),
+            )
+            novos_ids = [row[0] for row in cursor.fetchall()]
+        if novos or alterados or removidos:
+            reindexar_cotacao(cursor, cotacao_id)
+
+        self._pendente = (
+            [(item_id, valores) for item_id, valores in alterados],
+            removidos,
+            [(chave, item_id, valores) for (chave, valores), item_id in zip(novos, novos_ids)],
+        )
+        return len(novos), len(alterados), len(removidos)
+
+    def confirmar(self):
+        """Atualiza o retrato após o commit de ``salvar``."""
+        if not self._pendente:
+            return
+        alterados, removidos, inseridos = self._pendente
+        for item_id in removidos:
+            self._persistidos.pop(item_id, None)
+        self._ids = {chave: item_id for chave, item_id in self._ids.items() if item_id in self._persistidos}
+        for item_id, valores in alterados:
+            self._persistidos[item_id] = valores
+        for chave, item_id, valores in inseridos:
+            self._persistidos[item_id] = valores
+            self._ids[chave] = item_id
+        self._pendente = None
@@ -0,0 +1,84 @@
+import os
+import threading
+from database import DB_NAME, get_connection
+
+# (arquivo do banco, kit_id) -> tupla de (nome do componente, quantidade), na ordem de cadastro
+_composicoes = {}
+_lock = threading.Lock()
+
+_SELECT_COMPOSICAO = """
+    SELECT ki.kit_id, p.nome, ki.quantidade
+    FROM kit_items ki
+    JOIN produtos p ON ki.produto_id = p.id
+"""
+
+
+def _agrupar(rows):
+    """Agrupa as linhas (kit_id, nome, quantidade) por kit."""
+    encontrados = {}
+    for kit_id, nome, quantidade in rows:
+        encontrados.setdefault(kit_id, []).append((nome, quantidade))
+    return {kit_id: tuple(componentes) for kit_id, componentes in encontrados.items()}
+
+
+def _chave(db_name, kit_id):
+    return os.path.abspath(db_name or DB_NAME), kit_id
+
+
+def carregar_composicoes_cotacao(cotacao_id, conn=None, db_name=None):
+    """Carrega numa única consulta a composição de todos os kits da cotação.
+
+    Retorna {kit_id: ((nome, quantidade), ...)} (kits sem componentes ficam de
+    fora). Não usa o cache: é lida a cada renderização.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        c = conn.cursor()
+        c.execute(_SELECT_COMPOSICAO + """
+            WHERE ki.kit_id IN (
+                SELECT produto_id FROM itens_cotacao
+                WHERE cotacao_id = ? AND tipo = 'Kit' AND produto_id IS NOT NULL
+            )
+            ORDER BY ki.kit_id, ki.id
+        """, (cotacao_id,))
+        return _agrupar(c.fetchall())
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def obter_composicao_kit(kit_id, conn=None, db_name=None):
+    """Componentes do kit como tupla de (nome, quantidade), com cache por banco e kit_id.
+
+    ``db_name`` identifica o banco no cache, inclusive quando ``conn`` é informada.
+    """
+    chave = _chave(db_name, kit_id)
+    with _lock:
+        composicao = _composicoes.get(chave)
+    if composicao is not None:
+        return composicao
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        c = conn.cursor()
+        c.execute(_SELECT_COMPOSICAO + " WHERE ki.kit_id = ? ORDER BY ki.id", (kit_id,))
+        composicao = _agrupar(c.fetchall()).get(kit_id, ())
+    finally:
+        if own_conn:
+            conn.close()
+    with _lock:
+        _composicoes[chave] = composicao
+    return composicao
+
+
+def invalidar_composicoes(kit_id=None):
+    """Descarta o cache após alterar kits (um kit específico, em qualquer banco, ou todos)."""
+    with _lock:
+        if kit_id is None:
+            _composicoes.clear()
+        else:
+            for chave in [chave for chave in _composicoes if chave[1] == kit_id]:
+                del _composicoes[chave]
@@ -0,0 +1,105 @@
+"""
+Logs do sistema.
+
+Cada módulo obtém seu logger com ``get_logger(__name__)`` e registra com
+formatação preguiçosa (``log.debug("Item %s: %s", n, nome)``): a mensagem
+só é montada se o nível estiver ativo. O nível padrão é INFO, então as
+mensagens DEBUG custam apenas a checagem de nível; em laços pesados use
+``log.isEnabledFor(logging.DEBUG)`` uma vez antes do laço.
+
+``configurar_logs`` (chamado na inicialização) liga um QueueHandler ao
+logger raiz do sistema: quem loga só enfileira o registro, e uma thread
+separada grava no console e no arquivo rotativo ``data/logs/crm.log``.
+O nível pode ser alterado pela variável de ambiente CRM_LOG_LEVEL.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+RAIZ = "crm"
+LOG_DIR = os.path.join("data", "logs")
+LOG_ARQUIVO = "crm.log"
+NIVEL_PADRAO = logging.INFO
+TAMANHO_MAXIMO = 2 * 1024 * 1024
+BACKUPS = 5
+FORMATO = "%(asctime)s %(levelname)-7s [%(threadName)s] %(name)s: %(message)s"
+
+_lock = threading.Lock()
+_listener = None
+
+# DEBUG desligado até configurar_logs dizer o contrário
+logging.getLogger(RAIZ).setLevel(NIVEL_PADRAO)
+
+
+def get_logger(nome):
+    """Logger do módulo, pendurado em ``crm`` (ex.: crm.pdf_generators.cotacao_nova)."""
+    if nome == RAIZ or nome.startswith(RAIZ + "."):
+        return logging.getLogger(nome)
+    return logging.getLogger(f"{RAIZ}.{nome}")
+
+
+def _nivel(valor):
+    if isinstance(valor, int):
+        return valor
+    nivel = logging.getLevelName(str(valor).strip().upper())
+    return nivel if isinstance(nivel, int) else NIVEL_PADRAO
+
+
+def configurar_logs(nivel=None, arquivo=None, console=True):
+    """Liga o handler assíncrono (fila) com console e arquivo rotativo.
+
+    Pode ser chamada mais de uma vez; apenas a primeira instala os handlers,
+    as seguintes só ajustam o nível.
+    """
+    global _listener
+    if nivel is None:
+        nivel = os.environ.get("CRM_LOG_LEVEL", NIVEL_PADRAO)
+    nivel = _nivel(nivel)
+    raiz = logging.getLogger(RAIZ)
+    raiz.setLevel(nivel)
+
+    with _lock:
+        if _listener is not None:
+            return raiz
+
+        formatter = logging.Formatter(FORMATO)
+        destinos = []
+        try:
+            caminho = arquivo or os.path.join(LOG_DIR, LOG_ARQUIVO)
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            arquivo_handler = logging.handlers.RotatingFileHandler(
+                caminho, maxBytes=TAMANHO_MAXIMO, backupCount=BACKUPS, encoding="utf-8", delay=True
+            )
+            destinos.append(arquivo_handler)
+        except OSError as e:
+            print(f"Aviso: não foi possível abrir o arquivo de log: {e}")
+        if console:
+            destinos.append(logging.StreamHandler())
+        for handler in destinos:
+            handler.setFormatter(formatter)
+
+        fila = queue.SimpleQueue()
+        raiz.addHandler(logging.handlers.QueueHandler(fila))
+        raiz.propagate = False
+        _listener = logging.handlers.QueueListener(fila, *destinos, respect_handler_level=True)
+        _listener.start()
+        atexit.register(encerrar_logs)
+    return raiz
+
+
+def encerrar_logs():
+    """Esvazia a fila e para a thread de gravação (chamado na saída)."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        raiz = logging.getLogger(RAIZ)
+        for handler in list(raiz.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                raiz.removeHandler(handler)
+        raiz.propagate = True
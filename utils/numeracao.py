@@ -0,0 +1,88 @@
+"""
+Numeração sequencial de propostas e relatórios (tabela ``sequences``).
+
+O formulário mostra ``proximo_numero`` como sugestão (só leitura, sem
+reservar). Ao gravar um registro novo, ``numero_para_gravar`` é chamado com
+o cursor da transação do salvamento: se o usuário manteve a sugestão, o
+número é reservado ali mesmo com um UPDATE ... RETURNING atômico, então dois
+usuários salvando ao mesmo tempo recebem números diferentes e um salvamento
+desfeito (rollback) devolve o número, sem deixar buracos. Números digitados
+à mão são respeitados e apenas avançam a sequência.
+"""
+import re
+import sqlite3
+from datetime import datetime
+
+from database import SEQUENCIAS, get_connection
+
+DIGITOS = 6
+
+# UPDATE ... RETURNING existe a partir do SQLite 3.35
+_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def formatar_numero(prefixo, valor):
+    return f"{prefixo}-{valor:0{DIGITOS}d}"
+
+
+def _ultimo(c, prefixo, filial_id, ano):
+    c.execute("SELECT ultimo FROM sequences WHERE prefixo = ? AND filial_id = ? AND ano = ?",
+              (prefixo, filial_id, ano))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def proximo_numero(prefixo, filial_id=0, ano=0, conn=None, db_name=None):
+    """Próximo número da série, para exibir no formulário (não reserva)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        return formatar_numero(prefixo, _ultimo(conn.cursor(), prefixo, filial_id, ano) + 1)
+    except sqlite3.Error:
+        # Banco ainda sem a tabela (ou bloqueado): sugestão única por horário
+        return f"{prefixo}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def reservar_numero(c, prefixo, filial_id=0, ano=0):
+    """Reserva e retorna o próximo número; deve rodar na transação que grava o registro."""
+    if prefixo not in SEQUENCIAS:
+        raise ValueError(f"Série de numeração desconhecida: {prefixo}")
+    if _RETURNING:
+        c.execute("""
+            INSERT INTO sequences (prefixo, filial_id, ano, ultimo) VALUES (?, ?, ?, 1)
+            ON CONFLICT (prefixo, filial_id, ano) DO UPDATE SET ultimo = ultimo + 1
+            RETURNING ultimo
+        """, (prefixo, filial_id, ano))
+        valor = c.fetchone()[0]
+    else:
+        # O UPDATE já obtém o bloqueio de escrita, então a leitura seguinte é segura
+        c.execute("UPDATE sequences SET ultimo = ultimo + 1 WHERE prefixo = ? AND filial_id = ? AND ano = ?",
+                  (prefixo, filial_id, ano))
+        if c.rowcount == 0:
+            c.execute("INSERT INTO sequences (prefixo, filial_id, ano, ultimo) VALUES (?, ?, ?, 1)",
+                      (prefixo, filial_id, ano))
+        valor = _ultimo(c, prefixo, filial_id, ano)
+    return formatar_numero(prefixo, valor)
+
+
+def registrar_numero(c, numero, filial_id=0, ano=0):
+    """Avança a série se ``numero`` (digitado) estiver à frente dela."""
+    m = re.fullmatch(r"([A-Z]+)-(\d+)", (numero or "").strip())
+    if not m or m.group(1) not in SEQUENCIAS:
+        return
+    c.execute("""
+        INSERT INTO sequences (prefixo, filial_id, ano, ultimo) VALUES (?, ?, ?, ?)
+        ON CONFLICT (prefixo, filial_id, ano) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)
+    """, (m.group(1), filial_id, ano, int(m.group(2))))
+
+
+def numero_para_gravar(c, prefixo, digitado, sugerido, filial_id=0, ano=0):
+    """Número de um registro novo: reserva o da série se o campo ainda tem a sugestão."""
+    if not digitado or digitado == sugerido:
+        return reservar_numero(c, prefixo, filial_id, ano)
+    registrar_numero(c, digitado, filial_id, ano)
+    return digitado
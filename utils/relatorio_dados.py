@@ -0,0 +1,86 @@
+"""
+Leitura e gravação de um relatório técnico com anexos e eventos de campo.
+
+``carregar_relatorio`` traz numa única consulta a linha do relatório, os
+dados do cliente, os anexos (``relatorio_anexos``) e os eventos de campo
+(agregados em JSON pelos índices por relatorio_id). É usado pela edição e
+pela geração do PDF. As gravações trocam os anexos/eventos do relatório
+com um DELETE e um ``executemany``.
+"""
+import json
+
+from database import get_connection
+
+ABAS = (1, 2, 3, 4)
+
+_SQL_RELATORIO = """
+    SELECT r.*,
+           cl.nome AS nome, cl.cnpj AS cnpj, cl.endereco AS endereco, cl.cidade AS cidade, cl.estado AS estado,
+           (SELECT json_group_array(json_array(a.aba, a.ordem, a.nome, a.caminho, a.descricao, a.hash))
+              FROM relatorio_anexos a WHERE a.relatorio_id = r.id) AS _anexos,
+           (SELECT json_group_array(json_array(e.tecnico_id, u.nome_completo, e.data_hora, e.evento, e.tipo, e.id))
+              FROM eventos_campo e JOIN usuarios u ON u.id = e.tecnico_id
+             WHERE e.relatorio_id = r.id) AS _eventos
+    FROM relatorios_tecnicos r
+    LEFT JOIN clientes cl ON cl.id = r.cliente_id
+    WHERE r.id = ?
+"""
+
+
+def carregar_relatorio(relatorio_id, conn=None, db_name=None):
+    """Relatório como dict (colunas + cliente) com ``anexos`` {aba: [dict]} e ``eventos``.
+
+    ``eventos`` são tuplas (tecnico_id, nome do técnico, data_hora, evento, tipo)
+    em ordem de data/hora. Retorna None se o relatório não existir.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        c = conn.cursor()
+        c.execute(_SQL_RELATORIO, (relatorio_id,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        dados = dict(zip((col[0] for col in c.description), row))
+    finally:
+        if own_conn:
+            conn.close()
+
+    anexos = {aba: [] for aba in ABAS}
+    for aba, _ordem, nome, caminho, descricao, digest in sorted(json.loads(dados.pop("_anexos") or "[]"),
+                                                                key=lambda a: (a[0], a[1])):
+        anexo = {"nome": nome, "caminho": caminho, "descricao": descricao}
+        if digest:
+            anexo["hash"] = digest
+        anexos.setdefault(aba, []).append(anexo)
+    eventos = sorted(json.loads(dados.pop("_eventos") or "[]"), key=lambda e: (e[2] or "", e[5]))
+    dados["anexos"] = anexos
+    dados["eventos"] = [tuple(e[:5]) for e in eventos]
+    return dados
+
+
+def gravar_anexos(c, relatorio_id, anexos_por_aba):
+    """Substitui os anexos do relatório por ``anexos_por_aba`` ({aba: [dict]})."""
+    c.execute("DELETE FROM relatorio_anexos WHERE relatorio_id = ?", (relatorio_id,))
+    c.executemany("""
+        INSERT INTO relatorio_anexos (relatorio_id, aba, ordem, nome, caminho, descricao, hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(relatorio_id, aba, ordem, anexo.get("nome"), anexo.get("caminho"), anexo.get("descricao"), anexo.get("hash"))
+          for aba, lista in anexos_por_aba.items() for ordem, anexo in enumerate(lista)])
+
+
+def gravar_eventos(c, relatorio_id, eventos):
+    """Substitui os eventos de campo do relatório; ``eventos`` = [(tecnico_id, data_hora, evento, tipo)]."""
+    c.execute("DELETE FROM eventos_campo WHERE relatorio_id = ?", (relatorio_id,))
+    c.executemany("""
+        INSERT INTO eventos_campo (relatorio_id, tecnico_id, data_hora, evento, tipo)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(relatorio_id, tecnico_id, data_hora, evento, tipo) for tecnico_id, data_hora, evento, tipo in eventos])
+
+
+def excluir_relatorio(c, relatorio_id):
+    """Apaga o relatório com seus anexos e eventos (sem commit)."""
+    c.execute("DELETE FROM relatorio_anexos WHERE relatorio_id = ?", (relatorio_id,))
+    c.execute("DELETE FROM eventos_campo WHERE relatorio_id = ?", (relatorio_id,))
+    c.execute("DELETE FROM relatorios_tecnicos WHERE id = ?", (relatorio_id,))
@@ -0,0 +1,47 @@
+"""
+Leitura dos contadores de stats_summary (mantidos por triggers no banco).
+
+Cada escopo ('geral', 'responsavel', 'cliente') tem uma linha com todos os
+contadores, então os cards do dashboard e o resumo do cliente custam uma
+única busca pela chave primária.
+"""
+from database import STATS_COLUNAS, get_connection
+
+ESCOPO_GERAL = "geral"
+ESCOPO_RESPONSAVEL = "responsavel"
+ESCOPO_CLIENTE = "cliente"
+
+
+def obter_resumo(escopo, escopo_id=0, conn=None, db_name=None):
+    """Contadores do escopo como dict (zeros se ainda não houver linha)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_name)
+    try:
+        c = conn.cursor()
+        c.execute(
+            f"SELECT {', '.join(STATS_COLUNAS)} FROM stats_summary WHERE escopo = ? AND escopo_id = ?",
+            (escopo, escopo_id or 0),
+        )
+        row = c.fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    resumo = dict(zip(STATS_COLUNAS, row)) if row else dict.fromkeys(STATS_COLUNAS, 0)
+    total = resumo["cotacoes"]
+    resumo["taxa_conversao"] = (resumo["cotacoes_aprovadas"] / total * 100) if total > 0 else 0
+    qtd = resumo["valor_positivo_qtd"]
+    resumo["media_valor"] = (resumo["valor_positivo_soma"] / qtd) if qtd > 0 else 0
+    return resumo
+
+
+def resumo_geral(conn=None, db_name=None):
+    return obter_resumo(ESCOPO_GERAL, 0, conn, db_name)
+
+
+def resumo_responsavel(usuario_id, conn=None, db_name=None):
+    return obter_resumo(ESCOPO_RESPONSAVEL, usuario_id, conn, db_name)
+
+
+def resumo_cliente(cliente_id, conn=None, db_name=None):
+    return obter_resumo(ESCOPO_CLIENTE, cliente_id, conn, db_name)